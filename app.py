@@ -1,38 +1,93 @@
+# Primeiro import: o relógio do arranque começa aqui
+from utils.arranque import StartupTimer, FirstRequestMiddleware
 from fastapi import FastAPI
-from models.base import Base
-from config.settings import APP_NAME
-from routes import exercicios, exercicios_historico, contador, concluir_exercicios_ativos
-from database.session import engine
+from config.settings import APP_NAME, PROFILING_TOKEN, SCHEMA_CHECK
+from config.performance import WARM_POOL_CONFIG, MONITORING_CONFIG, PROFILING_CONFIG, CACHE_CONFIG
+from routes import exercicios, exercicios_historico, contador, concluir_exercicios_ativos, ia, metricas, admin
+from database.session import engine, async_engine, SessionLocal, writer
+from database.schema import preparar_schema
 from fastapi.middleware.cors import CORSMiddleware
+from utils.metricas import MetricsMiddleware, startup_phase
+from utils.profiling import ProfilingMiddleware
+from utils.respostas import FastJSONResponse
 import asyncio
 from contextlib import asynccontextmanager
 
-# Criar as tabelas do banco de dados
-Base.metadata.create_all(bind=engine)
+# Importar o app não toca no banco nem abre clientes: isso acontece no lifespan
+arranque = StartupTimer()
+arranque.marcar("importacoes")
+
+def _publicar_arranque() -> None:
+    for nome, segundos in {**arranque.fases, **arranque.marcos}.items():
+        startup_phase.set(segundos, phase=nome)
+
+def _primeira_requisicao(segundos: float) -> None:
+    _publicar_arranque()
+    print(f"⏱️ Primeira requisição servida {segundos * 1000:.0f} ms após a importação do app")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Iniciando aplicação...")
     
+    # Tabelas, migrações e índices; com SCHEMA_CHECK=auto e o banco em dia é só um PRAGMA
+    with arranque.fase("schema"):
+        preparar_schema(engine, SCHEMA_CHECK)
+    
+    # Contadores semeados antes da primeira leitura (rotas de leitura usam conexões somente leitura)
+    from utils.contadores import garantir_contadores
+    with arranque.fase("contadores"):
+        db = SessionLocal()
+        try:
+            garantir_contadores(db)
+        finally:
+            db.close()
+    
+    # Cliente HTTP da IA e thread pool criados aqui, não na importação
+    from utils.ia import iniciar
+    with arranque.fase("clientes_ia"):
+        iniciar()
+    
+    # Escritor único do banco (group commit)
+    writer.start()
+    
     # Preload de exercícios populares em background
-    from routes.exercicios import startup_preload
-    asyncio.create_task(startup_preload())
+    from routes.exercicios import startup_preload, warm_pool
+    if CACHE_CONFIG["preload_popular_exercises"]:
+        asyncio.create_task(startup_preload())
+    
+    # Workers das gerações disparadas por conclusões
+    concluir_exercicios_ativos.geracoes.start()
     
-    print("✅ Aplicação iniciada com sucesso!")
+    # Pool de exercícios prontos, reabastecido em background
+    if WARM_POOL_CONFIG["enabled"]:
+        warm_pool.start()
+    
+    pronto = arranque.marcar("pronto")
+    _publicar_arranque()
+    print("✅ Aplicação iniciada com sucesso!" + (f" ({pronto * 1000:.0f} ms)" if pronto is not None else ""))
     yield
     
     # Shutdown
     print("🔄 Encerrando aplicação...")
+    await concluir_exercicios_ativos.geracoes.stop()
+    await warm_pool.stop()
+    await writer.stop()
+    # Fecha as conexões aiosqlite: cada uma mantém uma thread que impediria o processo de sair
+    await async_engine.dispose()
     from utils.ia import cleanup
     await cleanup()
+    from utils.respostas import respostas
+    respostas.close()
     print("✅ Aplicação encerrada!")
 
 app = FastAPI(
     title="API de Exercícios Otimizada",
     description="API de Exercícios com IA otimizada para alta performance",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Corpo JSON das rotas codificado por orjson (quando instalado)
+    default_response_class=FastJSONResponse
 )
 
 # Adicionar middleware CORS
@@ -55,6 +110,32 @@ app.include_router(exercicios.router)
 app.include_router(exercicios_historico.router)
 app.include_router(contador.router)
 app.include_router(concluir_exercicios_ativos.router)
+app.include_router(ia.router)
+
+# Métricas (latência por rota, IA, caches, SQLite) em /metrics
+if MONITORING_CONFIG["metrics_enabled"]:
+    app.add_middleware(
+        MetricsMiddleware,
+        limite_lento_ms=MONITORING_CONFIG["performance_threshold_ms"],
+        eventos_lentos=MONITORING_CONFIG["log_response_times"]
+    )
+    app.include_router(metricas.router)
+
+# Perfil de CPU por requisição (header X-Profile ou ?profile=<token>) e rotas /admin de memória.
+# Sem PROFILING_TOKEN nada disso é instalado: custo zero no caminho normal.
+if PROFILING_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=PROFILING_TOKEN,
+        diretorio=PROFILING_CONFIG["output_dir"],
+        header=PROFILING_CONFIG["header"],
+        parametro=PROFILING_CONFIG["query_param"],
+        max_perfis=PROFILING_CONFIG["max_profiles"]
+    )
+    app.include_router(admin.router)
+
+# Mais externo: marca o fim da primeira resposta no relatório de arranque
+app.add_middleware(FirstRequestMiddleware, timer=arranque, ao_marcar=_primeira_requisicao)
 
 @app.get("/")
 async def root():
@@ -74,4 +155,10 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Endpoint de health check para monitoramento"""
-    return {"status": "healthy", "timestamp": "2024-12-24T16:30:00Z"}
+    return {
+        "status": "healthy",
+        "timestamp": "2024-12-24T16:30:00Z",
+        "database_writer": writer.stats(),
+        "generation_jobs": concluir_exercicios_ativos.geracoes.stats(),
+        "startup": arranque.relatorio()
+    }
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark das rotas da API em processo, sem rede e sem o OpenRouter real.
+
+Sobe o app (com lifespan) sobre um SQLite temporário e aponta a IA para o
+FakeOpenRouter, com latência e falhas configuráveis. Mede criação, conclusão,
+consulta, histórico, contador e status do cache; o resultado sai em JSON
+(p50/p95/p99, vazão e chamadas ao provedor por cenário).
+
+Uso:
+    python -m benchmarks.api --requisicoes 200 --concorrencia 16 \\
+        --latencia-ia lognormal:0.3:0.5 --falhas-ia 0.02 --saida atual.json
+    # Compara com um resultado salvo; sai com código 1 se houver regressão
+    python -m benchmarks.api --baseline base.json --tolerancia 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Métricas comparadas com o baseline: maior é pior, exceto a vazão
+METRICAS_LATENCIA = ("p50_ms", "p95_ms", "p99_ms")
+# Diferença absoluta mínima para acusar regressão (evita ruído em valores muito pequenos)
+DIFERENCA_MINIMA = {"p50_ms": 1.0, "p95_ms": 2.0, "p99_ms": 5.0, "upstream_chamadas": 2}
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+async def _cenario(nome: str, chamadas: List[Callable[[], Awaitable[Any]]], concorrencia: int, fake) -> Dict[str, Any]:
+    """Executa as chamadas com no máximo `concorrencia` simultâneas e resume as latências"""
+    semaforo = asyncio.Semaphore(concorrencia)
+    tempos: List[float] = []
+    erros = 0
+    upstream_antes = sum(fake.chamadas.values())
+
+    async def executar(chamada):
+        nonlocal erros
+        async with semaforo:
+            inicio = time.perf_counter()
+            resposta = await chamada()
+            tempos.append(time.perf_counter() - inicio)
+            if resposta.status_code >= 400:
+                erros += 1
+            return resposta
+
+    inicio = time.perf_counter()
+    respostas = await asyncio.gather(*[executar(c) for c in chamadas])
+    duracao = time.perf_counter() - inicio
+
+    tempos.sort()
+    resumo = {
+        "requisicoes": len(tempos),
+        "erros": erros,
+        "vazao_rps": round(len(tempos) / duracao, 1) if duracao else 0.0,
+        "media_ms": round(statistics.mean(tempos) * 1000, 2),
+        "upstream_chamadas": sum(fake.chamadas.values()) - upstream_antes,
+    }
+    for metrica, p in zip(METRICAS_LATENCIA, (0.5, 0.95, 0.99)):
+        resumo[metrica] = round(_percentil(tempos, p) * 1000, 2)
+    print(f"{nome}: {resumo}", file=sys.stderr)
+    return {"resumo": resumo, "respostas": respostas}
+
+
+@contextlib.asynccontextmanager
+async def app_em_processo(diretorio: str, latencia_ia: str, falhas_ia: float = 0.0,
+                          warm_pool: bool = False, preload: bool = False):
+    """
+    App com lifespan sobre um SQLite em `diretorio`, com a IA servida pelo FakeOpenRouter.
+    Entrega (cliente httpx para o app, servidor falso).
+    """
+    # O banco e o cache da IA são resolvidos na importação: o diretório temporário vem antes do app
+    os.environ["DATABASE_PATH"] = os.path.join(diretorio, "bench.db")
+    import httpx
+    import utils.ia as ia
+    import routes.exercicios as rotas_exercicios
+    from config.performance import WARM_POOL_CONFIG
+    from benchmarks.fake_openrouter import FakeOpenRouter, distribuicao
+    from app import app
+
+    fake = FakeOpenRouter(
+        latencias={modelo: distribuicao(latencia_ia) for modelo in ia.MODELOS_IA},
+        falhas={modelo: falhas_ia for modelo in ia.MODELOS_IA}
+    )
+    ia.http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), timeout=30.0)
+    WARM_POOL_CONFIG["enabled"] = warm_pool
+    if not preload:
+        async def sem_preload():
+            pass
+        rotas_exercicios.startup_preload = sem_preload
+
+    try:
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+                yield cliente, fake
+    finally:
+        # O shutdown do lifespan já fecha o cliente (ia.cleanup); sobra só quando ele não rodou
+        if ia.http_client is not None:
+            await ia.http_client.aclose()
+
+
+async def executar(args) -> Dict[str, Any]:
+    n, c = args.requisicoes, args.concorrencia
+    cenarios: Dict[str, Dict[str, Any]] = {}
+    async with app_em_processo(args.diretorio, args.latencia_ia, args.falhas_ia, args.warm_pool, args.preload) as (cliente, fake):
+        criados = await _cenario("criar", [
+            lambda: cliente.post("/exercicios/automatico") for _ in range(n)
+        ], c, fake)
+        ids = [r.json()["id"] for r in criados["respostas"] if r.status_code == 200]
+        cenarios["criar"] = criados["resumo"]
+
+        cenarios["buscar"] = (await _cenario("buscar", [
+            (lambda i=i: cliente.get(f"/exercicios/{i}")) for i in random.choices(ids, k=n)
+        ], c, fake))["resumo"]
+
+        # Conclusão responde antes da geração do próximo exercício; a geração é medida à parte
+        concluidos = await _cenario("concluir", [
+            (lambda i=i: cliente.patch(f"/exercicios/concluir/{i}")) for i in ids
+        ], c, fake)
+        cenarios["concluir"] = concluidos["resumo"]
+        cenarios["geracao_pos_conclusao"] = (await _cenario("geracao_pos_conclusao", [
+            (lambda url=r.json()["status_url"]: cliente.get(url, params={"espera": 30}))
+            for r in concluidos["respostas"] if r.status_code == 202
+        ], c, fake))["resumo"]
+
+        cenarios["historico"] = (await _cenario("historico", [
+            lambda: cliente.get("/historico/exercicios/detalhado", params={"limite": 50}) for _ in range(n)
+        ], c, fake))["resumo"]
+        cenarios["contador"] = (await _cenario("contador", [
+            lambda: cliente.get("/Contador_exercicios") for _ in range(n)
+        ], c, fake))["resumo"]
+        cenarios["cache_status"] = (await _cenario("cache_status", [
+            lambda: cliente.get("/exercicios/cache/status") for _ in range(n)
+        ], c, fake))["resumo"]
+
+    return {
+        "config": {
+            "requisicoes": n,
+            "concorrencia": c,
+            "latencia_ia": args.latencia_ia,
+            "falhas_ia": args.falhas_ia,
+            "warm_pool": args.warm_pool,
+            "preload": args.preload,
+            "seed": args.seed,
+        },
+        "upstream_por_modelo": dict(fake.chamadas),
+        "cenarios": cenarios,
+    }
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float) -> List[Dict[str, Any]]:
+    """Regressões: latência ou chamadas ao provedor acima de (1 + tolerancia) x baseline, vazão abaixo de (1 - tolerancia)"""
+    regressoes = []
+    for cenario, base in baseline.get("cenarios", {}).items():
+        novo = atual["cenarios"].get(cenario)
+        if novo is None:
+            continue
+        verificacoes = [
+            (m, novo[m] > base[m] * (1 + tolerancia) and novo[m] - base[m] > DIFERENCA_MINIMA[m])
+            for m in METRICAS_LATENCIA + ("upstream_chamadas",)
+        ]
+        verificacoes.append(("vazao_rps", novo["vazao_rps"] < base["vazao_rps"] * (1 - tolerancia)))
+        verificacoes.append(("erros", novo["erros"] > base["erros"]))
+        for metrica, piorou in verificacoes:
+            if piorou:
+                regressoes.append({"cenario": cenario, "metrica": metrica, "baseline": base[metrica], "atual": novo[metrica]})
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por cenário")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--latencia-ia", default="lognormal:0.3:0.5",
+                        help="Distribuição de latência do provedor (ver fake_openrouter.distribuicao)")
+    parser.add_argument("--falhas-ia", type=float, default=0.0, help="Probabilidade de erro por chamada ao provedor")
+    parser.add_argument("--warm-pool", action="store_true", help="Liga o reabastecimento do warm pool")
+    parser.add_argument("--preload", action="store_true", help="Roda o preload de startup")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo para gravar o resultado (além da saída padrão)")
+    parser.add_argument("--baseline", help="Resultado salvo para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora relativa aceita antes de acusar regressão")
+    parser.add_argument("--verbose", action="store_true", help="Mantém os logs do app (em stderr)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as diretorio:
+        args.diretorio = diretorio
+        destino_logs = sys.stderr if args.verbose else open(os.devnull, "w")
+        with contextlib.redirect_stdout(destino_logs):
+            resultado = asyncio.run(executar(args))
+
+    codigo = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        resultado["comparacao"] = {"baseline": args.baseline, "tolerancia": args.tolerancia, "regressoes": regressoes}
+        codigo = 1 if regressoes else 0
+
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
+    print(saida)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Relatório de arranque a frio: custo de importação por módulo e tempo até a
+primeira requisição servida.
+
+- importacao: `python -X importtime -c "import app"` em um processo novo; lista
+  os módulos mais caros (tempo acumulado, com dependências) e os do projeto
+- arranque: cada rodada é um processo novo que importa o app, roda o lifespan e
+  faz GET /health pelo ASGITransport (sem rede, preload e warm pool desligados).
+  A primeira rodada usa um banco novo (schema criado); as demais, o banco já em dia
+
+Com --orcamento-ms o script sai com código 1 se a mediana do tempo até a primeira
+requisição (banco existente, processo inteiro) passar do limite.
+
+Uso:
+    python -m benchmarks.arranque --rodadas 5 --orcamento-ms 1500
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACOTES_DO_PROJETO = ("app", "config", "database", "models", "routes", "schemas", "utils")
+
+
+def _filho() -> None:
+    """Executado no processo medido: importa o app, sobe o lifespan e serve uma requisição"""
+    inicio = time.perf_counter()
+    sys.path.insert(0, RAIZ)
+    import asyncio
+    with contextlib.redirect_stdout(sys.stderr):
+        from app import app, arranque
+    importado = time.perf_counter()
+
+    import httpx
+    import routes.exercicios as rotas_exercicios
+    from config.performance import WARM_POOL_CONFIG
+
+    async def sem_preload():
+        pass
+    rotas_exercicios.startup_preload = sem_preload
+    WARM_POOL_CONFIG["enabled"] = False
+
+    async def primeira_requisicao() -> Dict[str, float]:
+        async with app.router.lifespan_context(app):
+            pronto = time.perf_counter()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://arranque") as cliente:
+                resposta = await cliente.get("/health")
+                resposta.raise_for_status()
+            return {"pronto": pronto, "primeira_requisicao": time.perf_counter()}
+
+    with contextlib.redirect_stdout(sys.stderr):
+        instantes = asyncio.run(primeira_requisicao())
+    print(json.dumps({
+        "importacao_ms": round((importado - inicio) * 1000, 1),
+        "lifespan_ms": round((instantes["pronto"] - importado) * 1000, 1),
+        "primeira_requisicao_ms": round((instantes["primeira_requisicao"] - inicio) * 1000, 1),
+        "app": arranque.relatorio(),
+    }))
+
+
+def _ambiente(banco: str) -> Dict[str, str]:
+    return {**os.environ, "DATABASE_PATH": banco, "PYTHONDONTWRITEBYTECODE": "1"}
+
+
+def _rodada(banco: str, verbose: bool) -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, "-m", "benchmarks.arranque", "--filho"], cwd=RAIZ, env=_ambiente(banco),
+        stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL, text=True, check=True
+    )
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    # Inclui a subida do interpretador e o encerramento do processo
+    resultado["processo_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    return resultado
+
+
+def _importtime(banco: str, limite: int) -> Dict[str, Any]:
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=RAIZ, env=_ambiente(banco),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    modulos: List[Dict[str, Any]] = []
+    for linha in processo.stderr.splitlines():
+        # "import time:       self |  cumulative | <indentação>módulo"
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|", 2)
+        modulos.append({
+            "modulo": nome.strip(),
+            "nivel": (len(nome) - len(nome.lstrip()) - 1) // 2,
+            "acumulado_ms": round(int(acumulado) / 1000, 2),
+            "proprio_ms": round(int(proprio) / 1000, 2),
+        })
+    app = next((m for m in modulos if m["modulo"] == "app"), None)
+    do_projeto = [m for m in modulos if m["modulo"].split(".")[0] in PACOTES_DO_PROJETO]
+    return {
+        "total_ms": app["acumulado_ms"] if app else None,
+        "modulos_mais_lentos": sorted(modulos, key=lambda m: m["acumulado_ms"], reverse=True)[:limite],
+        "modulos_do_projeto": sorted(do_projeto, key=lambda m: m["acumulado_ms"], reverse=True),
+    }
+
+
+def _mediana(rodadas: List[Dict[str, Any]]) -> Dict[str, float]:
+    chaves = ("importacao_ms", "lifespan_ms", "primeira_requisicao_ms", "processo_ms")
+    return {chave: round(statistics.median(r[chave] for r in rodadas), 1) for chave in chaves}
+
+
+def executar(args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as diretorio:
+        banco = os.path.join(diretorio, "arranque.db")
+        importacao = _importtime(os.path.join(diretorio, "importtime.db"), args.modulos)
+        banco_novo = _rodada(banco, args.verbose)
+        existentes = [_rodada(banco, args.verbose) for _ in range(args.rodadas)]
+        print(f"banco existente: {_mediana(existentes)}", file=sys.stderr)
+
+    resultado = {
+        "config": {"rodadas": args.rodadas, "python": sys.version.split()[0]},
+        "importacao": importacao,
+        "arranque": {
+            "banco_novo": banco_novo,
+            "banco_existente": {"mediana": _mediana(existentes), "rodadas": existentes},
+        },
+    }
+    if args.orcamento_ms is not None:
+        medido = resultado["arranque"]["banco_existente"]["mediana"]["processo_ms"]
+        resultado["orcamento"] = {"limite_ms": args.orcamento_ms, "medido_ms": medido, "ok": medido <= args.orcamento_ms}
+    return resultado
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rodadas", type=int, default=5, help="Processos medidos com o banco já existente")
+    parser.add_argument("--modulos", type=int, default=15, help="Quantos módulos listar entre os mais lentos")
+    parser.add_argument("--orcamento-ms", type=float, help="Limite para a mediana do tempo até a primeira requisição")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs do app (em stderr)")
+    parser.add_argument("--saida", help="Arquivo para gravar o resultado (além da saída padrão)")
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.filho:
+        _filho()
+        return 0
+
+    resultado = executar(args)
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
+    print(saida)
+    return 0 if resultado.get("orcamento", {}).get("ok", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
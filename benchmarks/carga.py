@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga concorrente para as rotas da API.
+
+Dois modos:
+- fechado: N usuários simultâneos, cada um envia a próxima requisição quando
+  a anterior termina (mais um tempo de pensamento opcional)
+- aberto: chegadas a uma taxa fixa (ou Poisson), independentes das respostas.
+  A latência é medida a partir do instante programado de envio, então uma
+  requisição atrasada porque o gerador ou o servidor estava saturado conta
+  a espera inteira (sem coordinated omission)
+
+A rampa de subida aumenta usuários/taxa linearmente; requisições da rampa não
+entram nas estatísticas. Com --curva, cada nível é executado em sequência e o
+resultado é a curva vazão x latência, com o primeiro nível saturado destacado.
+
+Uso (servidor real, um worker):
+    uvicorn app:app --workers 1 --port 8000
+    python -m benchmarks.carga --modo aberto --curva 5 10 20 40 80 --duracao 20 --rampa 5
+    python -m benchmarks.carga --modo fechado --curva 1 4 16 64 --mix contador=4 historico=3 automatico=1 concluir=2
+
+Em processo (SQLite temporário e OpenRouter falso):
+    python -m benchmarks.carga --em-processo --modo aberto --curva 10 50 100 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OPERACOES = ("automatico", "concluir", "historico", "contador")
+MIX_PADRAO = {"automatico": 1, "concluir": 2, "historico": 3, "contador": 4}
+
+
+def _percentil(ordenados: List[float], p: float) -> Optional[float]:
+    if not ordenados:
+        return None
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+class Carga:
+    """
+    Estado compartilhado de uma execução: sorteio das operações pelo mix,
+    exercícios ativos disponíveis para conclusão e latências registradas
+    """
+
+    def __init__(self, cliente, mix: Dict[str, float], timeout: float):
+        self.cliente = cliente
+        self.operacoes = list(mix)
+        self.pesos = [mix[op] for op in self.operacoes]
+        self.timeout = timeout
+        self.ativos: List[int] = []
+        self.registros: List[Dict[str, Any]] = []
+
+    async def _enviar(self, operacao: str):
+        if operacao == "concluir" and not self.ativos:
+            operacao = "automatico"  # Nada para concluir ainda: cria um
+        if operacao == "automatico":
+            resposta = await self.cliente.post("/exercicios/automatico", timeout=self.timeout)
+            if resposta.status_code == 200:
+                self.ativos.append(resposta.json()["id"])
+        elif operacao == "concluir":
+            exercicio_id = self.ativos.pop(random.randrange(len(self.ativos)))
+            resposta = await self.cliente.patch(f"/exercicios/concluir/{exercicio_id}", timeout=self.timeout)
+        elif operacao == "historico":
+            resposta = await self.cliente.get("/historico/exercicios/detalhado", params={"limite": 50}, timeout=self.timeout)
+        else:
+            resposta = await self.cliente.get("/Contador_exercicios", timeout=self.timeout)
+        return operacao, resposta.status_code
+
+    async def executar(self, programado: float, medir: bool) -> None:
+        """Envia uma requisição; a latência conta a partir de `programado` (instante pretendido)"""
+        operacao = random.choices(self.operacoes, self.pesos)[0]
+        enviado = time.perf_counter()
+        try:
+            operacao, status = await self._enviar(operacao)
+        except Exception as e:
+            status = type(e).__name__
+        fim = time.perf_counter()
+        if medir:
+            self.registros.append({
+                "operacao": operacao,
+                "ok": isinstance(status, int) and status < 400,
+                "latencia": fim - programado,
+                "servico": fim - enviado,
+                "fim": fim,
+            })
+
+
+async def _fechado(carga: Carga, usuarios: int, duracao: float, rampa: float, pensamento: float) -> float:
+    """Usuários entram ao longo da rampa; mede do fim da rampa até o fim da duração"""
+    inicio = time.perf_counter()
+    inicio_medicao = inicio + rampa
+    fim = inicio_medicao + duracao
+
+    async def usuario(indice: int):
+        await asyncio.sleep(rampa * indice / usuarios)
+        while (agora := time.perf_counter()) < fim:
+            await carga.executar(agora, medir=agora >= inicio_medicao)
+            if pensamento:
+                await asyncio.sleep(random.expovariate(1 / pensamento))
+
+    await asyncio.gather(*[usuario(i) for i in range(usuarios)])
+    return inicio_medicao
+
+
+async def _aberto(carga: Carga, taxa: float, duracao: float, rampa: float, poisson: bool, max_em_andamento: int) -> float:
+    """
+    Chegadas programadas independentemente das respostas. Na rampa a taxa cresce
+    linearmente até `taxa`. Se o limite de requisições em andamento estiver cheio,
+    a requisição espera na fila local; como a latência conta do instante programado,
+    essa espera entra na medida.
+    """
+    inicio = time.perf_counter()
+    inicio_medicao = inicio + rampa
+    fim = inicio_medicao + duracao
+    limite = asyncio.Semaphore(max_em_andamento)
+    tarefas = []
+
+    async def enviar(programado: float):
+        async with limite:
+            await carga.executar(programado, medir=programado >= inicio_medicao)
+
+    programado = inicio
+    while True:
+        decorrido = programado - inicio
+        taxa_atual = taxa * min(max(decorrido / rampa, 0.05), 1.0) if rampa else taxa
+        intervalo = random.expovariate(taxa_atual) if poisson else 1 / taxa_atual
+        programado += intervalo
+        if programado >= fim:
+            break
+        espera = programado - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarefas.append(asyncio.create_task(enviar(programado)))
+
+    await asyncio.gather(*tarefas)
+    return inicio_medicao
+
+
+def _resumir(registros: List[Dict[str, Any]], duracao: float) -> Dict[str, Any]:
+    latencias = sorted(r["latencia"] for r in registros)
+    servico = sorted(r["servico"] for r in registros)
+    resumo = {
+        "requisicoes": len(registros),
+        "erros": sum(1 for r in registros if not r["ok"]),
+        "vazao_rps": round(sum(1 for r in registros if r["ok"]) / duracao, 2),
+    }
+    for nome, p in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99), ("max_ms", 1.0)):
+        valor = _percentil(latencias, p)
+        resumo[nome] = round(valor * 1000, 1) if valor is not None else None
+    # Sem a espera na fila local: a diferença para p99_ms mostra o quanto a omissão distorceria
+    p99_servico = _percentil(servico, 0.99)
+    resumo["p99_servico_ms"] = round(p99_servico * 1000, 1) if p99_servico is not None else None
+    return resumo
+
+
+async def _nivel(cliente, args, nivel: float) -> Dict[str, Any]:
+    carga = Carga(cliente, args.mix, args.timeout)
+    if args.modo == "fechado":
+        inicio_medicao = await _fechado(carga, int(nivel), args.duracao, args.rampa, args.pensamento)
+    else:
+        inicio_medicao = await _aberto(carga, nivel, args.duracao, args.rampa, args.poisson, args.max_em_andamento)
+
+    # Duração efetiva: requisições lentas podem terminar depois da janela programada
+    duracao = max([args.duracao] + [r["fim"] - inicio_medicao for r in carga.registros])
+    resultado = {"nivel": nivel, **_resumir(carga.registros, duracao), "por_operacao": {}}
+    for operacao in OPERACOES:
+        registros = [r for r in carga.registros if r["operacao"] == operacao]
+        if registros:
+            resultado["por_operacao"][operacao] = _resumir(registros, duracao)
+    print(f"nível {nivel}: {resultado['vazao_rps']} req/s, p99 {resultado['p99_ms']} ms", file=sys.stderr)
+    return resultado
+
+
+def _saturacao(curva: List[Dict[str, Any]], modo: str, slo_ms: float) -> Optional[Dict[str, Any]]:
+    """Primeiro nível em que a vazão não acompanha a carga ou o p99 estoura o SLO"""
+    melhor_vazao = 0.0
+    for ponto in curva:
+        sem_vazao = (ponto["vazao_rps"] < ponto["nivel"] * 0.9) if modo == "aberto" else (ponto["vazao_rps"] < melhor_vazao * 1.05)
+        estourou = ponto["p99_ms"] is not None and ponto["p99_ms"] > slo_ms
+        if sem_vazao or estourou:
+            return {"nivel": ponto["nivel"], "motivo": "vazao" if sem_vazao else "p99_acima_do_slo",
+                    "vazao_maxima_rps": max(melhor_vazao, ponto["vazao_rps"])}
+        melhor_vazao = max(melhor_vazao, ponto["vazao_rps"])
+    return None
+
+
+async def executar(args) -> Dict[str, Any]:
+    import httpx
+
+    async with contextlib.AsyncExitStack() as pilha:
+        if args.em_processo:
+            from benchmarks.api import app_em_processo
+            diretorio = pilha.enter_context(tempfile.TemporaryDirectory())
+            cliente, _ = await pilha.enter_async_context(app_em_processo(diretorio, args.latencia_ia))
+        else:
+            cliente = await pilha.enter_async_context(httpx.AsyncClient(
+                base_url=args.url, limits=httpx.Limits(max_connections=args.max_em_andamento)
+            ))
+        curva = [await _nivel(cliente, args, nivel) for nivel in args.curva]
+
+    return {
+        "config": {
+            "modo": args.modo,
+            "alvo": "em_processo" if args.em_processo else args.url,
+            "mix": args.mix,
+            "duracao_s": args.duracao,
+            "rampa_s": args.rampa,
+            "poisson": args.poisson,
+            "slo_p99_ms": args.slo_ms,
+        },
+        "curva": curva,
+        "saturacao": _saturacao(curva, args.modo, args.slo_ms),
+    }
+
+
+def _mix(valores: List[str]) -> Dict[str, float]:
+    mix = {}
+    for item in valores:
+        operacao, peso = item.split("=", 1)
+        if operacao not in OPERACOES:
+            raise argparse.ArgumentTypeError(f"Operação desconhecida: {operacao} (use {', '.join(OPERACOES)})")
+        mix[operacao] = float(peso)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modo", choices=("aberto", "fechado"), default="aberto")
+    parser.add_argument("--curva", type=float, nargs="+", default=[10],
+                        help="Níveis de carga: req/s (aberto) ou usuários (fechado)")
+    parser.add_argument("--duracao", type=float, default=20.0, help="Segundos medidos por nível")
+    parser.add_argument("--rampa", type=float, default=5.0, help="Segundos de subida por nível (fora das estatísticas)")
+    parser.add_argument("--mix", nargs="+", metavar="OPERACAO=PESO", help="Pesos de automatico, concluir, historico, contador")
+    parser.add_argument("--pensamento", type=float, default=0.0, help="Tempo médio de pensamento no modo fechado (s)")
+    parser.add_argument("--poisson", action="store_true", help="Chegadas Poisson no modo aberto (padrão: intervalos fixos)")
+    parser.add_argument("--max-em-andamento", type=int, default=1000, help="Limite de requisições abertas pelo gerador")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 acima disto marca o nível como saturado")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--em-processo", action="store_true", help="Sobe o app em processo com o OpenRouter falso")
+    parser.add_argument("--latencia-ia", default="lognormal:0.3:0.5", help="Latência do OpenRouter falso (--em-processo)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo para gravar o resultado (além da saída padrão)")
+    args = parser.parse_args()
+    args.mix = _mix(args.mix) if args.mix else dict(MIX_PADRAO)
+
+    random.seed(args.seed)
+    # Logs do app em processo não misturam com o JSON
+    with contextlib.redirect_stdout(open(os.devnull, "w") if args.em_processo else sys.stdout):
+        resultado = asyncio.run(executar(args))
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
+    print(saida)
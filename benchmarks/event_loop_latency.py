@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência do event loop durante escritas concorrentes no SQLite.
+
+Compara o caminho antigo (Session síncrona chamada dentro de rotas async)
+com o novo (AsyncSession sobre aiosqlite). Um "ticker" mede o atraso com que
+o event loop consegue acordar uma task enquanto as escritas acontecem.
+
+Uso:
+    python -m benchmarks.event_loop_latency --escritas 200 --concorrencia 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from models.base import Base
+from models.exercicios import Exercicios
+
+TICK_SECONDS = 0.001
+
+
+def _novo_exercicio(i: int) -> Exercicios:
+    return Exercicios(
+        nome=f"Exercício {i}",
+        descricao="Descrição de teste " * 10,
+        vantagens="Vantagens de teste " * 10,
+        passo_a_passo="1. Um 2. Dois 3. Três",
+        exercicio_ativo=True,
+    )
+
+
+async def _medir_atrasos(parar: asyncio.Event, atrasos: list) -> None:
+    """Acorda a cada 1 ms e registra quanto o event loop atrasou além disso"""
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        atrasos.append((time.perf_counter() - inicio - TICK_SECONDS) * 1000)
+
+
+async def _rodar(modo: str, db_path: str, escritas: int, concorrencia: int) -> dict:
+    url = f"sqlite:///{db_path}"
+    sync_engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    SessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def escrita_sync(i: int):
+        async with semaforo:
+            db = SessionLocal()
+            try:
+                db.add(_novo_exercicio(i))
+                db.commit()  # Bloqueia o event loop durante o fsync
+            finally:
+                db.close()
+            await asyncio.sleep(0)
+
+    async def escrita_async(i: int):
+        async with semaforo:
+            async with AsyncSessionLocal() as db:
+                db.add(_novo_exercicio(i))
+                await db.commit()
+
+    escrita = escrita_sync if modo == "sync" else escrita_async
+
+    atrasos: list = []
+    parar = asyncio.Event()
+    ticker = asyncio.create_task(_medir_atrasos(parar, atrasos))
+    await asyncio.sleep(0.05)  # Linha de base sem carga
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[escrita(i) for i in range(escritas)])
+    duracao = time.perf_counter() - inicio
+
+    parar.set()
+    await ticker
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+    atrasos.sort()
+    return {
+        "modo": modo,
+        "escritas": escritas,
+        "concorrencia": concorrencia,
+        "duracao_s": round(duracao, 3),
+        "escritas_por_s": round(escritas / duracao, 1),
+        "atraso_loop_ms": {
+            "p50": round(statistics.median(atrasos), 3),
+            "p99": round(atrasos[int(len(atrasos) * 0.99) - 1], 3),
+            "max": round(atrasos[-1], 3),
+            "amostras": len(atrasos),
+        },
+    }
+
+
+async def main(escritas: int, concorrencia: int) -> list:
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for modo in ("sync", "async"):
+            resultados.append(await _rodar(modo, db_path, escritas, concorrencia))
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escritas", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.escritas, args.concorrencia)), indent=2, ensure_ascii=False))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Servidor falso do OpenRouter, com latência e falhas injetadas por modelo.
+
+Serve POST /api/v1/chat/completions (com e sem stream) para testar hedging e
+circuit breaker sem rede. Pode ser usado em processo (httpx.ASGITransport) ou
+como servidor real, apontando a API para ele com OPENROUTER_URL.
+
+Uso:
+    python -m benchmarks.fake_openrouter --porta 8099 \\
+        --latencia microsoft/phi-3-mini-4k-instruct=3.0 --falhas openai/gpt-3.5-turbo=0.2
+    OPENROUTER_URL=http://127.0.0.1:8099/api/v1/chat/completions uvicorn app:app
+
+    # Latência de call_ai_api com o principal lento, sem e com hedging
+    python -m benchmarks.fake_openrouter --benchmark --chamadas 200
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeOpenRouter:
+    """
+    Estado do servidor falso, alterável durante o teste:
+    - latencias: segundos antes de responder, por modelo (número fixo ou função sorteando o valor,
+      ver distribuicao())
+    - falhas: probabilidade (0 a 1) de responder com erro, por modelo
+    - status_falha: status HTTP das falhas injetadas (503, ou 429 para simular limite de taxa)
+    - chamadas/canceladas: contagem por modelo
+    """
+
+    def __init__(self, latencias: Optional[Dict[str, Union[float, Callable[[], float]]]] = None,
+                 falhas: Optional[Dict[str, float]] = None):
+        self.latencias = dict(latencias or {})
+        self.falhas = dict(falhas or {})
+        self.status_falha = 503
+        self.chamadas: Counter = Counter()
+        self.canceladas: Counter = Counter()
+        self.app = FastAPI()
+        self.app.post("/api/v1/chat/completions")(self._completions)
+
+    def _conteudo(self, modelo: str, dados: dict) -> str:
+        if dados.get("response_format", {}).get("type") == "json_object":
+            return json.dumps({
+                "descricao": f"Descrição de {modelo}",
+                "vantagens": f"Vantagens de {modelo}",
+                "passo_a_passo": f"1. Passo de {modelo}",
+            }, ensure_ascii=False)
+        return f"Resposta de {modelo}"
+
+    async def _completions(self, request: Request):
+        dados = await request.json()
+        modelo = dados.get("model", "")
+        self.chamadas[modelo] += 1
+        latencia = self.latencias.get(modelo, 0.0)
+        try:
+            await asyncio.sleep(latencia() if callable(latencia) else latencia)
+        except asyncio.CancelledError:
+            self.canceladas[modelo] += 1
+            raise
+        if random.random() < self.falhas.get(modelo, 0.0):
+            headers = {"Retry-After": "1"} if self.status_falha == 429 else None
+            return JSONResponse({"error": {"message": "falha injetada"}}, status_code=self.status_falha, headers=headers)
+
+        conteudo = self._conteudo(modelo, dados)
+        if not dados.get("stream"):
+            return {"model": modelo, "choices": [{"message": {"role": "assistant", "content": conteudo}}]}
+
+        async def eventos():
+            yield ": OPENROUTER PROCESSING\n\n"
+            for parte in conteudo.split(" "):
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': parte + ' '}}]})}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(eventos(), media_type="text/event-stream")
+
+
+def distribuicao(spec: str) -> Callable[[], float]:
+    """
+    Latência sorteada a cada chamada, a partir de uma especificação em texto:
+    - "0.2": fixa
+    - "uniforme:MIN:MAX"
+    - "lognormal:MEDIANA:SIGMA"
+    - "cauda:BASE:LENTA:PROB": BASE, e LENTA com probabilidade PROB
+    """
+    nome, *params = spec.split(":")
+    if not params:
+        valor = float(nome)
+        return lambda: valor
+    valores = [float(p) for p in params]
+    if nome == "uniforme":
+        return lambda: random.uniform(*valores)
+    if nome == "lognormal":
+        mediana, sigma = valores
+        return lambda: random.lognormvariate(math.log(mediana), sigma)
+    if nome == "cauda":
+        base, lenta, prob = valores
+        return lambda: lenta if random.random() < prob else base
+    raise ValueError(f"Distribuição desconhecida: {spec}")
+
+
+def _pares(valores, conversor=float) -> Dict[str, float]:
+    return {modelo: conversor(valor) for modelo, valor in (item.rsplit("=", 1) for item in valores or [])}
+
+
+async def benchmark(chamadas: int) -> list:
+    """Compara call_ai_api com cauda longa no principal (p99 ~2 s), sem e com hedging"""
+    import httpx
+    import utils.ia as ia
+    from config.performance import AI_CONFIG
+
+    principal, fallback = ia.MODELOS_IA
+    fake = FakeOpenRouter(latencias={fallback: 0.15})
+    cliente_original = ia.http_client
+    ia.http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), timeout=30.0)
+    hedge_original = AI_CONFIG["hedge_enabled"]
+
+    resultados = []
+    try:
+        for hedge in (False, True):
+            AI_CONFIG["hedge_enabled"] = hedge
+            tempos = []
+            for _ in range(chamadas):
+                # Cauda longa abaixo do percentil do hedge: 3% das respostas do principal demoram 2 s
+                fake.latencias[principal] = 2.0 if random.random() < 0.03 else 0.05
+                inicio = time.perf_counter()
+                await ia.call_ai_api("prompt", "system")
+                tempos.append(time.perf_counter() - inicio)
+            tempos.sort()
+            resultados.append({
+                "hedging": hedge,
+                "chamadas": chamadas,
+                "p50_ms": round(statistics.median(tempos) * 1000, 1),
+                "p95_ms": round(tempos[int(len(tempos) * 0.95) - 1] * 1000, 1),
+                "p99_ms": round(tempos[int(len(tempos) * 0.99) - 1] * 1000, 1),
+                "max_ms": round(tempos[-1] * 1000, 1),
+                "chamadas_por_modelo": dict(fake.chamadas),
+            })
+            fake.chamadas.clear()
+    finally:
+        AI_CONFIG["hedge_enabled"] = hedge_original
+        await ia.http_client.aclose()
+        ia.http_client = cliente_original
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--latencia", nargs="*", metavar="MODELO=DISTRIBUICAO",
+                        help="Ex.: modelo=0.3, modelo=lognormal:0.3:0.5, modelo=cauda:0.05:2:0.03")
+    parser.add_argument("--falhas", nargs="*", metavar="MODELO=PROBABILIDADE")
+    parser.add_argument("--benchmark", action="store_true", help="Mede call_ai_api contra o servidor em processo")
+    parser.add_argument("--chamadas", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(asyncio.run(benchmark(args.chamadas)), indent=2, ensure_ascii=False))
+    else:
+        import uvicorn
+        uvicorn.run(FakeOpenRouter(_pares(args.latencia, distribuicao), _pares(args.falhas)).app, host="127.0.0.1", port=args.porta)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de vazão de escrita: commit por requisição vs. escritor único com group commit.
+
+Cada "requisição" insere um exercício. No modo por requisição cada uma abre a
+própria sessão e faz commit (um fsync cada, disputando o lock do SQLite); no
+modo group commit todas passam pelo GroupCommitWriter.
+
+Uso:
+    python -m benchmarks.group_commit --escritas 2000 --concorrencias 1 8 32 128
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from models.base import Base
+from models.exercicios import Exercicios
+from database.session import configurar_engine_escrita, _configurar_sqlite
+from database.writer import GroupCommitWriter
+from sqlalchemy import event
+
+
+def _novo_exercicio(i: int) -> Exercicios:
+    # 30 nomes, como em EXERCICIOS_PERMITIDOS: o conteúdo se repete entre instâncias
+    return Exercicios(nome=f"Exercício {i % 30}", descricao="Descrição " * 20, vantagens="Vantagens " * 20, exercicio_ativo=True)
+
+
+async def _rodar(modo: str, db_path: str, escritas: int, concorrencia: int) -> dict:
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    event.listen(sync_engine, "connect", _configurar_sqlite)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", connect_args={"timeout": 30})
+    configurar_engine_escrita(async_engine)
+    SessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    writer = GroupCommitWriter(SessionLocal)
+
+    async def inserir(session, i):
+        session.add(_novo_exercicio(i))
+        await session.flush()
+
+    async def por_requisicao(i: int):
+        async with SessionLocal() as session:
+            async with session.begin():
+                await inserir(session, i)
+
+    async def group_commit(i: int):
+        await writer.submit(lambda session: inserir(session, i))
+
+    escrever = por_requisicao if modo == "por_requisicao" else group_commit
+    fila = iter(range(escritas))
+    erros = 0
+
+    async def usuario():
+        nonlocal erros
+        for i in fila:
+            try:
+                await escrever(i)
+            except Exception:
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[usuario() for _ in range(concorrencia)])
+    duracao = time.perf_counter() - inicio
+    await writer.stop()
+    await async_engine.dispose()
+
+    return {
+        "modo": modo,
+        "concorrencia": concorrencia,
+        "escritas_por_s": round(escritas / duracao, 1),
+        "erros": erros,
+        "lotes": writer.stats()["batches"] if modo == "group_commit" else escritas,
+    }
+
+
+async def main(escritas: int, concorrencias: list) -> list:
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for concorrencia in concorrencias:
+            for modo in ("por_requisicao", "group_commit"):
+                resultados.append(await _rodar(modo, db_path, escritas, concorrencia))
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escritas", type=int, default=2000)
+    parser.add_argument("--concorrencias", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.escritas, args.concorrencias)), indent=2, ensure_ascii=False))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Memória por exercício nos caches em memória da IA e de exercícios recentes.
+
+Compara as representações, com os mesmos textos:
+- antes_compartilhado: strings direto nos caches, o cache de recentes com os mesmos
+  objetos do L1 (geração no próprio processo, melhor caso da representação antiga)
+- antes_copias: strings direto nos caches, cada cache com suas próprias cópias (L1
+  relido do SQLite depois de uma sincronização, geração por streaming)
+- compacto: os dois caches guardam handles de uma cópia única de cada texto
+- compacto_frio: o mesmo, depois de todos os textos ficarem frios e serem comprimidos
+
+A medida é a memória alocada (tracemalloc) para popular os dois caches, dividida
+pelo número de exercícios.
+
+Uso:
+    python -m benchmarks.memoria_cache --exercicios 1000 --recentes 200
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache_lru import TTLCache
+from utils.conteudo_compacto import ContentStore, CompactCache
+
+CAMPOS = ("descricao", "vantagens", "passo_a_passo")
+MUSCULOS = ["pernas", "glúteos", "braços", "ombros", "costas", "peito", "core", "abdômen"]
+BENEFICIOS = ["força", "resistência", "equilíbrio", "postura", "mobilidade", "coordenação", "condicionamento"]
+
+
+def _chave(nome: str, campo: str) -> str:
+    # Mesmo formato de utils.ia.get_cache_key (sem importar o módulo, que abre o cache do host)
+    return f"{nome.lower()}_{campo}_{hashlib.md5(nome.encode()).hexdigest()[:8]}"
+
+
+def _textos(indice: int) -> Dict[str, str]:
+    """Respostas com o tamanho e o vocabulário das geradas pelo modelo"""
+    musculos = ", ".join(random.sample(MUSCULOS, 3))
+    beneficios = ", ".join(random.sample(BENEFICIOS, 3))
+    return {
+        "descricao": f"Exercício {indice} que trabalha {musculos} com movimentos controlados, ideal para iniciantes.",
+        "vantagens": f"Melhora {beneficios} e ajuda na saúde cardiovascular.",
+        "passo_a_passo": (f"1. Posicione-se com os pés afastados na largura dos ombros. "
+                          f"2. Execute o movimento {indice} mantendo o abdômen contraído. "
+                          f"3. Retorne à posição inicial controlando a respiração."),
+    }
+
+
+def _copia(texto: str) -> str:
+    # Objeto novo com o mesmo conteúdo, como uma leitura do SQLite ou uma resposta decodificada
+    return texto.encode("utf-8").decode("utf-8")
+
+
+def _popular(exercicios: List[Dict[str, str]], recentes: int, criar: Callable[[int], Any], copias: bool):
+    l1, recentes_cache = criar(len(exercicios) * len(CAMPOS)), criar(recentes)
+    for indice, textos in enumerate(exercicios):
+        nome = f"Exercício {indice}"
+        gerados = {campo: _copia(textos[campo]) for campo in CAMPOS}
+        for campo in CAMPOS:
+            l1[_chave(nome, campo)] = _copia(gerados[campo]) if copias else gerados[campo]
+        if indice >= len(exercicios) - recentes:
+            recentes_cache[nome] = gerados
+    return l1, recentes_cache
+
+
+def _medir(exercicios: List[Dict[str, str]], recentes: int, compacto: bool, copias: bool = True,
+           frio: bool = False) -> Dict[str, Any]:
+    # A primeira rodada inclui alocações únicas do interpretador e é descartada
+    for _ in range(2):
+        conteudos = ContentStore(frio_apos_seconds=0) if compacto else None
+        if compacto:
+            criar = lambda n: CompactCache(conteudos, TTLCache, max_entradas=n)
+        else:
+            criar = lambda n: TTLCache(max_entradas=n)
+        tracemalloc.start()
+        inicio = tracemalloc.get_traced_memory()[0]
+        caches = _popular(exercicios, recentes, criar, copias)
+        if frio:
+            conteudos.compactar()
+        usado = tracemalloc.get_traced_memory()[0] - inicio
+        tracemalloc.stop()
+        del caches
+    resultado = {"bytes_total": usado, "bytes_por_exercicio": round(usado / len(exercicios), 1)}
+    if conteudos is not None:
+        resultado["textos"] = conteudos.stats()
+    return resultado
+
+
+def executar(args) -> Dict[str, Any]:
+    random.seed(args.seed)
+    exercicios = [_textos(i) for i in range(args.exercicios)]
+    # Cenário comum: parte dos exercícios repete textos (sinônimos e nomes parecidos geram a mesma resposta)
+    for i in range(0, args.exercicios, max(1, int(1 / args.repetidos)) if args.repetidos else args.exercicios + 1):
+        exercicios[i] = dict(exercicios[random.randrange(args.exercicios)])
+
+    resultados = {
+        "antes_compartilhado": _medir(exercicios, args.recentes, compacto=False, copias=False),
+        "antes_copias": _medir(exercicios, args.recentes, compacto=False),
+        "compacto": _medir(exercicios, args.recentes, compacto=True),
+        "compacto_frio": _medir(exercicios, args.recentes, compacto=True, frio=True),
+    }
+    for nome in ("compacto", "compacto_frio"):
+        for base in ("antes_compartilhado", "antes_copias"):
+            resultados[nome][f"reducao_vs_{base}"] = round(
+                1 - resultados[nome]["bytes_total"] / resultados[base]["bytes_total"], 3
+            )
+    return {
+        "config": {"exercicios": args.exercicios, "recentes": args.recentes, "repetidos": args.repetidos, "seed": args.seed},
+        "resultados": resultados,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exercicios", type=int, default=1000, help="Exercícios no cache da IA (três campos cada)")
+    parser.add_argument("--recentes", type=int, default=20, help="Exercícios também no cache de recentes")
+    parser.add_argument("--repetidos", type=float, default=0.1, help="Fração de exercícios com textos repetidos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo para gravar o resultado (além da saída padrão)")
+    args = parser.parse_args()
+
+    saida = json.dumps(executar(args), indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
+    print(saida)
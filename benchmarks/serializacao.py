@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark da serialização das respostas: caminho antigo vs. caminho rápido,
+para 1, 100 e 10.000 linhas (--linhas).
+
+Casos:
+- exercicios: lista de ExercicioOut vinda do banco
+  - atual: objetos ORM -> validação from_attributes -> dump mode="json" -> json.dumps
+    (o que o FastAPI faz com response_model)
+  - rapido: select das colunas -> codificador_linhas (orjson) direto das tuplas
+  Medido só a serialização (dados já carregados) e com a consulta incluída
+- historico: dicts montados à mão (como /historico/exercicios/detalhado)
+  - atual: jsonable_encoder + JSONResponse; rapido: serializar()
+- export: linhas do export NDJSON
+  - atual: json.dumps por linha; rapido: codificador_linhas
+
+Cada caso também roda o caminho rápido sem orjson (fallback para o json da biblioteca padrão).
+O tempo é a mediana de --repeticoes medições, cada uma repetindo a operação por pelo
+menos --tempo-min segundos.
+
+Uso:
+    python -m benchmarks.serializacao --linhas 1 100 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from models.base import Base
+from models.exercicios import Exercicios
+from models.exercicios_conteudos import Exercicios_conteudos, calcular_hash
+from schemas.exercicios import ExercicioOut
+import utils.respostas as respostas
+
+CAMPOS_OUT = tuple(ExercicioOut.model_fields)
+COLUNAS_EXPORT = ["historico_id", "exercicio_id", "nome", "exercicio_ativo", "data_inicio", "data_conclusao"]
+LISTA_EXERCICIOS = TypeAdapter(List[ExercicioOut])
+
+
+def _popular(engine, linhas: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    textos = [(f"Descrição do exercício {i} para os músculos", "Melhora força e equilíbrio",
+               "1. Posicione-se. 2. Execute. 3. Retorne.") for i in range(1, linhas + 1)]
+    with engine.begin() as conn:
+        conn.execute(insert(Exercicios_conteudos), [
+            {"id": i, "nome": f"Exercício {i}", "versao": 1, "descricao": descricao, "vantagens": vantagens,
+             "passo_a_passo": passo_a_passo, "hash": calcular_hash(descricao, vantagens, passo_a_passo)}
+            for i, (descricao, vantagens, passo_a_passo) in enumerate(textos, start=1)
+        ])
+        conn.execute(insert(Exercicios), [
+            {"id": i, "nome": f"Exercício {i}", "conteudo_id": i, "exercicio_ativo": i % 2 == 0}
+            for i in range(1, linhas + 1)
+        ])
+
+
+def _consulta_colunas():
+    colunas = {
+        "id": Exercicios.id, "nome": Exercicios.nome, "exercicio_ativo": Exercicios.exercicio_ativo,
+        "descricao": Exercicios_conteudos.descricao, "vantagens": Exercicios_conteudos.vantagens,
+        "passo_a_passo": Exercicios_conteudos.passo_a_passo,
+    }
+    return (select(*(colunas[campo] for campo in CAMPOS_OUT))
+            .join(Exercicios_conteudos, Exercicios_conteudos.id == Exercicios.conteudo_id)
+            .order_by(Exercicios.id))
+
+
+def _lista_atual(objetos) -> bytes:
+    validados = LISTA_EXERCICIOS.validate_python(objetos, from_attributes=True)
+    return JSONResponse(LISTA_EXERCICIOS.dump_python(validados, mode="json")).body
+
+
+def _lista_rapida(codificar: Callable, linhas) -> bytes:
+    return b"[" + b",".join(map(codificar, linhas)) + b"]"
+
+
+def _historico(linhas: int) -> List[Dict[str, Any]]:
+    return [{
+        "id": i, "nome": f"Exercício {i}", "descricao": f"Descrição do exercício {i}", "vantagens": "Melhora força",
+        "exercicio_ativo": True, "total_concluido": 2,
+        "historico": [{"data_inicio": "01/06/2025 10:00:00", "data_conclusao": "01/06/2025 10:30:00"}] * 2,
+    } for i in range(linhas)]
+
+
+def _export(linhas: int) -> List[tuple]:
+    return [(i, i, f"Exercício {i}", i % 2 == 0, "2025-06-01T10:00:00", "2025-06-01T10:30:00") for i in range(linhas)]
+
+
+def _cronometrar(operacao: Callable[[], Any], tempo_min: float, repeticoes: int) -> float:
+    """Mediana, em microssegundos por chamada"""
+    operacao()
+    medicoes = []
+    for _ in range(repeticoes):
+        chamadas, inicio = 0, time.perf_counter()
+        while True:
+            operacao()
+            chamadas += 1
+            decorrido = time.perf_counter() - inicio
+            if decorrido >= tempo_min:
+                break
+        medicoes.append(decorrido / chamadas * 1e6)
+    return statistics.median(medicoes)
+
+
+def _casos(engine, linhas: int, incluir_atual: bool) -> Dict[str, Dict[str, Callable[[], Any]]]:
+    codificar_out = respostas.codificador_linhas(CAMPOS_OUT)
+    codificar_export = respostas.codificador_linhas(COLUNAS_EXPORT)
+    consulta = _consulta_colunas()
+    with Session(engine) as db:
+        objetos = db.query(Exercicios).order_by(Exercicios.id).all()
+        tuplas = db.execute(consulta).all()
+        db.expunge_all()
+    historico, export = _historico(linhas), _export(linhas)
+
+    def exercicios_total_atual():
+        with Session(engine) as db:
+            return _lista_atual(db.query(Exercicios).order_by(Exercicios.id).all())
+
+    def exercicios_total_rapido():
+        with Session(engine) as db:
+            return _lista_rapida(codificar_out, db.execute(consulta))
+
+    rapido = {
+        "exercicios": lambda: _lista_rapida(codificar_out, tuplas),
+        "exercicios_com_consulta": exercicios_total_rapido,
+        "historico": lambda: respostas.serializar(historico),
+        "export": lambda: b"".join(codificar_export(linha) + b"\n" for linha in export),
+    }
+    casos = {"rapido" if respostas.orjson is not None else "rapido_sem_orjson": rapido}
+    if not incluir_atual:
+        return casos
+    return {
+        "atual": {
+            "exercicios": lambda: _lista_atual(objetos),
+            "exercicios_com_consulta": exercicios_total_atual,
+            "historico": lambda: JSONResponse(jsonable_encoder(historico)).body,
+            "export": lambda: "".join(
+                json.dumps(dict(zip(COLUNAS_EXPORT, linha)), ensure_ascii=False) + "\n" for linha in export
+            ).encode("utf-8"),
+        },
+        **casos,
+    }
+
+
+def executar(args) -> Dict[str, Any]:
+    resultados: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        for linhas in args.linhas:
+            engine = create_engine(f"sqlite:///{os.path.join(diretorio, f'serializacao_{linhas}.db')}")
+            _popular(engine, linhas)
+            medidas: Dict[str, Dict[str, float]] = {}
+            # Com orjson instalado, uma segunda passada desliga o orjson para medir o fallback
+            modos = [False, True] if respostas.orjson is not None else [False]
+            for sem_orjson in modos:
+                orjson = respostas.orjson
+                if sem_orjson:
+                    respostas.orjson = None
+                try:
+                    for caminho, casos in _casos(engine, linhas, incluir_atual=not sem_orjson).items():
+                        for caso, operacao in casos.items():
+                            medidas.setdefault(caso, {})[caminho] = _cronometrar(operacao, args.tempo_min, args.repeticoes)
+                finally:
+                    respostas.orjson = orjson
+            engine.dispose()
+
+            resultados[str(linhas)] = {}
+            for caso, tempos in medidas.items():
+                resumo = {f"{caminho}_us": round(us, 1) for caminho, us in tempos.items()}
+                for caminho in ("rapido", "rapido_sem_orjson"):
+                    if "atual" in tempos and caminho in tempos:
+                        resumo[f"ganho_{caminho}"] = round(tempos["atual"] / tempos[caminho], 2)
+                resultados[str(linhas)][caso] = resumo
+            print(f"{linhas} linhas: {resultados[str(linhas)]}", file=sys.stderr)
+
+    return {
+        "config": {
+            "linhas": args.linhas, "repeticoes": args.repeticoes, "tempo_min": args.tempo_min,
+            "orjson": getattr(respostas.orjson, "__version__", None), "python": sys.version.split()[0],
+        },
+        "resultados": resultados,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1, 100, 10000], help="Tamanhos das respostas")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Medições por caso (usa a mediana)")
+    parser.add_argument("--tempo-min", type=float, default=0.2, help="Segundos mínimos de cada medição")
+    parser.add_argument("--saida", help="Arquivo para gravar o resultado (além da saída padrão)")
+    args = parser.parse_args()
+
+    saida = json.dumps(executar(args), indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida + "\n")
+    print(saida)
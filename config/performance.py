@@ -1,11 +1,25 @@
 # Configurações de Performance para Otimização da IA
 
+import os
+
 # Configurações de Cache
 CACHE_CONFIG = {
-    "max_memory_cache_size": 500,  # Máximo de itens no cache em memória
-    "cache_ttl_hours": 24,  # Tempo de vida do cache em horas
-    "preload_popular_exercises": True,  # Pré-carregar exercícios populares
-    "auto_cleanup_interval_hours": 1,  # Limpeza automática do cache
+    "max_memory_cache_size": 500,  # Máximo de itens no cache em memória (L1 da IA)
+    "max_memory_cache_bytes": 8 * 1024 * 1024,  # Limite em bytes do L1 da IA
+    "cache_ttl_hours": 24,  # Tempo de vida das entradas em memória (depois relidas do cache compartilhado)
+    # Pré-carregar exercícios populares no startup (PRELOAD_POPULAR_EXERCISES=false desliga)
+    "preload_popular_exercises": os.getenv("PRELOAD_POPULAR_EXERCISES", "true").lower() == "true",
+    "auto_cleanup_interval_hours": 1,  # Intervalo mínimo entre varreduras de entradas vencidas
+    "recent_cache_size": 20,  # Exercícios recém-gerados guardados por routes/exercicios.py
+    "recent_cache_ttl_hours": 1,
+    "compress_cold_texts": True,  # Comprime (zlib) textos em memória que não são lidos há um tempo
+    "cold_after_seconds": 600,  # Sem leitura por este tempo o texto é considerado frio
+    "compaction_interval_seconds": 60,  # Intervalo mínimo entre varreduras de textos frios
+    "shared_sync_interval_seconds": 1.0,  # Frequência máxima de checagem de escritas de outros workers
+    "shared_lease_seconds": 30.0,  # Validade da reserva de geração de uma chave (worker que morreu no meio)
+    "shared_poll_interval_seconds": 0.1,  # Espera entre checagens de quem aguarda outro worker gerar
+    "response_cache_size": 512,  # Respostas de leitura serializadas (ETag), por recurso/URL
+    "response_cache_max_bytes": 8 * 1024 * 1024,
 }
 
 # Configurações de IA
@@ -15,9 +29,24 @@ AI_CONFIG = {
     "max_tokens_description": 60,
     "max_tokens_benefits": 50,
     "max_tokens_steps": 90,
+    "max_tokens_fused": 240,  # Descrição + vantagens + passos em uma única resposta JSON
+    "generation_mode": "fused",  # "fused" (uma chamada por exercício) ou "per_field" (uma por campo)
     "temperature": 0.3,  # Menor variabilidade
-    "timeout_seconds": 8,  # Timeout agressivo
-    "max_retries": 2,
+    "timeout_seconds": 8,  # Prazo total da geração de um exercício
+    "max_retries": 2,  # Modelos extras tentados (hedge ou falha) além do primeiro
+    "hedge_enabled": True,  # Dispara o fallback em paralelo quando o principal demora
+    "hedge_percentile": 0.95,  # Percentil da latência recente do principal que dispara o hedge
+    "hedge_initial_delay_seconds": 2.0,  # Espera antes do hedge enquanto não há amostras de latência
+    "hedge_min_delay_seconds": 0.3,
+    "hedge_max_delay_seconds": 5.0,
+    "router_latency_window": 100,  # Chamadas recentes por (modelo, tipo de prompt) nas estatísticas
+    "router_initial_latency_seconds": 2.0,  # Latência presumida de um modelo ainda sem amostras
+    "router_timeout_multiplier": 2.0,  # Timeout da tentativa = p95 do modelo x multiplicador
+    "router_min_timeout_seconds": 1.0,
+    "router_max_timeout_seconds": 15.0,  # Também usado enquanto o modelo não tem amostras
+    "router_exploration_rate": 0.05,  # Fração das escolhas que testa outro modelo
+    "breaker_failure_threshold": 5,  # Falhas seguidas que abrem o circuito do modelo
+    "breaker_open_seconds": 30,  # Tempo com o modelo pulado antes da chamada de teste
 }
 
 # Configurações de HTTP
@@ -31,6 +60,53 @@ HTTP_CONFIG = {
     "enable_http2": True,
 }
 
+# Governador das chamadas de saída para o OpenRouter
+GOVERNOR_CONFIG = {
+    "requests_per_second": 5.0,  # Taxa sustentada (token bucket)
+    "burst": 10,  # Chamadas permitidas de uma vez com o bucket cheio
+    "max_concurrency": 20,  # Chamadas abertas ao mesmo tempo (abaixo do limite do pool HTTP)
+    "interactive_reserved": 5,  # Vagas que o trabalho em background nunca ocupa
+    "backoff_initial_seconds": 1.0,  # Pausa do background após o primeiro 429
+    "backoff_max_seconds": 60.0,
+}
+
+# Configurações do banco de dados (SQLite em modo WAL)
+DATABASE_CONFIG = {
+    "busy_timeout_seconds": 30,  # Espera pelo lock de escrita antes de "database is locked"
+    "read_pool_size": 8,  # Conexões somente leitura mantidas no pool
+    "read_pool_overflow": 8,  # Conexões extras de leitura em picos
+    "writer_max_batch_size": 64,  # Máximo de escritas confirmadas em um único commit
+    "writer_max_wait_ms": 2,  # Espera máxima por mais escritas antes de confirmar o lote
+}
+
+# Pool de exercícios prontos para servir (reabastecido em background)
+WARM_POOL_CONFIG = {
+    "enabled": os.getenv("WARM_POOL_ENABLED", "true").lower() == "true",
+    "low_watermark": 3,  # Abaixo disso o reabastecimento é acionado
+    "high_watermark": 10,  # O reabastecimento enche o pool até aqui
+    "refill_concurrency": 2,  # Gerações simultâneas durante o reabastecimento
+    "retry_wait_seconds": 5.0,  # Pausa após uma rodada sem nenhuma geração bem-sucedida
+}
+
+# Jobs de geração disparados pela conclusão de exercícios
+GENERATION_JOBS_CONFIG = {
+    "workers": 4,  # Gerações simultâneas compartilhadas por todas as conclusões
+    "max_finished_jobs": 1000,  # Jobs terminados mantidos para consulta de status
+    "max_long_poll_seconds": 30,  # Espera máxima aceita no long-poll de status
+    "heartbeat_seconds": 5.0,  # Renovação dos jobs abertos de cada worker no arquivo compartilhado
+    "expire_seconds": 30.0,  # Sem heartbeat por este tempo o job é retomado por outro worker
+    "poll_interval_seconds": 0.2,  # Espera entre consultas do long-poll de um job de outro worker
+}
+
+# Perfis de CPU por requisição e acompanhamento de memória (ativos só com PROFILING_TOKEN)
+PROFILING_CONFIG = {
+    "output_dir": os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles"),
+    "header": "X-Profile",  # Header (ou parâmetro ?profile=) com o token para perfilar a requisição
+    "query_param": "profile",
+    "max_profiles": 50,  # Perfis mais antigos são apagados
+    "tracemalloc_frames": 10,  # Profundidade dos tracebacks guardados pelo tracemalloc
+}
+
 # Exercícios prioritários para preload
 PRIORITY_EXERCISES = [
     "Polichinelo",
@@ -54,8 +130,9 @@ EXERCISE_FALLBACKS = {
 
 # Configurações de monitoramento
 MONITORING_CONFIG = {
-    "log_response_times": True,
-    "log_cache_hits": True,
+    "metrics_enabled": True,  # Middleware de métricas e endpoint /metrics (formato Prometheus)
+    "log_response_times": True,  # Evento estruturado para requisições acima do limite
+    "log_cache_hits": True,  # Contadores de hit/miss dos caches de exercícios
     "log_ai_errors": True,
     "performance_threshold_ms": 5000,  # Alertar se > 5 segundos
 } 
\ No newline at end of file
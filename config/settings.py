@@ -4,9 +4,26 @@ import os
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# Permite apontar para um servidor local (benchmarks/fake_openrouter.py)
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "db", "mvp.db")
+DB_PATH = os.getenv(
+    "DATABASE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "db", "mvp.db")
+)
+# Estado dos jobs de geração, compartilhado pelos workers do host (utils/jobs.py)
+JOBS_DB_PATH = os.getenv("JOBS_DATABASE_PATH", os.path.join(os.path.dirname(DB_PATH), "jobs.db"))
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+# Conexões somente leitura (pool de leitores)
+READONLY_SQLALCHEMY_DATABASE_URL = f"sqlite:///file:{DB_PATH}?mode=ro&uri=true"
+
+# Verificação do schema no startup: "auto" (só se PRAGMA user_version estiver desatualizado),
+# "always" (create_all e índices a cada startup) ou "off" (banco preparado à parte, ex.: create_db.py)
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "auto")
+
+# Perfis sob demanda e rotas /admin só existem com um token definido
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
 
 APP_NAME = "API de Exercícios"
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
@@ -16,10 +16,11 @@ from models.base import Base
 from models.exercicios import Exercicios
 from models.exercicios_ativos import Exercicios_ativos
 from models.exercicios_historico import Exercicios_historicos
+from database.schema import criar_schema
 
 def init_db():
     print("Criando as tabelas do banco de dados...")
-    Base.metadata.create_all(bind=engine)
+    criar_schema(engine)
     print("Tabelas criadas com sucesso!")
 
 if __name__ == "__main__":
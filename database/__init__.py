@@ -1,3 +1,9 @@
-from .database import get_db, engine
+# Exportações resolvidas sob demanda: importar database.session (ou outro submódulo)
+# não cria o engine legado de database.database
+def __getattr__(nome):
+    if nome in ("get_db", "engine"):
+        from . import database
+        return getattr(database, nome)
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
-__all__ = ['get_db', 'engine', 'init_db'] 
\ No newline at end of file
+__all__ = ['get_db', 'engine', 'init_db'] 
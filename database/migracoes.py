@@ -0,0 +1,83 @@
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from models.exercicios import Exercicios
+from models.exercicios_conteudos import Exercicios_conteudos, calcular_hash
+
+# Versão do schema gravada em PRAGMA user_version. Incrementar também ao adicionar tabelas
+# ou índices: no modo "auto" o startup só verifica o schema quando a versão está atrasada
+VERSAO_SCHEMA = 1
+
+def versao_atual(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def aplicar_migracoes(engine: Engine) -> None:
+    """Leva um banco existente até VERSAO_SCHEMA (bancos novos já nascem atualizados)"""
+    if versao_atual(engine) >= VERSAO_SCHEMA:
+        return
+
+    colunas = {c["name"] for c in inspect(engine).get_columns("exercicios")}
+    if "descricao" in colunas:
+        _migrar_conteudos(engine)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {VERSAO_SCHEMA}")
+
+def _migrar_conteudos(engine: Engine) -> None:
+    """
+    Versão 1: o texto gerado sai de cada linha de exercicios para exercicios_conteudos.
+    Cada (nome, descrição, vantagens, passo a passo) distinto vira uma versão do
+    conteúdo daquele nome; a tabela exercicios é recriada sem as colunas de texto.
+    """
+    print("Migrando exercícios para o catálogo de conteúdos...")
+    with engine.connect() as conn:
+        # Recriar a tabela exige desligar as FKs, o que só vale fora de transação
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.commit()
+        with conn.begin():
+            _deduplicar(conn)
+            _recriar_exercicios(conn)
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+        conn.commit()
+
+def _deduplicar(conn: Connection) -> None:
+    distintos = conn.execute(text(
+        "SELECT nome, descricao, vantagens, passo_a_passo, MIN(id) AS primeiro "
+        "FROM exercicios GROUP BY nome, descricao, vantagens, passo_a_passo "
+        "ORDER BY nome, primeiro"
+    )).all()
+
+    versoes = {}
+    for nome, descricao, vantagens, passo_a_passo, _ in distintos:
+        versoes[nome] = versoes.get(nome, 0) + 1
+        conn.execute(
+            text(
+                "INSERT INTO exercicios_conteudos (nome, versao, descricao, vantagens, passo_a_passo, hash) "
+                "VALUES (:nome, :versao, :descricao, :vantagens, :passo_a_passo, :hash)"
+            ),
+            {
+                "nome": nome, "versao": versoes[nome], "descricao": descricao, "vantagens": vantagens,
+                "passo_a_passo": passo_a_passo, "hash": calcular_hash(descricao, vantagens, passo_a_passo)
+            }
+        )
+    print(f"{len(distintos)} conteúdos distintos")
+
+def _recriar_exercicios(conn: Connection) -> None:
+    tabela = Exercicios.__table__
+    metadata = MetaData()
+    Exercicios_conteudos.__table__.to_metadata(metadata)  # Alvo da FK conteudo_id
+    tabela_nova = tabela.to_metadata(metadata, name="exercicios_novo")
+    # Os índices são recriados com os nomes originais depois da troca
+    tabela_nova.indexes.clear()
+    tabela_nova.create(conn)
+
+    conn.execute(text(
+        "INSERT INTO exercicios_novo (id, nome, conteudo_id, exercicio_ativo) "
+        "SELECT e.id, e.nome, c.id, e.exercicio_ativo FROM exercicios e "
+        "JOIN exercicios_conteudos c ON c.nome = e.nome AND c.descricao = e.descricao "
+        "AND c.vantagens = e.vantagens AND c.passo_a_passo IS e.passo_a_passo"
+    ))
+    conn.exec_driver_sql("DROP TABLE exercicios")
+    conn.exec_driver_sql("ALTER TABLE exercicios_novo RENAME TO exercicios")
+    for indice in tabela.indexes:
+        indice.create(conn)
@@ -0,0 +1,31 @@
+from sqlalchemy.engine import Engine
+from models.base import Base
+# Importa os modelos para registrá-los no metadata
+from models import exercicios, exercicios_ativos, exercicios_historico, exercicios_conteudos, contadores  # noqa: F401
+from database.migracoes import aplicar_migracoes, versao_atual, VERSAO_SCHEMA
+
+def criar_schema(engine: Engine) -> None:
+    """
+    Cria tabelas, aplica migrações de bancos antigos e cria índices que ainda não existem.
+    create_all não adiciona índices novos em tabelas já existentes,
+    então eles são verificados um a um.
+    """
+    Base.metadata.create_all(bind=engine)
+    aplicar_migracoes(engine)
+    for tabela in Base.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(bind=engine, checkfirst=True)
+
+def preparar_schema(engine: Engine, modo: str = "auto") -> bool:
+    """
+    Verificação do schema no startup, conforme `modo`:
+    - "always": criar_schema completo
+    - "auto": criar_schema só se PRAGMA user_version estiver abaixo de VERSAO_SCHEMA
+      (banco novo ou antigo); com o banco em dia custa uma consulta
+    - "off": nada (o banco é preparado à parte)
+    Retorna True se o schema foi verificado.
+    """
+    if modo == "off" or (modo == "auto" and versao_atual(engine) >= VERSAO_SCHEMA):
+        return False
+    criar_schema(engine)
+    return True
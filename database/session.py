@@ -1,22 +1,93 @@
+import os
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from config.settings import SQLALCHEMY_DATABASE_URL
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from config.settings import SQLALCHEMY_DATABASE_URL, ASYNC_SQLALCHEMY_DATABASE_URL, READONLY_SQLALCHEMY_DATABASE_URL, DB_PATH
+from config.performance import DATABASE_CONFIG
+from database.writer import GroupCommitWriter
+from utils.metricas import instrumentar_engine
 
-# Configuração do engine com pool de conexões
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+def _configurar_sqlite(dbapi_connection, connection_record):
+    """WAL permite leitores concorrentes com o escritor; synchronous=NORMAL é seguro em WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+# Engine síncrono de leitura e escrita (schema, scripts e sessões síncronas)
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    pool_pre_ping=True,  # Verifica conexões antes de usar
-    pool_recycle=3600,   # Recicla conexões após 1 hora
-    pool_size=5,         # Número máximo de conexões
-    max_overflow=10      # Número máximo de conexões extras
+    connect_args={"check_same_thread": False, "timeout": DATABASE_CONFIG["busy_timeout_seconds"]}
 )
+event.listen(engine, "connect", _configurar_sqlite)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Pool de conexões somente leitura para as rotas de consulta
+read_engine = create_engine(
+    READONLY_SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": DATABASE_CONFIG["busy_timeout_seconds"]},
+    pool_size=DATABASE_CONFIG["read_pool_size"],
+    max_overflow=DATABASE_CONFIG["read_pool_overflow"]
+)
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Engine assíncrono (aiosqlite) para rotas async: o I/O do SQLite roda fora do event loop
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    connect_args={"timeout": DATABASE_CONFIG["busy_timeout_seconds"]}
+)
+
+def configurar_engine_escrita(async_engine) -> None:
+    """Prepara um engine aiosqlite para o escritor: WAL, SAVEPOINT funcional e BEGIN IMMEDIATE"""
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        _configurar_sqlite(dbapi_connection, connection_record)
+        # Transações controladas pelo SQLAlchemy (necessário para SAVEPOINT funcionar no pysqlite)
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(async_engine.sync_engine, "begin")
+    def _begin(conn):
+        # Pega o lock de escrita já no início: o escritor nunca precisa "promover" a transação
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+configurar_engine_escrita(async_engine)
+
+# Tempo de cada comando SQL, por operação, nas métricas
+for _engine in (engine, read_engine, async_engine.sync_engine):
+    instrumentar_engine(_engine)
+
+# expire_on_commit=False: objetos continuam legíveis após o commit sem nova consulta
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Escritor único: todas as escritas das rotas passam por ele (group commit)
+writer = GroupCommitWriter(
+    AsyncSessionLocal,
+    max_batch_size=DATABASE_CONFIG["writer_max_batch_size"],
+    max_wait_ms=DATABASE_CONFIG["writer_max_wait_ms"]
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_writer() -> GroupCommitWriter:
+    return writer
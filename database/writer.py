@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+T = TypeVar("T")
+
+# Operação de escrita: recebe a sessão do lote e devolve o resultado para o chamador
+OperacaoEscrita = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class GroupCommitWriter:
+    """
+    Escritor único do SQLite com group commit:
+    1. Todas as escritas entram em uma fila atendida por uma única task
+    2. A task junta até max_batch_size operações; só espera (até max_wait_ms) por
+       mais operações quando o lote anterior indicou concorrência
+    3. O lote roda em uma única transação e é confirmado com um único commit
+    4. Se alguma operação falha, o lote é refeito com um SAVEPOINT por operação,
+       de modo que a falha de uma não derruba as outras
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ultimo_lote = 0
+        self._stats = {
+            "batches": 0, "operations": 0, "failed_operations": 0, "failed_commits": 0,
+            "isolated_retries": 0, "commit_seconds": 0.0
+        }
+
+    def start(self) -> None:
+        """Inicia a task escritora no event loop atual (idempotente)"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Processa o que está na fila e encerra a task escritora"""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, operacao: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """
+        Enfileira a operação e aguarda o commit do lote em que ela entrou.
+        A operação pode ser executada de novo se o lote for refeito, então não
+        deve ter efeitos fora da sessão recebida.
+        """
+        self.start()
+        futuro = asyncio.get_running_loop().create_future()
+        await self._queue.put((operacao, futuro))
+        return await futuro
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._queue.get()]
+            # Sem concorrência recente não vale a pena atrasar o commit esperando companhia
+            limite = loop.time() + (self.max_wait if self._ultimo_lote > 1 else 0)
+            while len(lote) < self.max_batch_size:
+                restante = limite - loop.time()
+                try:
+                    if restante <= 0:
+                        lote.append(self._queue.get_nowait())
+                    else:
+                        lote.append(await asyncio.wait_for(self._queue.get(), restante))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            self._ultimo_lote = len(lote)
+            try:
+                await self._commit_lote([item for item in lote if not item[1].cancelled()])
+            finally:
+                for _ in lote:
+                    self._queue.task_done()
+
+    async def _commit_lote(self, lote: List[Tuple[OperacaoEscrita, asyncio.Future]]) -> None:
+        inicio = time.perf_counter()
+        try:
+            resultados = await self._executar(lote, isolado=False)
+        except Exception:
+            # Alguma operação falhou: refaz o lote isolando cada uma em um SAVEPOINT
+            self._stats["isolated_retries"] += 1
+            try:
+                resultados = await self._executar(lote, isolado=True)
+            except Exception as e:
+                # Commit falhou: nenhuma operação do lote foi persistida
+                self._stats["failed_commits"] += 1
+                resultados = [(futuro, None, e) for _, futuro in lote]
+
+        self._stats["batches"] += 1
+        self._stats["operations"] += len(lote)
+        self._stats["commit_seconds"] += time.perf_counter() - inicio
+
+        for futuro, resultado, erro in resultados:
+            if futuro.done():
+                continue
+            if erro is not None:
+                self._stats["failed_operations"] += 1
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(resultado)
+
+    async def _executar(self, lote: List[Tuple[OperacaoEscrita, asyncio.Future]],
+                        isolado: bool) -> List[Tuple[asyncio.Future, Any, Optional[BaseException]]]:
+        resultados = []
+        async with self.session_factory() as session:
+            async with session.begin():
+                for operacao, futuro in lote:
+                    if not isolado:
+                        resultados.append((futuro, await operacao(session), None))
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            resultado = await operacao(session)
+                        resultados.append((futuro, resultado, None))
+                    except Exception as e:
+                        resultados.append((futuro, None, e))
+        return resultados
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "commit_seconds": round(self._stats["commit_seconds"], 3),
+            "avg_batch_size": round(self._stats["operations"] / batches, 2) if batches else 0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._task is not None and not self._task.done(),
+        }
@@ -33,6 +33,7 @@ def main():
         ("pip install --upgrade pydantic", "Atualizando Pydantic"),
         ("pip install --upgrade uvicorn[standard]", "Atualizando Uvicorn"),
         ("pip install psutil", "Instalando monitor de sistema"),
+        ("pip install orjson", "Instalando orjson (serialização JSON rápida)"),
     ]
     
     success_count = 0
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String
+from models.base import Base
+
+class Contadores(Base):
+    __tablename__ = "contadores"
+
+    nome = Column(String(50), primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, nome: str, valor: int = 0):
+        self.nome = nome
+        self.valor = valor
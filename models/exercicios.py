@@ -1,25 +1,64 @@
-from sqlalchemy import Column, Integer, String, Index, Boolean
+from typing import Optional
+from sqlalchemy import Column, Integer, String, Index, Boolean, ForeignKey
+from sqlalchemy.orm import relationship
 from models.base import Base
+from models.exercicios_conteudos import Exercicios_conteudos
 
 class Exercicios(Base):
     __tablename__ = 'exercicios'
 
     id = Column(Integer, primary_key=True)
     nome = Column(String(100), nullable=False)
-    descricao = Column(String(500), nullable=False)
-    vantagens = Column(String(500), nullable=False)
-    passo_a_passo = Column(String(500), nullable=True)
+    conteudo_id = Column(Integer, ForeignKey("exercicios_conteudos.id"), nullable=False)
     exercicio_ativo = Column(Boolean, nullable=False, default=False)
 
+    # Texto compartilhado entre todas as instâncias do mesmo exercício (carregado junto, sem N+1)
+    conteudo = relationship(Exercicios_conteudos, lazy="joined")
+
     # Adicionando índices
     __table_args__ = (
         Index('idx_exercicios_nome', 'nome'),
         Index('idx_exercicios_ativo', 'exercicio_ativo'),
+        Index('idx_exercicios_conteudo_id', 'conteudo_id'),
     )
 
-    def __init__(self, nome:str, descricao:str, vantagens:str, passo_a_passo:str = None, exercicio_ativo:bool = False):
+    def __init__(self, nome:str, descricao:str = None, vantagens:str = None, passo_a_passo:str = None, exercicio_ativo:bool = False,
+                 conteudo: Optional[Exercicios_conteudos] = None):
         self.nome = nome
-        self.descricao = descricao
-        self.vantagens = vantagens
-        self.passo_a_passo = passo_a_passo
+        self.conteudo = conteudo or Exercicios_conteudos(nome, descricao, vantagens, passo_a_passo)
         self.exercicio_ativo = exercicio_ativo
+
+    # Campos de texto expostos como antes; alterar um deles cria (ou reaproveita) outra versão do conteúdo
+    @property
+    def descricao(self) -> Optional[str]:
+        return self.conteudo.descricao if self.conteudo else None
+
+    @descricao.setter
+    def descricao(self, valor: str) -> None:
+        self._alterar_conteudo(descricao=valor)
+
+    @property
+    def vantagens(self) -> Optional[str]:
+        return self.conteudo.vantagens if self.conteudo else None
+
+    @vantagens.setter
+    def vantagens(self, valor: str) -> None:
+        self._alterar_conteudo(vantagens=valor)
+
+    @property
+    def passo_a_passo(self) -> Optional[str]:
+        return self.conteudo.passo_a_passo if self.conteudo else None
+
+    @passo_a_passo.setter
+    def passo_a_passo(self, valor: Optional[str]) -> None:
+        self._alterar_conteudo(passo_a_passo=valor)
+
+    def _alterar_conteudo(self, **alteracoes) -> None:
+        """Copy-on-write: o conteúdo atual é compartilhado, então nunca é alterado no lugar"""
+        campos = {
+            "descricao": self.descricao,
+            "vantagens": self.vantagens,
+            "passo_a_passo": self.passo_a_passo,
+            **alteracoes
+        }
+        self.conteudo = Exercicios_conteudos(self.nome, **campos)
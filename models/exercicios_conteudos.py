@@ -0,0 +1,128 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy import Column, Integer, String, Index, UniqueConstraint, event, select, func
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models.base import Base
+
+class Exercicios_conteudos(Base):
+    """Texto gerado de um exercício, guardado uma única vez por (nome, versão)"""
+    __tablename__ = "exercicios_conteudos"
+
+    id = Column(Integer, primary_key=True)
+    nome = Column(String(100), nullable=False)
+    versao = Column(Integer, nullable=False)
+    descricao = Column(String(500), nullable=False)
+    vantagens = Column(String(500), nullable=False)
+    passo_a_passo = Column(String(500), nullable=True)
+    hash = Column(String(32), nullable=False)
+
+    # Adicionando índices
+    __table_args__ = (
+        UniqueConstraint('nome', 'versao', name='uq_exercicios_conteudos_nome_versao'),
+        Index('idx_exercicios_conteudos_nome_hash', 'nome', 'hash'),
+    )
+
+    def __init__(self, nome: str, descricao: str, vantagens: str, passo_a_passo: Optional[str] = None, versao: Optional[int] = None):
+        self.nome = nome
+        self.descricao = descricao
+        self.vantagens = vantagens
+        self.passo_a_passo = passo_a_passo
+        self.versao = versao
+        self.hash = calcular_hash(descricao, vantagens, passo_a_passo)
+
+def calcular_hash(descricao: Optional[str], vantagens: Optional[str], passo_a_passo: Optional[str]) -> str:
+    """Identifica o texto do conteúdo (independente da versão)"""
+    return hashlib.md5("\x00".join(v or "" for v in (descricao, vantagens, passo_a_passo)).encode()).hexdigest()
+
+# Conteúdos já confirmados no banco, por (url do banco, nome, hash). Como o conteúdo é
+# imutável, uma linha conhecida pode ser anexada à sessão sem consultar o banco de novo.
+_CONTEUDOS_CONHECIDOS_MAX = 1024
+_conteudos_conhecidos: "OrderedDict[Tuple[str, str, str], tuple]" = OrderedDict()
+_CAMPOS_CACHE = ("id", "nome", "versao", "descricao", "vantagens", "passo_a_passo", "hash")
+
+def _chave_cache(session: Session, conteudo: Exercicios_conteudos) -> Tuple[str, str, str]:
+    return (str(session.get_bind().url), conteudo.nome, conteudo.hash)
+
+def _conteudo_conhecido(session: Session, chave: Tuple[str, str, str]) -> Optional[Exercicios_conteudos]:
+    valores = _conteudos_conhecidos.get(chave)
+    if valores is None:
+        return None
+    _conteudos_conhecidos.move_to_end(chave)
+    dados = dict(zip(_CAMPOS_CACHE, valores))
+    conteudo = Exercicios_conteudos(dados["nome"], dados["descricao"], dados["vantagens"], dados["passo_a_passo"], dados["versao"])
+    conteudo.id = dados["id"]
+    make_transient_to_detached(conteudo)
+    return session.merge(conteudo, load=False)
+
+def _lembrar_conteudo(session: Session, conteudo: Exercicios_conteudos) -> None:
+    """Só entra no cache depois do commit: linhas de uma transação desfeita nunca são lembradas"""
+    session.info.setdefault("conteudos_pendentes", []).append(
+        (_chave_cache(session, conteudo), conteudo)
+    )
+
+@event.listens_for(Session, "after_commit")
+def _confirmar_conteudos(session: Session) -> None:
+    for chave, conteudo in session.info.pop("conteudos_pendentes", []):
+        if conteudo.id is None:
+            continue
+        _conteudos_conhecidos[chave] = tuple(conteudo.__dict__.get(campo) for campo in _CAMPOS_CACHE)
+        _conteudos_conhecidos.move_to_end(chave)
+        while len(_conteudos_conhecidos) > _CONTEUDOS_CONHECIDOS_MAX:
+            _conteudos_conhecidos.popitem(last=False)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_conteudos(session: Session, previous_transaction) -> None:
+    session.info.pop("conteudos_pendentes", None)
+
+@event.listens_for(Exercicios_conteudos.__table__, "after_drop")
+def _limpar_conteudos_conhecidos(target, connection, **kw) -> None:
+    _conteudos_conhecidos.clear()
+
+@event.listens_for(Session, "before_flush")
+def _deduplicar_conteudos(session: Session, flush_context, instances) -> None:
+    """
+    Antes de gravar, troca conteúdos novos por um já existente com o mesmo texto
+    (mesmo nome e hash). Conteúdos realmente novos recebem a próxima versão do nome.
+    """
+    novos = [obj for obj in session.new if isinstance(obj, Exercicios_conteudos)]
+    if not novos:
+        return
+
+    from models.exercicios import Exercicios
+    exercicios = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, Exercicios)]
+    escolhidos = {}
+    proximas_versoes = {}
+
+    with session.no_autoflush:
+        for conteudo in novos:
+            chave = (conteudo.nome, conteudo.hash)
+            existente = escolhidos.get(chave)
+            if existente is None:
+                existente = _conteudo_conhecido(session, _chave_cache(session, conteudo))
+            if existente is None:
+                existente = session.execute(
+                    select(Exercicios_conteudos)
+                    .where(Exercicios_conteudos.nome == conteudo.nome, Exercicios_conteudos.hash == conteudo.hash)
+                    .limit(1)
+                ).scalars().first()
+                if existente is not None:
+                    _lembrar_conteudo(session, existente)
+
+            if existente is not None:
+                for exercicio in exercicios:
+                    if exercicio.conteudo is conteudo:
+                        exercicio.conteudo = existente
+                session.expunge(conteudo)
+                escolhidos[chave] = existente
+                continue
+
+            if conteudo.nome not in proximas_versoes:
+                atual = session.scalar(
+                    select(func.max(Exercicios_conteudos.versao)).where(Exercicios_conteudos.nome == conteudo.nome)
+                )
+                proximas_versoes[conteudo.nome] = (atual or 0) + 1
+            conteudo.versao = proximas_versoes[conteudo.nome]
+            proximas_versoes[conteudo.nome] += 1
+            escolhidos[chave] = conteudo
+            _lembrar_conteudo(session, conteudo)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from models.base import Base
 
 class Exercicios_historicos(Base):
@@ -11,6 +11,12 @@ class Exercicios_historicos(Base):
     data_inicio = Column(DateTime, nullable=False)
     data_conclusao = Column(DateTime, nullable=True)
 
+    # Adicionando índices
+    __table_args__ = (
+        Index('idx_exercicios_historicos_exercicio_id', 'exercicio_id'),
+        Index('idx_exercicios_historicos_data_conclusao', 'data_conclusao'),
+    )
+
     def __init__(self, exercicio_id:int, data_inicio: Optional[datetime] = None, data_conclusao: Optional[datetime] = None):
         self.exercicio_id = exercicio_id
         self.data_inicio = data_inicio or datetime.now()
@@ -0,0 +1,18 @@
+import argparse
+from database.session import SessionLocal
+from utils.contadores import reconciliar_contadores
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula os contadores de exercícios e verifica divergências")
+    parser.add_argument("--apenas-verificar", action="store_true", help="Só relata a diferença, sem corrigir")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        relatorio = reconciliar_contadores(db, corrigir=not args.apenas_verificar)
+    finally:
+        db.close()
+
+    for nome, dados in relatorio.items():
+        status = "ok" if dados["diferenca"] == 0 else f"divergência de {dados['diferenca']}"
+        print(f"{nome}: armazenado={dados['armazenado']} real={dados['real']} ({status})")
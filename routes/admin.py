@@ -0,0 +1,58 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from config.performance import PROFILING_CONFIG
+from config import settings
+from utils.profiling import MemoryTracker, token_valido
+
+def verificar_token(x_admin_token: Optional[str] = Header(None)):
+    if not token_valido(x_admin_token, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(verificar_token)], include_in_schema=False)
+
+memoria = MemoryTracker(PROFILING_CONFIG["output_dir"])
+
+@router.get("/profiles")
+def listar_perfis():
+    """Perfis de CPU gravados pelo ProfilingMiddleware (mais recentes primeiro)"""
+    diretorio = PROFILING_CONFIG["output_dir"]
+    if not os.path.isdir(diretorio):
+        return {"profiles": []}
+    nomes = [nome for nome in os.listdir(diretorio) if nome.endswith(".prof")]
+    return {"profiles": sorted(nomes, reverse=True)}
+
+@router.get("/profiles/{nome}")
+def baixar_perfil(nome: str):
+    """Arquivo pstats do perfil, para abrir no snakeviz/gprof2dot"""
+    caminho = os.path.join(PROFILING_CONFIG["output_dir"], os.path.basename(nome))
+    if not nome.endswith(".prof") or not os.path.isfile(caminho):
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(caminho, media_type="application/octet-stream", filename=os.path.basename(nome))
+
+@router.post("/tracemalloc/start")
+def iniciar_tracemalloc(frames: int = Query(PROFILING_CONFIG["tracemalloc_frames"], ge=1, le=100)):
+    return memoria.iniciar(frames)
+
+@router.post("/tracemalloc/stop")
+def parar_tracemalloc():
+    return memoria.parar()
+
+@router.post("/tracemalloc/snapshot")
+def snapshot_tracemalloc():
+    """Marca o estado atual como base dos próximos diffs"""
+    if not memoria.ativo:
+        raise HTTPException(status_code=409, detail="tracemalloc não está ativo")
+    return memoria.marcar_base()
+
+@router.get("/tracemalloc/diff")
+def diff_tracemalloc(
+    limite: int = Query(20, ge=1, le=200),
+    agrupar: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    filtro: Optional[str] = Query(None, description="Trecho do caminho, ex.: routes/exercicios.py")
+):
+    """Maiores crescimentos de memória desde o último snapshot"""
+    if not memoria.ativo:
+        raise HTTPException(status_code=409, detail="tracemalloc não está ativo")
+    return memoria.diff(limite, agrupar, filtro)
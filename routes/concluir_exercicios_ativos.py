@@ -1,44 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy.sql.expression import func
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.exercicios import Exercicios
 from models.exercicios_historico import Exercicios_historicos
-from database.session import get_db
+from database.session import get_writer, writer as writer_global, ReadSessionLocal
+from database.writer import GroupCommitWriter
 from datetime import datetime
-from routes.exercicios import criar_exercicio_automaticamente
+import asyncio
+from routes.exercicios import criar_exercicio_automaticamente, get_warm_pool, warm_pool
+from utils.warm_pool import WarmPool
+from utils.jobs import JobQueue, SharedJobStore
+from config.performance import GENERATION_JOBS_CONFIG
+from config.settings import JOBS_DB_PATH
 
 router = APIRouter()
 
-@router.patch("/exercicios/concluir/{id}")
-async def concluir_exercicio(id: int, db: Session = Depends(get_db)):
-    # Busca o exercício ativo
-    exercicio = db.query(Exercicios).filter(Exercicios.id == id, Exercicios.exercicio_ativo == True).first()
+# Workers que geram o próximo exercício depois de uma conclusão; iniciado pelo lifespan do app.
+# O status fica no SQLite compartilhado: qualquer worker responde o status_url
+geracoes = JobQueue(
+    workers=GENERATION_JOBS_CONFIG["workers"],
+    max_finalizados=GENERATION_JOBS_CONFIG["max_finished_jobs"],
+    store=SharedJobStore(JOBS_DB_PATH),
+    heartbeat_seconds=GENERATION_JOBS_CONFIG["heartbeat_seconds"],
+    expira_seconds=GENERATION_JOBS_CONFIG["expire_seconds"],
+    poll_seconds=GENERATION_JOBS_CONFIG["poll_interval_seconds"]
+)
+
+PROXIMO_EXERCICIO = "proximo_exercicio"
+
+async def _gerar_proximo(writer: GroupCommitWriter, pool: WarmPool) -> dict:
+    novo = await criar_exercicio_automaticamente(writer, pool)
+    return {"novo_exercicio_gerado": novo.id, "nome": novo.nome}
+
+def _conclusao_gravada(exercicio_id: int) -> bool:
+    with ReadSessionLocal() as db:
+        ativo = db.execute(select(Exercicios.exercicio_ativo).where(Exercicios.id == exercicio_id)).scalar()
+    return ativo is False
+
+async def _retomar_proximo(parametros: dict) -> dict:
+    """
+    Geração de um worker que morreu (ou reiniciou) antes de executá-la: refeita com o escritor
+    e o pool deste. O job é gravado antes do commit da conclusão, então só gera se ele aconteceu
+    """
+    if not await asyncio.to_thread(_conclusao_gravada, parametros["exercicio_concluido"]):
+        raise RuntimeError("Conclusão do exercício não foi gravada")
+    return await _gerar_proximo(writer_global, warm_pool)
+
+geracoes.registrar(PROXIMO_EXERCICIO, _retomar_proximo)
+
+def get_geracoes() -> JobQueue:
+    return geracoes
+
+@router.patch("/exercicios/concluir/{id}", status_code=202)
+async def concluir_exercicio(id: int, writer: GroupCommitWriter = Depends(get_writer),
+                            pool: WarmPool = Depends(get_warm_pool), jobs: JobQueue = Depends(get_geracoes)):
+    """
+    Conclui o exercício e responde assim que o histórico é gravado.
+    O próximo exercício é gerado em background; seu andamento é consultado
+    em GET /exercicios/geracoes/{job_id}.
+    Conclusão e job ficam em bancos diferentes: o job é gravado antes do commit da conclusão
+    e só enfileirado depois dele. Se o worker cair entre os dois, outro worker retoma o job
+    e gera o próximo exercício apenas se a conclusão foi gravada.
+    """
+    async def concluir(db: AsyncSession):
+        # Busca o exercício ativo
+        resultado = await db.execute(
+            select(Exercicios).where(Exercicios.id == id, Exercicios.exercicio_ativo == True)
+        )
+        exercicio = resultado.scalars().first()
+        if not exercicio:
+            return None
+        
+        # Marca o exercício como concluído
+        exercicio.exercicio_ativo = False
+        
+        # Registra no histórico
+        historico = Exercicios_historicos(
+            exercicio_id=exercicio.id,
+            data_inicio=datetime.now(),  # Data atual como início
+            data_conclusao=datetime.now()  # Data atual como conclusão
+        )
+        db.add(historico)
+        await db.flush()
+        return exercicio
+    
+    # Job gravado antes da conclusão: sem ele, uma queda logo após o commit perderia a geração
+    job_id = await jobs.reservar(PROXIMO_EXERCICIO, {"exercicio_concluido": id})
+    try:
+        exercicio = await writer.submit(concluir)
+    except BaseException:
+        await jobs.descartar(job_id)
+        raise
     if not exercicio:
+        await jobs.descartar(job_id)
         raise HTTPException(status_code=404, detail="Exercício ativo não encontrado")
     
-    # Marca o exercício como concluído
-    exercicio.exercicio_ativo = False
-    
-    # Registra no histórico
-    historico = Exercicios_historicos(
-        exercicio_id=exercicio.id,
-        data_inicio=datetime.now(),  # Data atual como início
-        data_conclusao=datetime.now()  # Data atual como conclusão
-    )
-    db.add(historico)
-    
-    # Persiste as mudanças antes de gerar um novo exercício
-    db.commit()
-    db.refresh(exercicio)
-    
-    # Gera um novo exercício automaticamente
-    try:
-        novo_exercicio_gerado = await criar_exercicio_automaticamente(db)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao gerar novo exercício: {str(e)}")
+    # Gera um novo exercício em background
+    await jobs.submit(lambda: _gerar_proximo(writer, pool), job_id=job_id)
     
     return {
-        "msg": "Exercício concluído e um novo exercício gerado",
+        "msg": "Exercício concluído; novo exercício em geração",
         "exercicio_concluido": exercicio.id,
-        "novo_exercicio_gerado": novo_exercicio_gerado.id
-    }
\ No newline at end of file
+        "job_id": job_id,
+        "status_url": f"/exercicios/geracoes/{job_id}"
+    }
+
+@router.get("/exercicios/geracoes/{job_id}")
+async def status_geracao(
+    job_id: str,
+    espera: float = Query(0, ge=0, le=GENERATION_JOBS_CONFIG["max_long_poll_seconds"],
+                          description="Segundos para aguardar o término (long-poll)"),
+    jobs: JobQueue = Depends(get_geracoes)
+):
+    """
+    Status da geração do próximo exercício: pendente, executando, concluido ou erro.
+    Responde por qualquer worker; 404 só para ids desconhecidos ou já podados.
+    """
+    status = await jobs.aguardar(job_id, espera)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return status
@@ -1,59 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.exercicios import Exercicios
+from models.exercicios_conteudos import Exercicios_conteudos
 from schemas.exercicios import ExercicioOut, ExercicioUpdate
-from database.session import get_db  
+from database.session import get_read_db, get_writer
+from database.writer import GroupCommitWriter
 from utils.exercicios_permitidos import EXERCICIOS_PERMITIDOS
-from utils.ia import gerar_exercicio_completo_otimizado, preload_common_exercises
+from utils.ia import gerar_exercicio_completo_otimizado, preload_common_exercises, gerar_campo_stream, CAMPOS_EXERCICIO, conteudos
+from utils.warm_pool import WarmPool
+from utils.governador import prioridade, BACKGROUND
+from config.performance import EXERCISE_FALLBACKS, WARM_POOL_CONFIG, MONITORING_CONFIG, CACHE_CONFIG
+from utils.metricas import cache_removals, registrar_cache
+from utils.cache_lru import TTLCache
+from utils.conteudo_compacto import CompactCache
+from utils.respostas import respostas, responder, serializar, etag_de, codificador_linhas
 import random
 import asyncio
-from typing import List
+from typing import List, AsyncIterator
 import time
 
 router = APIRouter()
 
-# Cache local para exercícios recém criados (evita recrear os mesmos)
-_recent_exercises_cache = {}
+# Cache local para exercícios recém criados (evita recrear os mesmos), LRU com expiração;
+# os textos são os mesmos objetos guardados para o cache da IA
+_recent_exercises_cache = CompactCache(
+    conteudos,
+    TTLCache,
+    max_entradas=CACHE_CONFIG["recent_cache_size"],
+    ttl_seconds=CACHE_CONFIG["recent_cache_ttl_hours"] * 3600,
+    intervalo_limpeza=CACHE_CONFIG["auto_cleanup_interval_hours"] * 3600,
+    ao_remover=lambda motivo: cache_removals.inc(cache="recentes", reason=motivo)
+)
 _last_exercise_name = None
 
+# Lista constante: serializada uma vez, com ETag fixa
+_PERMITIDOS_CORPO = serializar(EXERCICIOS_PERMITIDOS)
+_PERMITIDOS_ETAG = etag_de(_PERMITIDOS_CORPO)
+
+async def _gerar_para_pool(nome: str) -> dict:
+    # Resolvido na chamada para que a função possa ser substituída (testes, benchmarks);
+    # o reabastecimento nunca passa na frente de requisições de usuário no governador
+    with prioridade(BACKGROUND):
+        return await gerar_exercicio_completo_otimizado(nome)
+
+# Exercícios prontos para o POST /exercicios/automatico; iniciado pelo lifespan do app
+warm_pool = WarmPool(
+    _gerar_para_pool,
+    EXERCICIOS_PERMITIDOS,
+    low_watermark=WARM_POOL_CONFIG["low_watermark"],
+    high_watermark=WARM_POOL_CONFIG["high_watermark"],
+    concorrencia=WARM_POOL_CONFIG["refill_concurrency"],
+    espera_erro_seconds=WARM_POOL_CONFIG["retry_wait_seconds"]
+)
+
+def get_warm_pool() -> WarmPool:
+    return warm_pool
+
+def _escolher_exercicio() -> str:
+    """Sorteia um exercício diferente do último gerado"""
+    global _last_exercise_name
+    available_exercises = [e for e in EXERCICIOS_PERMITIDOS if e != _last_exercise_name]
+    nome = random.choice(available_exercises)
+    _last_exercise_name = nome
+    return nome
+
+def _recent_cache_key(nome: str) -> str:
+    return f"exercise_{nome.lower().replace(' ', '_')}"
+
+def _buscar_recente(nome: str):
+    """Exercício do cache local recente (None se não estiver lá), contando hit/miss"""
+    resultado = _recent_exercises_cache.get(_recent_cache_key(nome))
+    if MONITORING_CONFIG["log_cache_hits"]:
+        registrar_cache("recentes", resultado is not None)
+    return resultado
+
+def _salvar_recente(cache_key: str, resultado: dict) -> None:
+    """Guarda o exercício no cache local (o tamanho e a validade são limitados pelo próprio cache)"""
+    _recent_exercises_cache[cache_key] = resultado
+
+async def _inserir_exercicio(writer: GroupCommitWriter, nome: str, conteudo: dict) -> Exercicios:
+    """Insere o novo exercício ativo pela fila de escrita (group commit)"""
+    async def inserir(session: AsyncSession) -> Exercicios:
+        novo = Exercicios(
+            nome=nome,
+            descricao=conteudo["descricao"],
+            vantagens=conteudo["vantagens"],
+            passo_a_passo=conteudo["passo_a_passo"],
+            exercicio_ativo=True
+        )
+        session.add(novo)
+        await session.flush()
+        return novo
+    return await writer.submit(inserir)
+
 @router.post("/exercicios/automatico", response_model=ExercicioOut)
-async def criar_exercicio_automaticamente(db: Session = Depends(get_db)):
+async def criar_exercicio_automaticamente(writer: GroupCommitWriter = Depends(get_writer),
+                                          pool: WarmPool = Depends(get_warm_pool)):
     """
     Cria exercício automaticamente com máxima otimização:
-    1. Evita repetir o último exercício
-    2. Usa cache inteligente
-    3. Execução em paralelo quando necessário
-    4. Timeout agressivo com fallbacks
+    1. Serve um exercício pronto do warm pool quando houver
+    2. Evita repetir o último exercício
+    3. Usa cache inteligente
+    4. Execução em paralelo quando necessário
+    5. Timeout agressivo com fallbacks
     """
     global _last_exercise_name
-    
     try:
         tempo_inicio = time.time()
         
-        # Selecionar exercício diferente do último
-        available_exercises = [e for e in EXERCICIOS_PERMITIDOS if e != _last_exercise_name]
-        nome = random.choice(available_exercises)
-        _last_exercise_name = nome
+        # Caminho rápido: exercício já gerado em background
+        pronto = pool.pop(evitar=_last_exercise_name)
+        if pronto is not None:
+            nome, conteudo = pronto
+            _last_exercise_name = nome
+            novo = await _inserir_exercicio(writer, nome, conteudo)
+            print(f"Exercício '{nome}' servido do pool em {time.time() - tempo_inicio:.2f}s")
+            return novo
+        
+        # Pool vazio: selecionar exercício diferente do último e gerar inline
+        nome = _escolher_exercicio()
         
         print(f"Gerando exercício: {nome}")
         
         # Verificar se exercício já existe no cache local recente
-        cache_key = f"exercise_{nome.lower().replace(' ', '_')}"
-        if cache_key in _recent_exercises_cache:
-            cached_exercise = _recent_exercises_cache[cache_key]
+        cache_key = _recent_cache_key(nome)
+        cached_exercise = _buscar_recente(nome)
+        if cached_exercise is not None:
             print(f"Usando cache local para {nome}")
             
             # Criar novo registro no DB
-            novo = Exercicios(
-                nome=nome,
-                descricao=cached_exercise["descricao"],
-                vantagens=cached_exercise["vantagens"],
-                passo_a_passo=cached_exercise["passo_a_passo"],
-                exercicio_ativo=True
-            )
-            db.add(novo)
-            db.commit()
-            db.refresh(novo)
+            novo = await _inserir_exercicio(writer, nome, cached_exercise)
             
             tempo_fim = time.time()
             print(f"Exercício criado do cache em {tempo_fim - tempo_inicio:.2f}s")
@@ -72,25 +151,10 @@ async def criar_exercicio_automaticamente(db: Session = Depends(get_db)):
             }
         
         # Salvar no cache local para uso futuro
-        _recent_exercises_cache[cache_key] = resultado
-        
-        # Limitar tamanho do cache local
-        if len(_recent_exercises_cache) > 20:
-            # Remove o mais antigo
-            oldest_key = next(iter(_recent_exercises_cache))
-            del _recent_exercises_cache[oldest_key]
+        _salvar_recente(cache_key, resultado)
         
         # Criar exercício no banco
-        novo = Exercicios(
-            nome=nome,
-            descricao=resultado["descricao"],
-            vantagens=resultado["vantagens"],
-            passo_a_passo=resultado["passo_a_passo"],
-            exercicio_ativo=True
-        )
-        db.add(novo)
-        db.commit()
-        db.refresh(novo)
+        novo = await _inserir_exercicio(writer, nome, resultado)
         
         tempo_fim = time.time()
         tempo_total = tempo_fim - tempo_inicio
@@ -99,10 +163,88 @@ async def criar_exercicio_automaticamente(db: Session = Depends(get_db)):
         return novo
         
     except Exception as e:
-        db.rollback()
         print(f"Erro ao criar exercício: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao criar exercício: {str(e)}")
 
+def _sse(evento: str, dados: dict) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {evento}\ndata: {serializar(dados).decode('utf-8')}\n\n"
+
+_FALLBACKS_CAMPOS = {
+    "descricao": EXERCISE_FALLBACKS["description_template"],
+    "vantagens": EXERCISE_FALLBACKS["benefits_template"],
+    "passo_a_passo": EXERCISE_FALLBACKS["steps_template"],
+}
+
+async def _stream_exercicio(nome: str, writer: GroupCommitWriter) -> AsyncIterator[str]:
+    """
+    Gera os eventos do exercício:
+    - exercicio: nome escolhido (imediatamente)
+    - token: trecho de texto de um campo, conforme chega da IA
+    - campo: texto final de um campo
+    - salvo: exercício persistido, com o id
+    """
+    tempo_inicio = time.time()
+    try:
+        yield _sse("exercicio", {"nome": nome})
+        
+        resultado = _buscar_recente(nome)
+        if resultado:
+            # Exercício já pronto: tudo sai em uma única rajada
+            for campo in CAMPOS_EXERCICIO:
+                yield _sse("campo", {"campo": campo, "texto": resultado[campo]})
+        else:
+            resultado = {}
+            fila: asyncio.Queue = asyncio.Queue()
+            
+            async def produzir(campo: str):
+                partes = []
+                try:
+                    async for delta in gerar_campo_stream(nome, campo):
+                        partes.append(delta)
+                        await fila.put(("token", campo, delta))
+                except Exception as e:
+                    print(f"Erro no streaming de {campo} para {nome}: {e}")
+                    partes = []
+                texto = "".join(partes).strip() or _FALLBACKS_CAMPOS[campo].format(name=nome)
+                await fila.put(("campo", campo, texto))
+            
+            # Os três campos são gerados em paralelo e intercalados na saída
+            tasks = [asyncio.create_task(produzir(campo)) for campo in CAMPOS_EXERCICIO]
+            try:
+                while len(resultado) < len(CAMPOS_EXERCICIO):
+                    evento, campo, texto = await fila.get()
+                    if evento == "campo":
+                        resultado[campo] = texto
+                    yield _sse(evento, {"campo": campo, "texto": texto})
+            finally:
+                for task in tasks:
+                    task.cancel()
+            
+            _salvar_recente(_recent_cache_key(nome), resultado)
+        
+        novo = await _inserir_exercicio(writer, nome, resultado)
+        
+        print(f"Exercício '{nome}' transmitido em {time.time() - tempo_inicio:.2f} segundos")
+        yield _sse("salvo", ExercicioOut.model_validate(novo).model_dump())
+    except Exception as e:
+        print(f"Erro ao transmitir exercício: {str(e)}")
+        yield _sse("erro", {"detail": f"Erro ao criar exercício: {str(e)}"})
+
+@router.get("/exercicios/automatico/stream")
+async def criar_exercicio_automaticamente_stream(writer: GroupCommitWriter = Depends(get_writer)):
+    """
+    Versão em streaming (Server-Sent Events) da criação automática:
+    o nome sai imediatamente, os campos chegam token a token e o
+    último evento traz o exercício salvo com o id.
+    """
+    nome = _escolher_exercicio()
+    return StreamingResponse(
+        _stream_exercicio(nome, writer),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/exercicios/preload")
 async def preload_exercises():
     """
@@ -120,43 +262,80 @@ async def get_cache_status():
     """
     Retorna status do cache para monitoramento
     """
-    from utils.ia import load_cache_async
+    from utils.ia import load_cache_async, get_single_flight_stats, get_cache_store_stats, get_ai_resilience_stats
     
     try:
         cache = await load_cache_async()
         return {
             "cache_entries": len(cache),
-            "recent_exercises_cache": len(_recent_exercises_cache),
-            "cached_exercises": list(_recent_exercises_cache.keys())
+            "recent_exercises_cache": _recent_exercises_cache.stats(),
+            "cached_exercises": list(_recent_exercises_cache.keys()),
+            "cache_store": get_cache_store_stats(),
+            "single_flight": get_single_flight_stats(),
+            "warm_pool": warm_pool.stats(),
+            "response_cache": respostas.stats(),
+            "ai_resilience": get_ai_resilience_stats()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao verificar cache: {str(e)}")
 
 @router.put("/update/exercicios", response_model=ExercicioOut)
-def atualizar_exercicio(id: int, exercicio: ExercicioUpdate, db: Session = Depends(get_db)):
-    try:
-        obj = db.query(Exercicios).filter(Exercicios.id == id).first()
+async def atualizar_exercicio(id: int, exercicio: ExercicioUpdate, writer: GroupCommitWriter = Depends(get_writer)):
+    alteracoes = exercicio.model_dump(exclude_unset=True)
+
+    async def atualizar(session: AsyncSession):
+        obj = await session.get(Exercicios, id)
         if not obj:
-            raise HTTPException(status_code=404, detail="Exercício não encontrado")
-        for k, v in exercicio.model_dump(exclude_unset=True).items():
+            return None
+        for k, v in alteracoes.items():
             setattr(obj, k, v)
-        db.commit()
-        db.refresh(obj)
+        await session.flush()
         return obj
+
+    try:
+        obj = await writer.submit(atualizar)
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar exercício: {str(e)}")
+    if not obj:
+        raise HTTPException(status_code=404, detail="Exercício não encontrado")
+    return obj
 
 @router.get("/exercicios_permitidos")
-def listar_exercicios_permitidos():
-    return EXERCICIOS_PERMITIDOS
+async def listar_exercicios_permitidos(request: Request):
+    return responder(request, _PERMITIDOS_ETAG, _PERMITIDOS_CORPO, cache_control="public, max-age=3600")
+
+# ExercicioOut direto das colunas, na ordem dos campos do schema: sem carregar o objeto ORM nem validar
+_COLUNAS_EXERCICIO_OUT = {
+    "id": Exercicios.id,
+    "nome": Exercicios.nome,
+    "exercicio_ativo": Exercicios.exercicio_ativo,
+    "descricao": Exercicios_conteudos.descricao,
+    "vantagens": Exercicios_conteudos.vantagens,
+    "passo_a_passo": Exercicios_conteudos.passo_a_passo,
+}
+_CONSULTA_EXERCICIO_OUT = select(*(_COLUNAS_EXERCICIO_OUT[campo] for campo in ExercicioOut.model_fields)).join(
+    Exercicios_conteudos, Exercicios_conteudos.id == Exercicios.conteudo_id
+)
+_codificar_exercicio = codificador_linhas(ExercicioOut.model_fields)
 
 @router.get("/exercicios/{id}", response_model=ExercicioOut)
-def get_exercicio(id: int, db: Session = Depends(get_db)):
-    obj = db.query(Exercicios).filter(Exercicios.id == id).first()
-    if not obj:
-        raise HTTPException(status_code=404, detail="Exercício não encontrado")
-    return obj
+def get_exercicio(id: int, request: Request, db: Session = Depends(get_read_db)):
+    """Com If-None-Match, responde 304 sem consultar o banco enquanto não houver escrita"""
+    def gerar():
+        linha = db.execute(_CONSULTA_EXERCICIO_OUT.where(Exercicios.id == id)).first()
+        if not linha:
+            raise HTTPException(status_code=404, detail="Exercício não encontrado")
+        return _codificar_exercicio(linha), {}
+
+    def validador():
+        # Nome, status e hash do texto determinam o corpo: checagem sem carregar o objeto
+        return db.execute(
+            select(Exercicios.nome, Exercicios.exercicio_ativo, Exercicios_conteudos.hash)
+            .join(Exercicios_conteudos, Exercicios_conteudos.id == Exercicios.conteudo_id)
+            .where(Exercicios.id == id)
+        ).first()
+
+    return respostas.servir(request, db.get_bind(), ("exercicio", id), gerar, validador)
 
 # Função para inicializar preload em background (executar no startup)
 async def startup_preload():
@@ -169,25 +348,3 @@ async def startup_preload():
         print("Preload concluído com sucesso!")
     except Exception as e:
         print(f"Erro no preload de startup: {e}")
-
-# Adicionar cleanup de cache periódico
-import threading
-import time as time_module
-
-def periodic_cache_cleanup():
-    """
-    Limpa cache periodicamente para evitar crescimento excessivo
-    """
-    global _recent_exercises_cache
-    
-    while True:
-        time_module.sleep(3600)  # A cada hora
-        if len(_recent_exercises_cache) > 15:
-            # Manter apenas os 10 mais recentes
-            keys_to_keep = list(_recent_exercises_cache.keys())[-10:]
-            _recent_exercises_cache = {k: _recent_exercises_cache[k] for k in keys_to_keep}
-            print("Cache local limpo automaticamente")
-
-# Iniciar thread de limpeza
-cleanup_thread = threading.Thread(target=periodic_cache_cleanup, daemon=True)
-cleanup_thread.start()
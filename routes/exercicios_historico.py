@@ -1,43 +1,217 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from models.exercicios_historico import Exercicios_historicos
 from models.exercicios import Exercicios
-from database.session import get_db
+from models.exercicios_conteudos import Exercicios_conteudos
+from database.session import get_read_db
 from schemas.exercicios_historico import ExercicioHistoricoOut
-from typing import List
-from sqlalchemy import select
+from utils.respostas import respostas, serializar, codificador_linhas
+from typing import Dict, List, Optional, Iterator, Literal, Tuple
+from datetime import datetime
+from sqlalchemy import select, func, exists, and_, or_
+import csv
+import io
 
 router = APIRouter()
 
+FORMATO_DATA = "%d/%m/%Y %H:%M:%S"
+FORMATO_DATA_ISO = "%Y-%m-%dT%H:%M:%S"
+
+# Linhas buscadas por vez no cursor do banco durante a exportação
+EXPORT_BATCH_SIZE = 2000
+
+COLUNAS_EXPORT = ["historico_id", "exercicio_id", "nome", "exercicio_ativo", "data_inicio", "data_conclusao"]
+
 @router.get("/historico/exercicios/detalhado")
-def listar_exercicios_detalhado(db: Session = Depends(get_db)):
-    # Busca todos os exercícios com seus históricos
-    exercicios = db.query(Exercicios).all()
-    
+def listar_exercicios_detalhado(
+    request: Request,
+    limite: int = Query(100, ge=1, le=1000, description="Exercícios por página"),
+    cursor: Optional[int] = Query(None, description="Último id da página anterior (X-Next-Cursor)"),
+    nome: Optional[str] = Query(None, description="Filtra pelo nome exato do exercício"),
+    ativo: Optional[bool] = Query(None, description="Filtra pelo status ativo"),
+    data_inicio: Optional[datetime] = Query(None, description="Conclusões a partir desta data"),
+    data_fim: Optional[datetime] = Query(None, description="Conclusões até esta data"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Lista exercícios com seus históricos, paginado por cursor no id do exercício.
+    Cada página é uma única consulta (página de exercícios + LEFT JOIN no histórico);
+    o cursor da próxima página vem no header X-Next-Cursor.
+    A página serializada fica em cache até a próxima escrita no banco (ETag / If-None-Match).
+    """
+    def gerar():
+        resultado, cabecalhos = _pagina_detalhada(request, db, limite, cursor, nome, ativo, data_inicio, data_fim)
+        return serializar(resultado), cabecalhos
+
+    return respostas.servir(request, db.get_bind(), ("historico_detalhado", request.url.query), gerar)
+
+def _pagina_detalhada(request: Request, db: Session, limite: int, cursor: Optional[int], nome: Optional[str],
+                      ativo: Optional[bool], data_inicio: Optional[datetime],
+                      data_fim: Optional[datetime]) -> Tuple[List[dict], Dict[str, str]]:
+    # Filtro de período aplicado às conclusões
+    filtro_periodo = []
+    if data_inicio is not None:
+        filtro_periodo.append(Exercicios_historicos.data_conclusao >= data_inicio)
+    if data_fim is not None:
+        filtro_periodo.append(Exercicios_historicos.data_conclusao <= data_fim)
+
+    # Página de exercícios (keyset: id > cursor), com um item extra para saber se há próxima
+    pagina = select(
+        Exercicios.id, Exercicios.nome, Exercicios_conteudos.descricao, Exercicios_conteudos.vantagens, Exercicios.exercicio_ativo
+    ).join(Exercicios_conteudos, Exercicios_conteudos.id == Exercicios.conteudo_id)
+    if cursor is not None:
+        pagina = pagina.where(Exercicios.id > cursor)
+    if nome is not None:
+        pagina = pagina.where(Exercicios.nome == nome)
+    if ativo is not None:
+        pagina = pagina.where(Exercicios.exercicio_ativo == ativo)
+    if filtro_periodo:
+        pagina = pagina.where(exists().where(
+            Exercicios_historicos.exercicio_id == Exercicios.id, *filtro_periodo
+        ))
+    pagina = pagina.order_by(Exercicios.id).limit(limite + 1).subquery()
+
+    # Datas formatadas direto no SQLite
+    consulta = (
+        select(
+            pagina,
+            func.strftime(FORMATO_DATA, Exercicios_historicos.data_inicio),
+            func.strftime(FORMATO_DATA, Exercicios_historicos.data_conclusao),
+            Exercicios_historicos.id.isnot(None),
+        )
+        .outerjoin(Exercicios_historicos, and_(Exercicios_historicos.exercicio_id == pagina.c.id, *filtro_periodo))
+        .order_by(pagina.c.id, Exercicios_historicos.id)
+    )
+
     resultado = []
-    for exercicio in exercicios:
-        # Busca o histórico deste exercício
-        historicos = db.query(Exercicios_historicos).filter(
-            Exercicios_historicos.exercicio_id == exercicio.id
-        ).all()
-        
-        # Formata as datas do histórico
-        historicos_formatados = []
-        for hist in historicos:
-            historicos_formatados.append({
-                "data_inicio": hist.data_inicio.strftime("%d/%m/%Y %H:%M:%S") if hist.data_inicio else None,
-                "data_conclusao": hist.data_conclusao.strftime("%d/%m/%Y %H:%M:%S") if hist.data_conclusao else None
-            })
-        
-        # Adiciona o exercício com seu histórico ao resultado
-        resultado.append({
-            "id": exercicio.id,
-            "nome": exercicio.nome,
-            "descricao": exercicio.descricao,
-            "vantagens": exercicio.vantagens,
-            "exercicio_ativo": exercicio.exercicio_ativo,
-            "historico": historicos_formatados,
-            "total_concluido": len(historicos_formatados)
-        })
-    
-    return resultado
+    atual = None
+    for id_, nome_, descricao, vantagens, exercicio_ativo, hist_inicio, hist_conclusao, tem_historico in db.execute(consulta):
+        if atual is None or atual["id"] != id_:
+            atual = {
+                "id": id_,
+                "nome": nome_,
+                "descricao": descricao,
+                "vantagens": vantagens,
+                "exercicio_ativo": exercicio_ativo,
+                "historico": [],
+                "total_concluido": 0
+            }
+            resultado.append(atual)
+        if tem_historico:
+            atual["historico"].append({"data_inicio": hist_inicio, "data_conclusao": hist_conclusao})
+            atual["total_concluido"] += 1
+
+    cabecalhos = {}
+    if len(resultado) > limite:
+        resultado = resultado[:limite]
+        proximo = resultado[-1]["id"]
+        cabecalhos["X-Next-Cursor"] = str(proximo)
+        cabecalhos["Link"] = f'<{request.url.include_query_params(cursor=proximo)}>; rel="next"'
+
+    return resultado, cabecalhos
+
+def _filtro_export(since: Optional[datetime], after_id: Optional[int]):
+    """
+    Cursor (data_conclusao, id) da carga incremental. Só com `since` o limite é inclusivo
+    (>=): conclusões no mesmo instante da última carga saem de novo em vez de se perderem
+    """
+    if since is None:
+        return None
+    if after_id is None:
+        return Exercicios_historicos.data_conclusao >= since
+    return or_(
+        Exercicios_historicos.data_conclusao > since,
+        and_(Exercicios_historicos.data_conclusao == since, Exercicios_historicos.id > after_id),
+    )
+
+def _proximo_cursor_export(db: Session, filtro) -> Optional[Tuple[datetime, int]]:
+    """Última linha concluída que o export vai enviar (None se não houver nenhuma)"""
+    consulta = (
+        select(Exercicios_historicos.data_conclusao, Exercicios_historicos.id)
+        .join(Exercicios, Exercicios.id == Exercicios_historicos.exercicio_id)
+        .where(Exercicios_historicos.data_conclusao.isnot(None))
+        .order_by(Exercicios_historicos.data_conclusao.desc(), Exercicios_historicos.id.desc())
+        .limit(1)
+    )
+    if filtro is not None:
+        consulta = consulta.where(filtro)
+    linha = db.execute(consulta).first()
+    return tuple(linha) if linha else None
+
+def _linhas_export(db: Session, filtro):
+    """Consulta do export: histórico + exercício, datas já em ISO 8601 pelo SQLite"""
+    consulta = (
+        select(
+            Exercicios_historicos.id,
+            Exercicios_historicos.exercicio_id,
+            Exercicios.nome,
+            Exercicios.exercicio_ativo,
+            func.strftime(FORMATO_DATA_ISO, Exercicios_historicos.data_inicio),
+            func.strftime(FORMATO_DATA_ISO, Exercicios_historicos.data_conclusao),
+        )
+        .join(Exercicios, Exercicios.id == Exercicios_historicos.exercicio_id)
+        .order_by(Exercicios_historicos.data_conclusao, Exercicios_historicos.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if filtro is not None:
+        consulta = consulta.where(filtro)
+    return db.execute(consulta).partitions()
+
+_codificar_export = codificador_linhas(COLUNAS_EXPORT)
+
+def _export_ndjson(db: Session, filtro) -> Iterator[bytes]:
+    for lote in _linhas_export(db, filtro):
+        yield b"".join(_codificar_export(linha) + b"\n" for linha in lote)
+
+def _export_csv(db: Session, filtro) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COLUNAS_EXPORT)
+    for lote in _linhas_export(db, filtro):
+        writer.writerows(lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Cabeçalho sai mesmo sem linhas
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/historico/exercicios/export")
+def exportar_historico(
+    request: Request,
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+    since: Optional[datetime] = Query(None, description="Conclusões a partir deste instante (carga incremental, X-Next-Since)"),
+    after_id: Optional[int] = Query(None, description="Com since: no mesmo instante, apenas ids maiores (X-Next-After-Id)"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Exporta o histórico completo em NDJSON ou CSV, em streaming e com memória constante:
+    as linhas são lidas do banco em lotes (yield_per) e enviadas lote a lote.
+    O cursor da próxima carga incremental, (data_conclusao, id) da última linha concluída,
+    vem nos headers X-Next-Since e X-Next-After-Id (e no Link rel="next").
+    """
+    gerador = _export_ndjson if formato == "ndjson" else _export_csv
+    filtro = _filtro_export(since, after_id)
+
+    headers = {"Content-Disposition": f'attachment; filename="historico_exercicios.{formato}"'}
+    # Calculado antes do streaming: linhas concluídas depois dele saem de novo na próxima carga, nunca se perdem
+    proximo = _proximo_cursor_export(db, filtro)
+    if proximo is None and since is not None:
+        proximo = (since, after_id)
+    if proximo is not None:
+        proximo_since, proximo_id = proximo
+        headers["X-Next-Since"] = proximo_since.isoformat()
+        parametros = {"since": proximo_since.isoformat()}
+        if proximo_id is not None:
+            headers["X-Next-After-Id"] = str(proximo_id)
+            parametros["after_id"] = proximo_id
+        headers["Link"] = f'<{request.url.include_query_params(**parametros)}>; rel="next"'
+
+    def stream():
+        # A sessão da dependência é fechada antes do streaming; usa uma própria no mesmo engine
+        with Session(bind=db.get_bind()) as stream_db:
+            yield from gerador(stream_db, filtro)
+
+    media_type = "application/x-ndjson" if formato == "ndjson" else "text/csv"
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from config.performance import AI_CONFIG
+from utils.ia import roteador, get_ai_resilience_stats
+
+router = APIRouter()
+
+@router.get("/ia/roteamento")
+async def status_roteamento():
+    """
+    Estatísticas do roteador de modelos (latência e taxa de sucesso por modelo e
+    tipo de prompt), últimas decisões tomadas e estado dos circuit breakers
+    """
+    return {
+        "roteador": roteador.stats(),
+        "resiliencia": get_ai_resilience_stats(),
+        "prazo_geracao_s": AI_CONFIG["timeout_seconds"],
+        "max_retries": AI_CONFIG["max_retries"],
+    }
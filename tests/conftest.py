@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# O lifespan do app cria o schema e ajusta o SQLite; nos testes isso acontece em um banco
+# temporário, nunca em database/db/mvp.db
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="mvp-tests-"), "mvp.db"))
+
+# Sem warm pool nem preload no lifespan: cada TestClient(app) os iniciaria e chamaria a IA de verdade
+os.environ["WARM_POOL_ENABLED"] = "false"
+os.environ["PRELOAD_POPULAR_EXERCISES"] = "false"
@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+from utils.cache_store import LogCacheStore
+from utils.cache_compartilhado import SharedCacheStore
+from utils.cache_lru import TTLCache
+from utils.conteudo_compacto import ContentStore, CompactCache
+
+
+def _gravar_log(path, *linhas):
+    with open(path, "wb") as f:
+        for linha in linhas:
+            f.write(linha if isinstance(linha, bytes) else (json.dumps(linha) + "\n").encode("utf-8"))
+
+
+def test_log_importa_ultimo_valor_e_descarta_registro_incompleto(tmp_path):
+    path = str(tmp_path / "cache.log")
+    _gravar_log(
+        path,
+        {"k": "prancha_descricao", "v": "v1"},
+        {"k": "prancha_descricao", "v": "v2"},
+        {"k": "burpee_vantagens", "v": "Cardio"},
+        b'{"k": "b", "v": "pela met',  # Queda no meio de uma escrita
+    )
+    tamanho = os.path.getsize(path)
+
+    assert LogCacheStore(path).load() == {"prancha_descricao": "v2", "burpee_vantagens": "Cardio"}
+    # Formato só de importação: o arquivo não é alterado
+    assert os.path.getsize(path) == tamanho
+
+
+def test_log_importa_json_antigo(tmp_path):
+    legacy = tmp_path / "exercicios_cache.json"
+    legacy.write_text(json.dumps({"polichinelo_descricao": "Saltos"}), encoding="utf-8")
+
+    store = LogCacheStore(str(tmp_path / "cache.log"), legacy_json_path=str(legacy))
+    assert store.load() == {"polichinelo_descricao": "Saltos"}
+    assert not os.path.exists(tmp_path / "cache.log")
+
+
+def test_cache_compartilhado_invalida_l1_de_outro_worker(tmp_path):
+    path = str(tmp_path / "compartilhado.db")
+    importado = SharedCacheStore(path, importar=lambda: {"prancha_descricao": "antiga"})
+    worker_a, worker_b = importado, SharedCacheStore(path, importar=lambda: {"nao": "importar de novo"})
+    assert worker_a.load() == {"prancha_descricao": "antiga"}
+    assert worker_b.load() == {"prancha_descricao": "antiga"}
+
+    # Sem escrita de outro worker a sincronização não relê nada
+    assert worker_b.sincronizar() == 0
+    worker_a.set("prancha_descricao", "nova")
+    worker_a.set("burpee_vantagens", "Cardio")
+    assert worker_b.sincronizar() == 2
+    assert worker_b.index == {"prancha_descricao": "nova", "burpee_vantagens": "Cardio"}
+    assert worker_b.sincronizar() == 0
+    worker_a.close()
+    worker_b.close()
+
+
+def test_cache_compartilhado_lease_exclusiva_e_expira(tmp_path):
+    path = str(tmp_path / "compartilhado.db")
+    worker_a, worker_b = SharedCacheStore(path), SharedCacheStore(path)
+
+    assert worker_a.adquirir_lease("k", 30)
+    assert not worker_b.adquirir_lease("k", 30)
+    assert worker_b.lease_ativa("k")
+    worker_a.liberar_lease("k")
+    assert worker_b.adquirir_lease("k", 0)
+
+    # Lease expirada (worker que morreu no meio) não bloqueia os outros
+    assert worker_a.adquirir_lease("k", 30)
+
+
+def test_ttl_cache_despeja_menos_usado():
+    removidos = []
+    cache = TTLCache(max_entradas=2, ao_remover=removidos.append)
+    cache["a"] = "1"
+    cache["b"] = "2"
+    assert cache.get("a") == "1"  # "b" passa a ser o menos usado
+    cache["c"] = "3"
+
+    assert "b" not in cache and list(cache) == ["a", "c"]
+    assert removidos == ["eviction"]
+    assert cache.stats()["evictions"] == 1 and cache.stats()["hits"] == 1
+
+
+def test_ttl_cache_expira_e_limita_bytes(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr("utils.cache_lru.time.monotonic", lambda: agora[0])
+    cache = TTLCache(max_entradas=100, max_bytes=400, ttl_seconds=60, intervalo_limpeza=30)
+    cache["curta"] = "x"
+    cache.set("longa", "y", ttl_seconds=600)
+    agora[0] += 61
+    assert cache.get("curta") is None
+    assert cache.get("longa") == "y"
+    assert cache.stats()["expirations"] == 1
+
+    # Valores grandes despejam os antigos até caber no limite de bytes
+    for i in range(5):
+        cache[f"grande{i}"] = "z" * 100
+    assert cache.stats()["bytes"] <= 400
+    assert "grande4" in cache and "longa" not in cache
+
+
+def test_cache_compartilhado_busca_no_arquivo_o_que_saiu_do_l1(tmp_path):
+    store = SharedCacheStore(str(tmp_path / "compartilhado.db"), index=TTLCache(max_entradas=1))
+    store.load()
+    store.set("a", "1")
+    store.set("b", "2")
+    assert "a" not in store.index
+    assert store.get("a") == "1"
+    assert store.get("inexistente") is None
+
+
+
+def test_textos_iguais_compartilham_uma_copia_entre_caches():
+    conteudos = ContentStore()
+    ia = CompactCache(conteudos, TTLCache, max_entradas=10)
+    recentes = CompactCache(conteudos, TTLCache, max_entradas=1)
+    descricao = "Agachamento livre com barra. " * 5
+    ia["agachamento_descricao"] = descricao
+    recentes["agachamento"] = {"descricao": "".join(descricao), "vantagens": "Força"}
+    assert ia["agachamento_descricao"] is recentes["agachamento"]["descricao"]
+    assert conteudos.stats()["texts"] == 2 and conteudos.stats()["dedup_hits"] == 1
+
+    # O despejo no cache de recentes solta só a referência dele
+    recentes["burpee"] = {"descricao": "Cardio"}
+    assert ia["agachamento_descricao"] == descricao
+    assert conteudos.stats()["texts"] == 2 and conteudos.stats()["references"] == 2
+    del ia["agachamento_descricao"]
+    assert conteudos.stats()["texts"] == 1
+
+
+def test_textos_frios_sao_comprimidos_e_voltam_na_leitura(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr("utils.conteudo_compacto.time.monotonic", lambda: agora[0])
+    conteudos = ContentStore(frio_apos_seconds=60)
+    cache = CompactCache(conteudos, TTLCache, max_entradas=10)
+    texto = "1. Posicione-se com os pés afastados. 2. Desça controlando o movimento. 3. Retorne."
+    cache["agachamento_execucao"] = texto
+    assert conteudos.compactar() == 0
+
+    agora[0] += 61
+    assert conteudos.compactar() == 1
+    assert conteudos.stats()["cold_texts"] == 1
+    assert conteudos.stats()["stored_bytes"] < sys.getsizeof(texto)
+    assert cache["agachamento_execucao"] == texto
+    assert conteudos.stats()["cold_texts"] == 0
@@ -2,11 +2,20 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from models.base import Base
 from app import app
-from database.session import get_db
+from database.session import get_db, get_async_db, get_read_db, get_writer, configurar_engine_escrita
+from database.writer import GroupCommitWriter
+from routes.exercicios import get_warm_pool
+from routes.concluir_exercicios_ativos import get_geracoes
+from utils.warm_pool import WarmPool
+from utils.jobs import JobQueue, SharedJobStore
 import pytest_asyncio
 from unittest import mock
+import json
+import asyncio
 
 
 # Configuração do banco de dados de teste em memória
@@ -16,6 +25,11 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Mesmo arquivo para as rotas async; NullPool evita reaproveitar conexões entre event loops
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+configurar_engine_escrita(async_engine)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Fixture para sobrescrever a dependência do banco de dados no FastAPI
 @pytest.fixture(name="db_session")
 def db_session_fixture():
@@ -28,12 +42,26 @@ def db_session_fixture():
         Base.metadata.drop_all(bind=engine)
 
 @pytest_asyncio.fixture(name="client")
-async def client_fixture(db_session):
+async def client_fixture(db_session, tmp_path):
     def override_get_db():
         yield db_session
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+    test_writer = GroupCommitWriter(TestingAsyncSessionLocal)
+    # Pool vazio e parado: os testes exercitam a geração inline, salvo quando trocam o pool
+    test_pool = WarmPool(mock.AsyncMock(), [])
+    test_jobs = JobQueue(workers=2, store=SharedJobStore(str(tmp_path / "jobs.db")))
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_writer] = lambda: test_writer
+    app.dependency_overrides[get_warm_pool] = lambda: test_pool
+    app.dependency_overrides[get_geracoes] = lambda: test_jobs
     with TestClient(app=app) as client:
         yield client
+        client.portal.call(test_jobs.stop)
+        client.portal.call(test_writer.stop)
     app.dependency_overrides.clear()
 
 @pytest.mark.asyncio
@@ -72,9 +100,543 @@ async def test_concluir_exercicio(mock_gerar_vantagens, mock_gerar_descricao, cl
     mock_gerar_vantagens.return_value = "Novas vantagens simuladas."
 
     response = client.patch(f"/exercicios/concluir/{exercicio_criado_id}")
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
-    assert data["msg"] == "Exercício concluído e um novo exercício gerado"
     assert data["exercicio_concluido"] == exercicio_criado_id
-    assert "novo_exercicio_gerado" in data
-    assert data["novo_exercicio_gerado"] != exercicio_criado_id
+
+    # O novo exercício é gerado em background; long-poll até ficar pronto
+    status = client.get(data["status_url"], params={"espera": 5}).json()
+    assert status["job_id"] == data["job_id"]
+    assert status["status"] == "concluido"
+    assert status["resultado"]["novo_exercicio_gerado"] != exercicio_criado_id
+    assert client.get("/exercicios/geracoes/inexistente").status_code == 404
+
+    # O job é reservado antes da conclusão e descartado quando ela não acontece
+    jobs = app.dependency_overrides[get_geracoes]()
+    assert client.patch("/exercicios/concluir/999999").status_code == 404
+    assert jobs.store._conexao().execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 1
+
+@pytest.mark.asyncio
+async def test_job_reservado_so_gera_se_a_conclusao_foi_gravada(monkeypatch):
+    import routes.concluir_exercicios_ativos as concluir
+    gerados = []
+
+    async def gerar(writer, pool):
+        gerados.append(True)
+        return {"novo_exercicio_gerado": 2}
+
+    monkeypatch.setattr(concluir, "_gerar_proximo", gerar)
+    monkeypatch.setattr(concluir, "_conclusao_gravada", lambda exercicio_id: exercicio_id == 1)
+    # Worker caiu antes do commit da conclusão: o job retomado não gera nada
+    with pytest.raises(RuntimeError):
+        await concluir._retomar_proximo({"exercicio_concluido": 5})
+    assert await concluir._retomar_proximo({"exercicio_concluido": 1}) == {"novo_exercicio_gerado": 2}
+    assert gerados == [True]
+
+def _ler_eventos_sse(texto):
+    eventos = []
+    for bloco in texto.strip().split("\n\n"):
+        linhas = dict(linha.split(": ", 1) for linha in bloco.split("\n"))
+        eventos.append((linhas["event"], json.loads(linhas["data"])))
+    return eventos
+
+def test_criar_exercicio_stream(client, monkeypatch):
+    async def fake_stream(nome, campo):
+        for parte in (f"{campo} ", "gerado"):
+            yield parte
+
+    monkeypatch.setattr("routes.exercicios.gerar_campo_stream", fake_stream)
+    monkeypatch.setattr("routes.exercicios._recent_exercises_cache", {})
+
+    response = client.get("/exercicios/automatico/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    eventos = _ler_eventos_sse(response.text)
+    assert eventos[0][0] == "exercicio"
+    assert any(evento == "token" for evento, _ in eventos)
+    assert eventos[-1][0] == "salvo"
+    salvo = eventos[-1][1]
+    assert salvo["nome"] == eventos[0][1]["nome"]
+    assert salvo["descricao"] == "descricao gerado"
+    assert salvo["passo_a_passo"] == "passo_a_passo gerado"
+    assert client.get(f"/exercicios/{salvo['id']}").status_code == 200
+
+def test_historico_detalhado_paginado(client, db_session):
+    from datetime import datetime
+    from models.exercicios import Exercicios
+    from models.exercicios_historico import Exercicios_historicos
+
+    exercicios = [
+        Exercicios(nome=nome, descricao="d", vantagens="v", exercicio_ativo=ativo)
+        for nome, ativo in [("Prancha", False), ("Burpee", True), ("Prancha", True)]
+    ]
+    db_session.add_all(exercicios)
+    db_session.commit()
+    db_session.add_all([
+        Exercicios_historicos(exercicio_id=exercicios[0].id, data_inicio=datetime(2025, 1, 1, 8), data_conclusao=datetime(2025, 1, 1, 9)),
+        Exercicios_historicos(exercicio_id=exercicios[0].id, data_inicio=datetime(2025, 2, 1, 8), data_conclusao=datetime(2025, 2, 1, 9)),
+    ])
+    db_session.commit()
+
+    response = client.get("/historico/exercicios/detalhado", params={"limite": 2})
+    assert response.status_code == 200
+    pagina = response.json()
+    assert [e["id"] for e in pagina] == [exercicios[0].id, exercicios[1].id]
+    assert pagina[0]["total_concluido"] == 2
+    assert pagina[0]["historico"][0] == {"data_inicio": "01/01/2025 08:00:00", "data_conclusao": "01/01/2025 09:00:00"}
+    assert pagina[1]["historico"] == []
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/historico/exercicios/detalhado", params={"limite": 2, "cursor": cursor})
+    assert [e["id"] for e in response.json()] == [exercicios[2].id]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/historico/exercicios/detalhado", params={"nome": "Prancha", "ativo": True})
+    assert [e["id"] for e in response.json()] == [exercicios[2].id]
+
+    response = client.get("/historico/exercicios/detalhado", params={"data_inicio": "2025-01-15T00:00:00"})
+    dados = response.json()
+    assert [e["id"] for e in dados] == [exercicios[0].id]
+    assert dados[0]["total_concluido"] == 1
+
+def test_exportar_historico(client, db_session):
+    from datetime import datetime
+    from models.exercicios import Exercicios
+    from models.exercicios_historico import Exercicios_historicos
+
+    exercicio = Exercicios(nome="Stiff", descricao="d", vantagens="v")
+    db_session.add(exercicio)
+    db_session.commit()
+    db_session.add_all([
+        Exercicios_historicos(exercicio_id=exercicio.id, data_inicio=datetime(2025, 3, 1, 7), data_conclusao=datetime(2025, 3, 1, 8)),
+        Exercicios_historicos(exercicio_id=exercicio.id, data_inicio=datetime(2025, 3, 2, 7), data_conclusao=datetime(2025, 3, 2, 8)),
+    ])
+    db_session.commit()
+
+    response = client.get("/historico/exercicios/export")
+    assert response.status_code == 200
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert len(linhas) == 2
+    assert linhas[0]["nome"] == "Stiff"
+    assert linhas[0]["data_conclusao"] == "2025-03-01T08:00:00"
+
+    response = client.get("/historico/exercicios/export", params={"formato": "csv", "since": "2025-03-01T12:00:00"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "historico_id,exercicio_id,nome,exercicio_ativo,data_inicio,data_conclusao",
+        f"{linhas[1]['historico_id']},{exercicio.id},Stiff,False,2025-03-02T07:00:00,2025-03-02T08:00:00",
+    ]
+
+    # Conclusão no mesmo instante da última linha, gravada depois da carga: o cursor (data, id) não a pula
+    assert response.headers["X-Next-Since"] == "2025-03-02T08:00:00"
+    cursor = {"since": response.headers["X-Next-Since"], "after_id": response.headers["X-Next-After-Id"]}
+    db_session.add(Exercicios_historicos(exercicio_id=exercicio.id, data_inicio=datetime(2025, 3, 2, 7, 30),
+                                         data_conclusao=datetime(2025, 3, 2, 8)))
+    db_session.commit()
+    response = client.get("/historico/exercicios/export", params=cursor)
+    novas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert [linha["data_inicio"] for linha in novas] == ["2025-03-02T07:30:00"]
+    assert response.headers["X-Next-After-Id"] == str(novas[0]["historico_id"])
+    assert "after_id=" in response.headers["Link"]
+
+    # Sem novas conclusões, o mesmo cursor volta e nada é reenviado
+    cursor = {"since": response.headers["X-Next-Since"], "after_id": response.headers["X-Next-After-Id"]}
+    response = client.get("/historico/exercicios/export", params=cursor)
+    assert response.text == "" and response.headers["X-Next-After-Id"] == cursor["after_id"]
+
+@mock.patch('routes.exercicios.gerar_exercicio_completo_otimizado', new_callable=mock.AsyncMock)
+def test_contadores_incrementais(mock_gerar, client, db_session):
+    from sqlalchemy import select
+    from models.exercicios import Exercicios
+    from utils.contadores import reconciliar_contadores, garantir_contadores
+    mock_gerar.return_value = {"descricao": "d", "vantagens": "v", "passo_a_passo": "p"}
+    garantir_contadores(db_session)
+
+    assert client.get("/Contador_exercicios").json() == {"total": 0, "ativos": 0, "concluidos": 0}
+
+    exercicio_id = client.post("/exercicios/automatico").json()["id"]
+    status_url = client.patch(f"/exercicios/concluir/{exercicio_id}").json()["status_url"]
+    assert client.get(status_url, params={"espera": 5}).json()["status"] == "concluido"
+    assert client.get("/Contador_exercicios").json() == {"total": 2, "ativos": 0, "concluidos": 1}
+
+    # Escrita fora do ORM gera divergência, detectada e corrigida pela reconciliação
+    conteudo_id = db_session.scalars(select(Exercicios.conteudo_id)).first()
+    db_session.execute(Exercicios.__table__.insert().values(nome="x", conteudo_id=conteudo_id, exercicio_ativo=False))
+    db_session.commit()
+    relatorio = reconciliar_contadores(db_session)
+    assert relatorio["total"]["diferenca"] == 1
+    assert client.get("/Contador_exercicios").json()["total"] == 3
+
+@pytest.mark.asyncio
+async def test_group_commit_isola_falhas_no_lote(db_session):
+    from sqlalchemy import select
+    from models.exercicios import Exercicios
+    writer = GroupCommitWriter(TestingAsyncSessionLocal, max_batch_size=10, max_wait_ms=20)
+
+    def inserir(nome):
+        async def operacao(session):
+            novo = Exercicios(nome=nome, descricao="d", vantagens="v")
+            session.add(novo)
+            await session.flush()
+            return novo.id
+        return operacao
+
+    async def falhar(session):
+        session.add(Exercicios(nome="quebrado", descricao=None, vantagens="v"))
+        await session.flush()
+
+    import asyncio
+    resultados = await asyncio.gather(
+        writer.submit(inserir("A")), writer.submit(falhar), writer.submit(inserir("B")),
+        return_exceptions=True
+    )
+    await writer.stop()
+
+    assert isinstance(resultados[0], int) and isinstance(resultados[2], int)
+    assert isinstance(resultados[1], Exception)
+    assert writer.stats()["batches"] == 1
+    assert db_session.scalars(select(Exercicios.nome).order_by(Exercicios.id)).all() == ["A", "B"]
+
+def test_conteudo_deduplicado_entre_instancias(client, db_session):
+    from models.exercicios import Exercicios
+    from models.exercicios_conteudos import Exercicios_conteudos
+
+    db_session.add_all([Exercicios(nome="Burpee", descricao="d", vantagens="v", passo_a_passo="p") for _ in range(3)])
+    db_session.commit()
+    conteudos = db_session.query(Exercicios_conteudos).all()
+    assert [(c.nome, c.versao) for c in conteudos] == [("Burpee", 1)]
+
+    exercicio_id = db_session.query(Exercicios.id).first()[0]
+    response = client.put("/update/exercicios", params={"id": exercicio_id}, json={"descricao": "nova"})
+    assert response.status_code == 200
+    assert response.json()["descricao"] == "nova"
+    assert response.json()["vantagens"] == "v"
+
+    # A edição cria uma nova versão sem afetar as outras instâncias
+    db_session.expire_all()
+    versoes = sorted((c.versao, c.descricao) for c in db_session.query(Exercicios_conteudos).all())
+    assert versoes == [(1, "d"), (2, "nova")]
+    assert [e.descricao for e in db_session.query(Exercicios).order_by(Exercicios.id)] == ["nova", "d", "d"]
+    assert client.put("/update/exercicios", params={"id": 9999}, json={"descricao": "x"}).status_code == 404
+
+@pytest.mark.asyncio
+async def test_warm_pool_reabastece_sem_repetir_nome():
+    import asyncio
+
+    async def gerar(nome):
+        return {"descricao": f"d {nome}", "vantagens": "v", "passo_a_passo": "p"}
+
+    pool = WarmPool(gerar, ["Prancha", "Burpee", "Stiff"], low_watermark=2, high_watermark=4, concorrencia=2)
+    assert pool.pop() is None
+    pool.start()
+    for _ in range(50):
+        if pool.stats()["depth"] == 4:
+            break
+        await asyncio.sleep(0.01)
+    assert pool.stats()["depth"] == 4
+
+    servidos = [pool.pop(evitar="Prancha")[0]]
+    for _ in range(2):
+        servidos.append(pool.pop(evitar=servidos[-1])[0])
+    assert servidos[0] != "Prancha"
+    assert all(a != b for a, b in zip(servidos, servidos[1:]))
+
+    # Abaixo do low_watermark o reabastecimento volta a encher o pool
+    for _ in range(50):
+        if pool.stats()["depth"] == 4:
+            break
+        await asyncio.sleep(0.01)
+    await pool.stop()
+    stats = pool.stats()
+    assert stats["depth"] == 4 and stats["hits"] == 3 and stats["misses"] == 1
+    assert stats["miss_rate"] == 0.25
+
+def test_criar_exercicio_servido_do_pool(client, monkeypatch):
+    from collections import deque
+    pool = WarmPool(mock.AsyncMock(), [])
+    pool._itens = deque([("Burpee", {"descricao": "pronta", "vantagens": "v", "passo_a_passo": "p"})])
+    app.dependency_overrides[get_warm_pool] = lambda: pool
+    monkeypatch.setattr("routes.exercicios._last_exercise_name", None)
+
+    data = client.post("/exercicios/automatico").json()
+    assert (data["nome"], data["descricao"]) == ("Burpee", "pronta")
+    assert pool.stats()["hits"] == 1 and pool.stats()["depth"] == 0
+
+@pytest.mark.asyncio
+async def test_job_queue_reporta_erro_sem_afetar_outros():
+    jobs = JobQueue(workers=1)
+
+    async def ok():
+        return {"valor": 1}
+
+    async def falha():
+        raise RuntimeError("IA indisponível")
+
+    id_falha, id_ok = await jobs.submit(falha), await jobs.submit(ok)
+    assert (await jobs.aguardar(id_falha, 1))["erro"] == "IA indisponível"
+    assert (await jobs.aguardar(id_ok, 1))["resultado"] == {"valor": 1}
+    await jobs.stop()
+    assert jobs.stats()["completed"] == 1 and jobs.stats()["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_job_visivel_em_outro_worker_e_retomado_apos_queda(tmp_path):
+    import time
+    caminho = str(tmp_path / "jobs.db")
+    liberar = asyncio.Event()
+
+    async def gerar():
+        await liberar.wait()
+        return {"novo_exercicio_gerado": 7}
+
+    # Dois workers do host com o mesmo arquivo: o status_url funciona em qualquer um
+    criador, outro = JobQueue(workers=1, store=SharedJobStore(caminho)), JobQueue(workers=1, store=SharedJobStore(caminho))
+    job_id = await criador.submit(gerar)
+    assert (await outro.aguardar(job_id, 0))["status"] in ("pendente", "executando")
+    liberar.set()
+    status = await outro.aguardar(job_id, 2)
+    assert status["status"] == "concluido" and status["resultado"] == {"novo_exercicio_gerado": 7}
+    assert await outro.aguardar("inexistente", 0) is None
+    await criador.stop()
+
+    # Worker que morreu com jobs abertos: o retomável pendente é refeito por outro, o restante vira erro
+    store = SharedJobStore(caminho)
+    antigo = time.time() - 120
+    from utils.jobs import Job, EXECUTANDO
+    retomavel, avulso, executando = Job(criado_em=antigo), Job(criado_em=antigo), Job(criado_em=antigo)
+    store.criar(retomavel, "worker-morto", "proximo_exercicio", {"exercicio": 1})
+    store.criar(avulso, "worker-morto", None, None)
+    # Já executando quando o worker caiu: pode ter inserido o exercício, não é refeito
+    store.criar(executando, "worker-morto", "proximo_exercicio", {"exercicio": 2})
+    executando.status = EXECUTANDO
+    store.atualizar(executando)
+    store._conexao().execute("UPDATE jobs SET heartbeat = ?", (antigo,))
+
+    recebidos = []
+
+    async def refazer(parametros):
+        recebidos.append(parametros)
+        return {"refeito": True}
+
+    sobrevivente = JobQueue(workers=1, store=SharedJobStore(caminho), expira_seconds=30)
+    sobrevivente.registrar("proximo_exercicio", refazer)
+    sobrevivente.start()
+    assert (await sobrevivente.aguardar(retomavel.id, 2))["resultado"] == {"refeito": True}
+    assert recebidos == [{"exercicio": 1}]
+    assert (await sobrevivente.aguardar(avulso.id, 0))["status"] == "erro"
+    assert (await sobrevivente.aguardar(executando.id, 0))["status"] == "erro"
+    assert sobrevivente.stats()["recovered"] == 1
+    await sobrevivente.stop()
+    await outro.stop()
+    store.close()
+
+def test_metricas_prometheus(client):
+    client.get("/exercicios/9999")
+
+    texto = client.get("/metrics").text
+    assert '# TYPE http_request_duration_seconds histogram' in texto
+    assert 'http_request_duration_seconds_count{method="GET",route="/exercicios/{id}",status="404"}' in texto
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/exercicios/{id}",status="404",le="+Inf"}' in texto
+    assert 'http_requests_in_flight{method="GET"}' in texto
+
+@pytest.mark.asyncio
+async def test_requisicao_lenta_gera_evento_estruturado(capsys):
+    from utils.metricas import MetricsMiddleware
+
+    async def app_lento(scope, receive, send):
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(mensagem):
+        pass
+
+    middleware = MetricsMiddleware(app_lento, limite_lento_ms=0)
+    await middleware({"type": "http", "method": "POST"}, None, send)
+    evento = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert (evento["event"], evento["route"], evento["status"]) == ("slow_request", "<unmatched>", 201)
+
+def test_histograma_acumula_buckets():
+    from utils.metricas import Histogram
+    histograma = Histogram("teste_segundos", "teste", ("rota",), buckets=(0.1, 1.0))
+    for valor in (0.05, 0.5, 0.5, 3.0):
+        histograma.observe(valor, rota="/a")
+    linhas = histograma.render()
+    assert 'teste_segundos_bucket{rota="/a",le="0.1"} 1' in linhas
+    assert 'teste_segundos_bucket{rota="/a",le="1"} 3' in linhas
+    assert 'teste_segundos_bucket{rota="/a",le="+Inf"} 4' in linhas
+    assert 'teste_segundos_count{rota="/a"} 4' in linhas
+
+@pytest.mark.asyncio
+async def test_perfil_somente_com_token(tmp_path):
+    import pstats
+    from utils.profiling import ProfilingMiddleware
+
+    from starlette.concurrency import run_in_threadpool
+
+    def rota_sincrona():
+        # Rotas `def` rodam no threadpool, fora da thread do event loop
+        return sum(range(1000))
+
+    async def app_simples(scope, receive, send):
+        await run_in_threadpool(rota_sincrona)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    enviados = []
+    async def send(mensagem):
+        enviados.append(mensagem)
+
+    middleware = ProfilingMiddleware(app_simples, token="segredo", diretorio=str(tmp_path))
+    base = {"type": "http", "method": "GET", "path": "/exercicios/1"}
+    await middleware({**base, "headers": [(b"x-profile", b"errado")]}, None, send)
+    assert list(tmp_path.iterdir()) == []
+
+    await middleware({**base, "headers": [], "query_string": b"profile=segredo"}, None, send)
+    arquivo = dict(enviados[-2]["headers"])[b"x-profile-file"].decode()
+    assert arquivo.endswith("_GET_exercicios_1.prof")
+    funcoes = {funcao for _, _, funcao in pstats.Stats(str(tmp_path / arquivo)).stats}  # Formato pstats legível
+    assert "rota_sincrona" in funcoes
+
+    # Duas requisições no mesmo segundo gravam arquivos diferentes
+    await middleware({**base, "headers": [(b"x-profile", b"segredo")]}, None, send)
+    assert len(list(tmp_path.iterdir())) == 2
+
+@pytest.mark.asyncio
+async def test_perfil_nao_abre_segundo_profiler_quando_ele_e_global(monkeypatch, tmp_path):
+    import cProfile
+    from starlette.concurrency import run_in_threadpool
+    from utils import profiling
+
+    class PerfilExclusivo(cProfile.Profile):
+        # Como no 3.12+: só um perfil ativo por processo
+        ativos = 0
+
+        def enable(self):
+            if PerfilExclusivo.ativos:
+                raise ValueError("Another profiling tool is already active")
+            PerfilExclusivo.ativos += 1
+            super().enable()
+
+        def disable(self):
+            super().disable()
+            PerfilExclusivo.ativos -= 1
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", PerfilExclusivo)
+    monkeypatch.setattr(profiling, "_PERFIL_POR_THREAD", False)
+
+    async def app_simples(scope, receive, send):
+        assert await run_in_threadpool(sum, range(10)) == 45
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def send(mensagem):
+        pass
+
+    middleware = profiling.ProfilingMiddleware(app_simples, token="segredo", diretorio=str(tmp_path))
+    await middleware({"type": "http", "method": "GET", "path": "/", "headers": [(b"x-profile", b"segredo")]}, None, send)
+    assert len(list(tmp_path.iterdir())) == 1
+
+def test_admin_tracemalloc(monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from routes import admin
+    from utils.profiling import MemoryTracker
+    monkeypatch.setattr(admin.settings, "PROFILING_TOKEN", "segredo")
+    monkeypatch.setattr(admin, "memoria", MemoryTracker(str(tmp_path)))
+    app_admin = FastAPI()
+    app_admin.include_router(admin.router)
+    cliente = TestClient(app_admin)
+    cabecalho = {"X-Admin-Token": "segredo"}
+
+    assert cliente.post("/admin/tracemalloc/start").status_code == 403
+    assert cliente.post("/admin/tracemalloc/start", headers=cabecalho).json()["tracing"] is True
+    try:
+        assert cliente.post("/admin/tracemalloc/snapshot", headers=cabecalho).json()["baseline"] is True
+        # Cada nova base sobrescreve o mesmo arquivo em vez de acumular snapshots
+        assert cliente.post("/admin/tracemalloc/snapshot", headers=cabecalho).json()["arquivo"] == MemoryTracker.ARQUIVO_BASE
+        assert [p.name for p in tmp_path.iterdir()] == [MemoryTracker.ARQUIVO_BASE]
+        crescimento = [bytearray(1024) for _ in range(200)]
+        diff = cliente.get("/admin/tracemalloc/diff", params={"filtro": "test_exercicios.py"}, headers=cabecalho).json()
+        assert diff["top"] and diff["top"][0]["size_diff_kb"] >= 200
+        assert "test_exercicios.py" in diff["top"][0]["local"]
+        del crescimento
+    finally:
+        assert cliente.post("/admin/tracemalloc/stop", headers=cabecalho).json()["tracing"] is False
+
+def test_preparar_schema_pula_banco_atualizado(tmp_path):
+    from database.schema import preparar_schema
+    from database.migracoes import versao_atual, VERSAO_SCHEMA
+    banco = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    assert preparar_schema(banco, "off") is False
+    assert preparar_schema(banco, "auto") is True  # Banco novo: cria tudo
+    assert versao_atual(banco) == VERSAO_SCHEMA
+    assert preparar_schema(banco, "auto") is False
+    assert preparar_schema(banco, "always") is True
+    banco.dispose()
+
+def test_health_relata_arranque(client):
+    arranque = client.get("/health").json()["startup"]
+    assert {"schema", "contadores", "clientes_ia"} <= set(arranque["fases_ms"])
+    assert arranque["marcos_ms"]["importacoes"] <= arranque["marcos_ms"]["pronto"]
+    assert "startup_phase_seconds{phase=\"pronto\"}" in client.get("/metrics").text
+    # Os testes nunca sobem o pool global nem o preload (chamariam a IA de verdade)
+    from routes.exercicios import warm_pool
+    assert warm_pool.stats()["running"] is False
+
+def test_etag_responde_304_e_invalida_com_escritas(client, db_session):
+    from models.exercicios import Exercicios
+    from models.exercicios_historico import Exercicios_historicos
+    from utils.respostas import respostas
+
+    exercicio = Exercicios(nome="Prancha", descricao="d", vantagens="v", exercicio_ativo=True)
+    db_session.add(exercicio)
+    db_session.commit()
+    url = f"/exercicios/{exercicio.id}"
+    etag = client.get(url).headers["ETag"]
+
+    gerados = respostas.stats()["generated"]
+    resposta = client.get(url, headers={"If-None-Match": etag})
+    assert resposta.status_code == 304 and resposta.content == b""
+    assert respostas.stats()["generated"] == gerados
+
+    # Escrita em outra linha: a entrada é revalidada pela consulta leve, sem gerar o corpo de novo
+    db_session.add(Exercicios(nome="Burpee", descricao="d", vantagens="v"))
+    db_session.commit()
+    assert client.get(url, headers={"If-None-Match": f'W/{etag}, "outra"'}).status_code == 304
+    assert respostas.stats()["generated"] == gerados
+
+    assert client.put("/update/exercicios", params={"id": exercicio.id}, json={"descricao": "nova"}).status_code == 200
+    db_session.expire_all()  # A sessão de leitura dos testes é compartilhada entre requisições
+    resposta = client.get(url, headers={"If-None-Match": etag})
+    assert resposta.status_code == 200 and resposta.json()["descricao"] == "nova"
+    assert resposta.headers["ETag"] != etag
+
+    historico = client.get("/historico/exercicios/detalhado")
+    etag_historico = historico.headers["ETag"]
+    assert client.get("/historico/exercicios/detalhado", headers={"If-None-Match": etag_historico}).status_code == 304
+    db_session.add(Exercicios_historicos(exercicio_id=exercicio.id))
+    db_session.commit()
+    resposta = client.get("/historico/exercicios/detalhado", headers={"If-None-Match": etag_historico})
+    assert resposta.status_code == 200 and resposta.json()[0]["total_concluido"] == 1
+
+    permitidos = client.get("/exercicios_permitidos")
+    assert permitidos.json() and "max-age" in permitidos.headers["Cache-Control"]
+    assert client.get("/exercicios_permitidos", headers={"If-None-Match": permitidos.headers["ETag"]}).status_code == 304
+
+def test_serializacao_rapida_mantem_o_json_do_schema(client, db_session):
+    from models.exercicios import Exercicios
+    from schemas.exercicios import ExercicioOut
+    from utils.respostas import serializar
+
+    exercicio = Exercicios(nome="Agachamento búlgaro", descricao="Pernas \"e\" glúteos", vantagens="Força",
+                           passo_a_passo=None, exercicio_ativo=True)
+    db_session.add(exercicio)
+    db_session.commit()
+
+    # Colunas codificadas direto: mesmos bytes do ExercicioOut validado a partir do objeto ORM
+    resposta = client.get(f"/exercicios/{exercicio.id}")
+    assert resposta.content == ExercicioOut.model_validate(exercicio).model_dump_json().encode("utf-8")
+
+    dados = {"nome": "Flexão ✓", "lista": [1, 2.5, None, True], 3: "chave int"}
+    esperado = json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert serializar(dados) == esperado
+    assert client.get("/").headers["content-type"] == "application/json"
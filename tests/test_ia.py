@@ -0,0 +1,316 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from unittest import mock
+import utils.ia as ia
+from utils.cache_compartilhado import SharedCacheStore
+
+
+@pytest.fixture(autouse=True)
+def cache_em_memoria(monkeypatch, tmp_path):
+    # Evita ler/escrever o arquivo de cache real durante os testes
+    store = SharedCacheStore(str(tmp_path / "cache.db"))
+    cache = store.index
+    monkeypatch.setattr(ia, "_cache_store", store)
+    monkeypatch.setattr(ia, "_exercicios_cache", cache)
+    # O lifespan dos testes de rotas encerra o executor do módulo
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(ia, "executor", executor)
+
+    async def fake_get(key):
+        return cache.get(key)
+
+    async def fake_set(key, value):
+        cache[key] = value
+
+    monkeypatch.setattr(ia, "get_cached_value", fake_get)
+    monkeypatch.setattr(ia, "set_cached_value", fake_set)
+    yield cache
+    executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesce_chamadas_concorrentes():
+    chamadas = 0
+
+    async def fake_call_ai_api(prompt, system_prompt, max_tokens=80, **kwargs):
+        nonlocal chamadas
+        chamadas += 1
+        await asyncio.sleep(0.05)
+        return "Descrição gerada"
+
+    joins_antes = ia.get_single_flight_stats()["joins"]
+    with mock.patch.object(ia, "call_ai_api", fake_call_ai_api):
+        resultados = await asyncio.gather(*[ia.gerar_descricao_exercicio("Prancha") for _ in range(10)])
+
+    assert resultados == ["Descrição gerada"] * 10
+    assert chamadas == 1
+    assert ia.get_single_flight_stats()["joins"] - joins_antes == 9
+    assert ia.get_single_flight_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propaga_erro_para_todos():
+    async def fake_call_ai_api(prompt, system_prompt, max_tokens=80, **kwargs):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falha na IA")
+
+    with mock.patch.object(ia, "call_ai_api", fake_call_ai_api):
+        resultados = await asyncio.gather(
+            *[ia.gerar_vantagens_exercicio("Burpee") for _ in range(3)], return_exceptions=True
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+    assert ia.get_single_flight_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancelamento_nao_afeta_outros():
+    async def fake_call_ai_api(prompt, system_prompt, max_tokens=80, **kwargs):
+        await asyncio.sleep(0.05)
+        return "1. Passo 2. Passo 3. Passo"
+
+    with mock.patch.object(ia, "call_ai_api", fake_call_ai_api):
+        primeiro = asyncio.create_task(ia.gerar_passo_a_passo_exercicio("Stiff"))
+        segundo = asyncio.create_task(ia.gerar_passo_a_passo_exercicio("Stiff"))
+        await asyncio.sleep(0.01)
+        primeiro.cancel()
+        assert await segundo == "1. Passo 2. Passo 3. Passo"
+
+    with pytest.raises(asyncio.CancelledError):
+        await primeiro
+
+    # Com todos os interessados cancelados, a geração também é cancelada
+    with mock.patch.object(ia, "call_ai_api", fake_call_ai_api):
+        unico = asyncio.create_task(ia.gerar_passo_a_passo_exercicio("Afundo"))
+        await asyncio.sleep(0.01)
+        unico.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await unico
+        await asyncio.sleep(0)
+    assert ia.get_single_flight_stats()["in_flight"] == 0
+
+
+def test_parse_fused_response_tolera_cercas_e_listas():
+    texto = '```json\n{"descricao": " Saltos abrindo braços ", "vantagens": ["cardio", "coordenação"], "passo_a_passo": ["Pés juntos", "Salte", "Volte"]}\n```'
+    assert ia.parse_fused_response(texto) == {
+        "descricao": "Saltos abrindo braços",
+        "vantagens": "cardio, coordenação",
+        "passo_a_passo": "1. Pés juntos 2. Salte 3. Volte",
+    }
+    assert ia.parse_fused_response("sem json aqui") == {}
+    assert ia.parse_fused_response('{"descricao": "", "vantagens": 3}') == {}
+
+
+@pytest.mark.asyncio
+async def test_geracao_fundida_usa_caminho_por_campo_so_para_faltantes(cache_em_memoria, monkeypatch):
+    chamadas = []
+
+    async def fake_call_ai_api(prompt, system_prompt, max_tokens=80, json_mode=False, **kwargs):
+        chamadas.append(json_mode)
+        if json_mode:
+            return '{"descricao": "Descrição fundida", "vantagens": "Vantagens fundidas", "passo_a_passo": ""}'
+        return "1. Um 2. Dois 3. Três"
+
+    monkeypatch.setitem(ia.AI_CONFIG, "generation_mode", "fused")
+    monkeypatch.setattr(ia, "load_cache_async", mock.AsyncMock(return_value=cache_em_memoria))
+    with mock.patch.object(ia, "call_ai_api", fake_call_ai_api):
+        resultado = await ia.gerar_exercicio_completo_otimizado("Saltos laterais")
+
+    assert resultado == {
+        "descricao": "Descrição fundida",
+        "vantagens": "Vantagens fundidas",
+        "passo_a_passo": "1. Um 2. Dois 3. Três",
+    }
+    assert chamadas == [True, False]
+    # Os campos vão para as mesmas chaves de cache do caminho por campo
+    assert cache_em_memoria[ia.get_cache_key("Saltos laterais", "descricao")] == "Descrição fundida"
+    assert cache_em_memoria[ia.get_cache_key("Saltos laterais", "passo_a_passo")] == "1. Um 2. Dois 3. Três"
+
+
+@pytest.mark.asyncio
+async def test_outro_worker_com_lease_evita_chamada_duplicada(monkeypatch):
+    # Outro worker do host (outra conexão ao mesmo arquivo) já está gerando o campo
+    outro_worker = SharedCacheStore(ia._cache_store.path)
+    chave = ia.get_cache_key("Remada", "descricao")
+    assert outro_worker.adquirir_lease(chave, 30)
+    monkeypatch.setitem(ia.CACHE_CONFIG, "shared_poll_interval_seconds", 0.01)
+    chamada_ia = mock.AsyncMock(return_value="Gerada de novo")
+
+    async def outro_worker_termina():
+        await asyncio.sleep(0.05)
+        outro_worker.set(chave, "Gerada pelo outro worker")
+        outro_worker.liberar_lease(chave)
+
+    with mock.patch.object(ia, "call_ai_api", chamada_ia):
+        resultado, _ = await asyncio.gather(ia.gerar_descricao_exercicio("Remada"), outro_worker_termina())
+
+    assert resultado == "Gerada pelo outro worker"
+    chamada_ia.assert_not_called()
+    outro_worker.close()
+
+
+@pytest.fixture
+def fake_openrouter(monkeypatch):
+    import httpx
+    from benchmarks.fake_openrouter import FakeOpenRouter
+    from utils.resiliencia import CircuitBreaker
+    from utils.roteador import ModelRouter
+    from utils.governador import OutboundGovernor
+
+    fake = FakeOpenRouter()
+    monkeypatch.setattr(ia, "http_client", httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app)))
+    monkeypatch.setattr(ia, "_breakers", {m: CircuitBreaker(failure_threshold=2, open_seconds=60) for m in ia.MODELOS_IA})
+    monkeypatch.setattr(ia, "roteador", ModelRouter(ia.MODELOS_IA, exploracao=0))
+    monkeypatch.setattr(ia, "governador", OutboundGovernor(taxa_por_segundo=1000, rajada=100))
+    monkeypatch.setitem(ia.AI_CONFIG, "hedge_initial_delay_seconds", 0.05)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_hedge_dispara_fallback_quando_principal_demora(fake_openrouter):
+    import time
+    principal, fallback = ia.MODELOS_IA
+    fake_openrouter.latencias.update({principal: 2.0, fallback: 0.01})
+
+    inicio = time.perf_counter()
+    resposta = await ia.call_ai_api("prompt", "system")
+    assert resposta == f"Resposta de {fallback}"
+    assert time.perf_counter() - inicio < 1.0
+    await asyncio.sleep(0.01)
+    assert fake_openrouter.canceladas[principal] == 1
+    # O perdedor cancelado não conta como falha do modelo
+    assert ia.get_ai_resilience_stats()["models"][principal]["breaker"]["failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_pula_modelo_com_falhas_seguidas(fake_openrouter):
+    import httpx
+    principal, fallback = ia.MODELOS_IA
+    fake_openrouter.falhas[principal] = 1.0
+
+    # Um tipo de prompt novo por chamada: o roteador sempre sugere o principal primeiro
+    for i in range(3):
+        assert await ia.call_ai_api("prompt", "system", tipo=f"t{i}") == f"Resposta de {fallback}"
+
+    # Duas falhas abrem o circuito; a terceira chamada vai direto ao fallback
+    assert fake_openrouter.chamadas[principal] == 2
+    assert ia.get_ai_resilience_stats()["models"][principal]["breaker"]["state"] == "open"
+
+    # Com os dois circuitos abertos a chamada falha na hora, sem ir à rede
+    fake_openrouter.falhas[fallback] = 1.0
+    for i in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await ia.call_ai_api("prompt", "system", tipo=f"u{i}")
+    with pytest.raises(ia.IAIndisponivel):
+        await ia.call_ai_api("prompt", "system", tipo="v")
+    assert fake_openrouter.chamadas[fallback] == 5
+
+
+@pytest.mark.asyncio
+async def test_stream_usa_fallback_quando_principal_responde_503(fake_openrouter):
+    import httpx
+    principal, fallback = ia.MODELOS_IA
+    fake_openrouter.falhas[principal] = 1.0
+
+    tokens = [token async for token in ia.call_ai_api_stream("prompt", "system", tipo="s1")]
+    assert "".join(tokens).strip() == f"Resposta de {fallback}"
+    assert fake_openrouter.chamadas[principal] == 1
+
+    # Todos os modelos falhando: o erro do último chega ao chamador
+    fake_openrouter.falhas[fallback] = 1.0
+    with pytest.raises(httpx.HTTPStatusError):
+        async for _ in ia.call_ai_api_stream("prompt", "system", tipo="s2"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_roteador_prefere_modelo_mais_rapido_por_tipo(fake_openrouter, monkeypatch):
+    from utils.roteador import prazo
+    principal, fallback = ia.MODELOS_IA
+    fake_openrouter.latencias.update({principal: 0.05, fallback: 0.01})
+    monkeypatch.setitem(ia.AI_CONFIG, "hedge_enabled", False)
+
+    # Sem amostras vale a ordem configurada; o fallback ganha amostras quando o principal falha
+    fake_openrouter.falhas[principal] = 1.0
+    await ia.call_ai_api("prompt", "system", tipo="descricao")
+    fake_openrouter.falhas[principal] = 0.0
+    await ia.call_ai_api("prompt", "system", tipo="vantagens")
+
+    assert ia.roteador.ordenar("descricao")[0] == fallback
+    assert ia.roteador.ordenar("vantagens")[0] == principal
+
+    # O timeout da tentativa nunca passa do prazo restante
+    async with prazo(0.2):
+        assert ia.roteador.timeout(principal, "vantagens") <= 0.2
+
+    decisao = ia.roteador.stats()["recent_decisions"][-1]
+    assert decisao["tipo"] == "vantagens" and decisao["ordem"][0] == principal
+
+
+@pytest.mark.asyncio
+async def test_governador_atende_interativa_antes_de_background():
+    from utils.governador import OutboundGovernor, INTERATIVA, BACKGROUND
+    governador = OutboundGovernor(taxa_por_segundo=1000, rajada=10, max_concorrencia=1, reserva_interativa=0)
+    ordem = []
+
+    async def chamada(nome, nivel):
+        async with governador.permissao(nivel):
+            ordem.append(nome)
+            await asyncio.sleep(0.01)
+
+    async with governador.permissao(INTERATIVA):
+        tasks = [asyncio.create_task(chamada(f"bg{i}", BACKGROUND)) for i in range(2)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(chamada("usuario", INTERATIVA)))
+        await asyncio.sleep(0)
+        assert governador.stats()["classes"]["background"]["queue_depth"] == 2
+    await asyncio.gather(*tasks)
+    assert ordem == ["usuario", "bg0", "bg1"]
+
+
+@pytest.mark.asyncio
+async def test_governador_pausa_background_apos_429(fake_openrouter, monkeypatch):
+    from utils.governador import OutboundGovernor, prioridade, BACKGROUND
+    principal, fallback = ia.MODELOS_IA
+    monkeypatch.setattr(ia, "governador", OutboundGovernor(taxa_por_segundo=1000, rajada=100, backoff_inicial=0.2))
+    fake_openrouter.status_falha = 429
+    fake_openrouter.falhas.update({principal: 1.0, fallback: 1.0})
+
+    with pytest.raises(Exception):
+        await ia.call_ai_api("prompt", "system", tipo="a")
+    assert ia.governador.stats()["rate_limited"] == 2
+    # Limite de taxa é do provedor, não do modelo: os circuitos continuam fechados
+    modelos = ia.get_ai_resilience_stats()["models"]
+    assert modelos[principal]["breaker"]["failures"] == 0 and modelos[principal]["breaker"]["state"] == "closed"
+    assert ia.governador.stats()["background_paused_s"] >= 0.9  # Retry-After: 1
+
+    # Interativa segue na hora; background espera a pausa
+    fake_openrouter.falhas.update({principal: 0.0, fallback: 0.0})
+    assert await ia.call_ai_api("prompt", "system", tipo="b") == f"Resposta de {principal}"
+    with prioridade(BACKGROUND):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(ia.call_ai_api("prompt", "system", tipo="c"), 0.3)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_promove_geracao_de_background_com_chamador_interativo(monkeypatch):
+    from utils.governador import OutboundGovernor, prioridade, BACKGROUND
+    governador = OutboundGovernor(taxa_por_segundo=1000, rajada=100)
+    monkeypatch.setattr(ia, "governador", governador)
+    governador.registrar_limite(retry_after=30)  # Background pausado por um 429
+
+    async def gerar():
+        async with ia.governador.permissao():
+            return "texto"
+
+    with prioridade(BACKGROUND):
+        lider = asyncio.create_task(ia.single_flight("promocao", gerar))
+    await asyncio.sleep(0.01)
+    assert governador.stats()["classes"]["background"]["queue_depth"] == 1
+
+    # O usuário que entra na mesma geração não espera o backoff da classe background
+    assert await asyncio.wait_for(ia.single_flight("promocao", gerar), 1) == "texto"
+    assert await lider == "texto"
+    assert governador.stats()["classes"]["interactive"]["acquired"] == 1
+    assert governador.stats()["classes"]["background"]["acquired"] == 0
@@ -0,0 +1,66 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Referência de tempo: importado como primeiro módulo do app, marca o início do arranque
+INICIO = time.perf_counter()
+
+
+class StartupTimer:
+    """
+    Marcos do arranque do processo, em segundos desde `inicio`:
+    1. fase(nome) mede um trecho (importações, schema, lifespan...)
+    2. marcar(nome) registra um instante (ex.: "pronto", "primeira_requisicao"); só a
+       primeira marcação de cada nome vale
+    O relatório alimenta /health, o gauge startup_phase_seconds e benchmarks/arranque.py.
+    """
+
+    def __init__(self, inicio: float = INICIO):
+        self.inicio = inicio
+        self.fases: Dict[str, float] = {}
+        self.marcos: Dict[str, float] = {}
+
+    @contextmanager
+    def fase(self, nome: str):
+        comeco = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nome] = time.perf_counter() - comeco
+
+    def marcar(self, nome: str) -> Optional[float]:
+        """Registra o marco e retorna os segundos desde o início (None se já estava marcado)"""
+        if nome in self.marcos:
+            return None
+        self.marcos[nome] = time.perf_counter() - self.inicio
+        return self.marcos[nome]
+
+    def relatorio(self) -> Dict[str, Any]:
+        return {
+            "fases_ms": {nome: round(s * 1000, 1) for nome, s in self.fases.items()},
+            "marcos_ms": {nome: round(s * 1000, 1) for nome, s in self.marcos.items()},
+        }
+
+
+class FirstRequestMiddleware:
+    """Marca "primeira_requisicao" quando a primeira resposta HTTP termina de ser enviada"""
+
+    def __init__(self, app, timer: StartupTimer, ao_marcar=None):
+        self.app = app
+        self.timer = timer
+        self.ao_marcar = ao_marcar
+        self._marcado = False
+
+    async def __call__(self, scope, receive, send):
+        if self._marcado or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def enviar(mensagem):
+            await send(mensagem)
+            if mensagem["type"] == "http.response.body" and not mensagem.get("more_body") and not self._marcado:
+                self._marcado = True
+                segundos = self.timer.marcar("primeira_requisicao")
+                if segundos is not None and self.ao_marcar is not None:
+                    self.ao_marcar(segundos)
+
+        await self.app(scope, receive, enviar)
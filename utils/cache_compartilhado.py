@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, MutableMapping, Optional
+
+
+class SharedCacheStore:
+    """
+    Cache de IA compartilhado entre os workers do host, em um arquivo SQLite:
+    1. `index` é o L1 em memória do processo (pode ser limitado, ex.: TTLCache);
+       o SQLite é a fonte compartilhada e completa, consultada por get() quando o L1 não tem a chave
+    2. PRAGMA data_version muda quando outra conexão (outro worker) faz commit:
+       só então as entradas novas (versao > última vista) são relidas para o L1
+    3. Escritas usam BEGIN IMMEDIATE; o lock de escrita do SQLite serializa os workers
+    4. Leases por chave garantem que uma única geração por chave aconteça no host
+    Os métodos fazem I/O bloqueante: no event loop devem rodar em um executor.
+    """
+
+    def __init__(self, path: str, importar: Optional[Callable[[], Dict[str, str]]] = None,
+                 busy_timeout_seconds: float = 5.0, index: Optional[MutableMapping] = None):
+        self.path = path
+        self.importar = importar
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self.dono = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.index: MutableMapping = {} if index is None else index
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._versao_vista = 0
+        self._data_version: Optional[int] = None
+        self._stats = {"syncs": 0, "refreshed": 0, "writes": 0, "leases_acquired": 0, "leases_busy": 0}
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # isolation_level=None: as transações são abertas explicitamente (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (chave TEXT PRIMARY KEY, valor TEXT NOT NULL, versao INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_versao ON cache (versao)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (chave TEXT PRIMARY KEY, dono TEXT NOT NULL, expira REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def load(self) -> Dict[str, str]:
+        """Carrega todas as entradas no L1 (importando o cache antigo se o arquivo compartilhado estiver vazio)"""
+        with self._lock:
+            conn = self._conexao()
+            if self.importar is not None and conn.execute("SELECT 1 FROM cache LIMIT 1").fetchone() is None:
+                self._importar(conn)
+            self._versao_vista = 0
+            self._ler_novas(conn)
+            return self.index
+
+    def _importar(self, conn: sqlite3.Connection) -> None:
+        entradas = self.importar()
+        if not entradas:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Outro worker pode ter importado enquanto este esperava o lock
+            if conn.execute("SELECT 1 FROM cache LIMIT 1").fetchone() is None:
+                conn.executemany(
+                    "INSERT INTO cache (chave, valor, versao) VALUES (?, ?, 1)", list(entradas.items())
+                )
+                print(f"Cache compartilhado: {len(entradas)} entradas importadas")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _ler_novas(self, conn: sqlite3.Connection) -> int:
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        linhas = conn.execute(
+            "SELECT chave, valor, versao FROM cache WHERE versao > ? ORDER BY versao", (self._versao_vista,)
+        ).fetchall()
+        for chave, valor, versao in linhas:
+            self.index[chave] = valor
+            self._versao_vista = max(self._versao_vista, versao)
+        return len(linhas)
+
+    def sincronizar(self) -> int:
+        """Relê para o L1 o que outros workers gravaram; sem escrita alheia custa só o PRAGMA"""
+        with self._lock:
+            conn = self._conexao()
+            self._stats["syncs"] += 1
+            if conn.execute("PRAGMA data_version").fetchone()[0] == self._data_version:
+                return 0
+            atualizadas = self._ler_novas(conn)
+            self._stats["refreshed"] += atualizadas
+            return atualizadas
+
+    def get(self, chave: str) -> Optional[str]:
+        """Valor do L1 ou, se ele não tiver a chave (despejada ou vencida), do arquivo compartilhado"""
+        valor = self.index.get(chave)
+        if valor is not None:
+            return valor
+        with self._lock:
+            linha = self._conexao().execute("SELECT valor FROM cache WHERE chave = ?", (chave,)).fetchone()
+        if linha is None:
+            return None
+        self.index[chave] = linha[0]
+        return linha[0]
+
+    def set(self, chave: str, valor: str) -> None:
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (chave, valor, versao) "
+                    "VALUES (?, ?, (SELECT COALESCE(MAX(versao), 0) + 1 FROM cache))",
+                    (chave, valor)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.index[chave] = valor
+            self._stats["writes"] += 1
+
+    def adquirir_lease(self, chave: str, duracao: float) -> bool:
+        """Reserva a geração de `chave` para este worker; False se outro worker já a detém"""
+        with self._lock:
+            conn = self._conexao()
+            agora = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM leases WHERE chave = ? AND expira < ?", (chave, agora))
+                conn.execute(
+                    "INSERT OR IGNORE INTO leases (chave, dono, expira) VALUES (?, ?, ?)",
+                    (chave, self.dono, agora + duracao)
+                )
+                dono = conn.execute("SELECT dono FROM leases WHERE chave = ?", (chave,)).fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            obtido = dono == self.dono
+            self._stats["leases_acquired" if obtido else "leases_busy"] += 1
+            return obtido
+
+    def lease_ativa(self, chave: str) -> bool:
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT 1 FROM leases WHERE chave = ? AND expira >= ?", (chave, time.time())
+            ).fetchone()
+            return linha is not None
+
+    def liberar_lease(self, chave: str) -> None:
+        with self._lock:
+            self._conexao().execute("DELETE FROM leases WHERE chave = ? AND dono = ?", (chave, self.dono))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "l1_entries": len(self.index),
+            **self._stats,
+            "db_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
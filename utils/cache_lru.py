@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+def tamanho_aproximado(valor: Any) -> int:
+    """Bytes ocupados pelo valor (strings e dicionários de strings, o que os caches guardam)"""
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_aproximado(k) + tamanho_aproximado(v) for k, v in valor.items())
+    return sys.getsizeof(valor)
+
+
+class TTLCache(MutableMapping):
+    """
+    Cache em memória com despejo LRU e expiração por entrada:
+    1. OrderedDict: leitura move a entrada para o fim, despejo remove do início (O(1))
+    2. Limites em número de entradas e em bytes (tamanho aproximado de chave + valor)
+    3. Entrada vencida conta como ausente e é removida ao ser lida; as demais vencidas
+       são varridas no máximo uma vez por intervalo_limpeza, durante uma escrita
+    4. Um lock curto protege cada operação: seguro para o event loop e para threads
+       do executor (nenhuma operação espera I/O)
+    `ao_remover(motivo)` é chamado a cada despejo ("eviction") ou expiração ("expired");
+    `ao_descartar(chave, valor)` sempre que um valor sai do cache, por qualquer motivo
+    (inclusive substituição e remoção explícita). `medir(valor)` dá os bytes do valor.
+    """
+
+    def __init__(self, max_entradas: int, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 intervalo_limpeza: Optional[float] = None, ao_remover: Optional[Callable[[str], None]] = None,
+                 ao_descartar: Optional[Callable[[Any, Any], None]] = None,
+                 medir: Callable[[Any], int] = tamanho_aproximado):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.intervalo_limpeza = intervalo_limpeza
+        self.ao_remover = ao_remover
+        self.ao_descartar = ao_descartar
+        self.medir = medir
+        # chave -> (valor, expira em (monotonic) ou None, bytes)
+        self._dados: OrderedDict[Any, Tuple[Any, Optional[float], int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._ultima_limpeza = time.monotonic()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _remover(self, chave, motivo: Optional[str] = None) -> None:
+        valor, _, tamanho = self._dados.pop(chave)
+        self._bytes -= tamanho
+        if self.ao_descartar is not None:
+            self.ao_descartar(chave, valor)
+        if motivo is not None:
+            self._stats["evictions" if motivo == "eviction" else "expirations"] += 1
+            if self.ao_remover is not None:
+                self.ao_remover(motivo)
+
+    def _vencida(self, expira: Optional[float], agora: float) -> bool:
+        return expira is not None and expira <= agora
+
+    def get(self, chave, default=None):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and self._vencida(entrada[1], time.monotonic()):
+                self._remover(chave, "expired")
+                entrada = None
+            if entrada is None:
+                self._stats["misses"] += 1
+                return default
+            self._dados.move_to_end(chave)
+            self._stats["hits"] += 1
+            return entrada[0]
+
+    def __getitem__(self, chave):
+        marcador = object()
+        valor = self.get(chave, marcador)
+        if valor is marcador:
+            raise KeyError(chave)
+        return valor
+
+    def set(self, chave, valor, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        agora = time.monotonic()
+        tamanho = tamanho_aproximado(chave) + self.medir(valor)
+        with self._lock:
+            if chave in self._dados:
+                self._remover(chave)
+            self._dados[chave] = (valor, agora + ttl if ttl is not None else None, tamanho)
+            self._bytes += tamanho
+            if self.intervalo_limpeza is not None and agora - self._ultima_limpeza >= self.intervalo_limpeza:
+                self._limpar_vencidas(agora)
+            while len(self._dados) > self.max_entradas or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                mais_antiga = next(iter(self._dados))
+                if mais_antiga == chave and len(self._dados) == 1:
+                    break  # Uma entrada maior que o limite de bytes ainda é guardada sozinha
+                self._remover(mais_antiga, "eviction")
+
+    def __setitem__(self, chave, valor) -> None:
+        self.set(chave, valor)
+
+    def __delitem__(self, chave) -> None:
+        with self._lock:
+            self._remover(chave)
+
+    def _limpar_vencidas(self, agora: float) -> int:
+        vencidas = [chave for chave, (_, expira, _) in self._dados.items() if self._vencida(expira, agora)]
+        for chave in vencidas:
+            self._remover(chave, "expired")
+        self._ultima_limpeza = agora
+        return len(vencidas)
+
+    def limpar_vencidas(self) -> int:
+        with self._lock:
+            return self._limpar_vencidas(time.monotonic())
+
+    def __contains__(self, chave) -> bool:
+        with self._lock:
+            entrada = self._dados.get(chave)
+            return entrada is not None and not self._vencida(entrada[1], time.monotonic())
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            return iter(list(self._dados))
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def clear(self) -> None:
+        with self._lock:
+            for chave in list(self._dados):
+                self._remover(chave)
+
+    def stats(self) -> Dict[str, Any]:
+        consultas = self._stats["hits"] + self._stats["misses"]
+        return {
+            "entries": len(self._dados),
+            "bytes": self._bytes,
+            "max_entries": self.max_entradas,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / consultas, 3) if consultas else 0.0,
+        }
@@ -0,0 +1,49 @@
+import json
+import os
+from typing import Dict, Optional
+
+
+class LogCacheStore:
+    """
+    Leitor do log append-only que guardava o cache de IA antes do cache compartilhado (SQLite).
+    O formato é só de importação: nada mais escreve nesse arquivo, ele é lido uma vez quando o
+    cache compartilhado é criado.
+    1. Cada linha do log é um registro JSON {"k": chave, "v": valor}; vale o último de cada chave
+    2. Registros incompletos no final (queda no meio de uma escrita) são ignorados
+    3. Sem log, o JSON ainda mais antigo (legacy_json_path) é importado diretamente
+    """
+
+    def __init__(self, path: str, legacy_json_path: Optional[str] = None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self.index: Dict[str, str] = {}
+
+    def load(self) -> Dict[str, str]:
+        """Reconstrói o índice a partir do log (ou do JSON antigo, se não houver log)"""
+        self.index = {}
+        if os.path.exists(self.path):
+            self._replay()
+        elif self.legacy_json_path and os.path.exists(self.legacy_json_path):
+            self._import_legacy()
+        return self.index
+
+    def _replay(self) -> None:
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Escrita interrompida no meio do registro
+                try:
+                    record = json.loads(line)
+                    self.index[record["k"]] = record["v"]
+                except (ValueError, KeyError, TypeError):
+                    break
+
+    def _import_legacy(self) -> None:
+        try:
+            with open(self.legacy_json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"Erro ao importar cache antigo: {e}")
+            return
+        self.index = {k: v for k, v in legacy.items() if isinstance(v, str)}
+        print(f"Cache: {len(self.index)} entradas importadas de {os.path.basename(self.legacy_json_path)}")
@@ -0,0 +1,82 @@
+from typing import Dict
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+from models.contadores import Contadores
+from models.exercicios import Exercicios
+from models.exercicios_ativos import Exercicios_ativos
+from models.exercicios_historico import Exercicios_historicos
+
+# Contador -> modelo cujas linhas ele conta
+MODELOS_CONTADOS = {
+    "total": Exercicios,
+    "ativos": Exercicios_ativos,
+    "concluidos": Exercicios_historicos,
+}
+
+@event.listens_for(Session, "after_flush")
+def _atualizar_contadores(session: Session, flush_context) -> None:
+    """
+    Mantém os contadores na mesma transação das escritas: cada flush soma as
+    linhas inseridas e subtrai as removidas dos modelos contados.
+    Vale para qualquer caminho que use o ORM (inclusive AsyncSession);
+    inserts em massa via Core não passam por aqui e são corrigidos pela reconciliação.
+    """
+    deltas: Dict[str, int] = {}
+    for nome, modelo in MODELOS_CONTADOS.items():
+        delta = sum(1 for obj in session.new if isinstance(obj, modelo))
+        delta -= sum(1 for obj in session.deleted if isinstance(obj, modelo))
+        if delta:
+            deltas[nome] = delta
+
+    conexao = session.connection()
+    for nome, delta in deltas.items():
+        conexao.execute(
+            update(Contadores).where(Contadores.nome == nome).values(valor=Contadores.valor + delta)
+        )
+
+def contar(db: Session) -> Dict[str, int]:
+    """Recalcula os contadores do zero (COUNT(*) em cada tabela)"""
+    return {nome: db.scalar(select(func.count()).select_from(modelo)) for nome, modelo in MODELOS_CONTADOS.items()}
+
+def reconciliar_contadores(db: Session, corrigir: bool = True) -> Dict[str, Dict[str, int]]:
+    """
+    Compara os contadores mantidos com a contagem real e, se pedido, corrige.
+    Retorna {contador: {"armazenado", "real", "diferenca"}}.
+    """
+    reais = contar(db)
+    armazenados = {c.nome: c.valor for c in db.query(Contadores).all()}
+
+    relatorio = {}
+    for nome, real in reais.items():
+        armazenado = armazenados.get(nome)
+        relatorio[nome] = {
+            "armazenado": armazenado,
+            "real": real,
+            "diferenca": real - armazenado if armazenado is not None else None
+        }
+        if corrigir and armazenado != real:
+            db.merge(Contadores(nome=nome, valor=real))
+
+    if corrigir:
+        db.commit()
+    return relatorio
+
+def garantir_contadores(db: Session) -> None:
+    """Semeia, a partir da contagem real, os contadores que ainda não existem"""
+    existentes = {nome for (nome,) in db.query(Contadores.nome).all()}
+    if existentes.issuperset(MODELOS_CONTADOS):
+        return
+    for nome, real in contar(db).items():
+        if nome not in existentes:
+            db.add(Contadores(nome=nome, valor=real))
+    db.commit()
+
+def ler_contadores(db: Session) -> Dict[str, int]:
+    """
+    Lê os contadores em O(1). Funciona com sessão somente leitura:
+    se ainda não foram semeados, devolve a contagem real sem persistir.
+    """
+    valores = {c.nome: c.valor for c in db.query(Contadores).all()}
+    if len(valores) < len(MODELOS_CONTADOS):
+        return contar(db)
+    return {nome: valores[nome] for nome in MODELOS_CONTADOS}
@@ -0,0 +1,218 @@
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# Dicionário de compressão: textos curtos (1-3 linhas) quase não comprimem sozinhos; com
+# o vocabulário comum das respostas pré-carregado o zlib já encontra repetições no primeiro byte
+ZDICT_PADRAO = " ".join([
+    "Exercício para fortalecimento muscular e condicionamento físico.",
+    "Melhora força, resistência, coordenação, equilíbrio, flexibilidade e saúde cardiovascular.",
+    "1. Posicione-se adequadamente com os pés afastados na largura dos ombros.",
+    "2. Execute o movimento com controle, mantendo o abdômen contraído e a coluna neutra.",
+    "3. Retorne à posição inicial e mantenha respiração constante. Repita.",
+    "Trabalha os músculos das pernas, glúteos, braços, ombros, costas, peito e core.",
+    "Ideal para iniciantes, ajuda a queimar calorias e melhora a postura e a mobilidade.",
+]).encode("utf-8")
+
+
+class ContentStore:
+    """
+    Uma cópia de cada texto, referenciada por handles inteiros (índices de uma lista):
+    1. guardar() deduplica pelo próprio texto e conta referências; liberar() solta uma
+       referência e o texto sai da memória quando ninguém mais o usa
+    2. Contagem de referências e último acesso ficam em arrays (8 bytes por texto, sem
+       objetos por entrada); handles liberados são reaproveitados, então quem lê um handle
+       não pode liberá-lo ao mesmo tempo (CompactCache garante isso com seu lock)
+    3. Textos não lidos há frio_apos_seconds são comprimidos (zlib com dicionário) na
+       próxima varredura, feita no máximo uma vez por intervalo_compactacao durante guardar();
+       um texto frio lido de novo volta a ficar descomprimido. Textos frios não entram na
+       deduplicação (um texto igual guardado depois ganha outro handle)
+    """
+
+    def __init__(self, comprimir: bool = True, frio_apos_seconds: float = 600.0,
+                 intervalo_compactacao: float = 60.0, min_bytes_compressao: int = 64, zdict: bytes = ZDICT_PADRAO):
+        self.comprimir = comprimir
+        self.frio_apos_seconds = frio_apos_seconds
+        self.intervalo_compactacao = intervalo_compactacao
+        self.min_bytes_compressao = min_bytes_compressao
+        self.zdict = zdict
+        # handle -> texto (str quando quente, bytes zlib quando frio, None quando livre)
+        self._dados: List[Union[str, bytes, None]] = []
+        self._refs = array("q")
+        self._acesso = array("d")
+        self._livres: List[int] = []
+        self._por_texto: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._ultima_compactacao = time.monotonic()
+        self._stats = {"dedup_hits": 0, "compressed": 0, "decompressed": 0}
+
+    def _comprimir(self, texto: str) -> bytes:
+        compressor = zlib.compressobj(9, zdict=self.zdict)
+        return compressor.compress(texto.encode("utf-8")) + compressor.flush()
+
+    def _descomprimir(self, dado: bytes) -> str:
+        descompressor = zlib.decompressobj(zdict=self.zdict)
+        return (descompressor.decompress(dado) + descompressor.flush()).decode("utf-8")
+
+    def guardar(self, texto: str) -> int:
+        """Handle do texto (o mesmo para textos iguais), com uma referência a mais"""
+        agora = time.monotonic()
+        with self._lock:
+            handle = self._por_texto.get(texto)
+            if handle is not None:
+                self._stats["dedup_hits"] += 1
+            elif self._livres:
+                handle = self._livres.pop()
+                self._dados[handle] = texto
+                self._refs[handle] = 0
+                self._por_texto[texto] = handle
+            else:
+                handle = len(self._dados)
+                self._dados.append(texto)
+                self._refs.append(0)
+                self._acesso.append(agora)
+                self._por_texto[texto] = handle
+            self._refs[handle] += 1
+            self._acesso[handle] = agora
+            if self.comprimir and agora - self._ultima_compactacao >= self.intervalo_compactacao:
+                self._compactar(agora)
+            return handle
+
+    def ler(self, handle: int) -> Optional[str]:
+        """Texto do handle (None se estiver livre)"""
+        with self._lock:
+            dado = self._dados[handle] if handle < len(self._dados) else None
+            if dado is None:
+                return None
+            self._acesso[handle] = time.monotonic()
+            if isinstance(dado, bytes):
+                dado = self._dados[handle] = self._descomprimir(dado)
+                self._por_texto.setdefault(dado, handle)
+                self._stats["decompressed"] += 1
+            return dado
+
+    def liberar(self, handle: int) -> None:
+        with self._lock:
+            dado = self._dados[handle] if handle < len(self._dados) else None
+            if dado is None:
+                return
+            self._refs[handle] -= 1
+            if self._refs[handle] <= 0:
+                if isinstance(dado, str) and self._por_texto.get(dado) == handle:
+                    del self._por_texto[dado]
+                self._dados[handle] = None
+                self._livres.append(handle)
+
+    def tamanho(self, handle: int) -> int:
+        dado = self._dados[handle] if handle < len(self._dados) else None
+        return sys.getsizeof(dado) if dado is not None else 0
+
+    def _compactar(self, agora: float) -> int:
+        comprimidos = 0
+        for handle, dado in enumerate(self._dados):
+            if (isinstance(dado, str) and agora - self._acesso[handle] >= self.frio_apos_seconds
+                    and len(dado) >= self.min_bytes_compressao):
+                comprimido = self._comprimir(dado)
+                if sys.getsizeof(comprimido) < sys.getsizeof(dado):
+                    self._dados[handle] = comprimido
+                    if self._por_texto.get(dado) == handle:
+                        del self._por_texto[dado]
+                    comprimidos += 1
+        self._stats["compressed"] += comprimidos
+        self._ultima_compactacao = agora
+        return comprimidos
+
+    def compactar(self) -> int:
+        """Comprime agora os textos frios; retorna quantos foram comprimidos"""
+        with self._lock:
+            return self._compactar(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ocupados = [d for d in self._dados if d is not None]
+            return {
+                "texts": len(ocupados),
+                "cold_texts": sum(1 for d in ocupados if isinstance(d, bytes)),
+                "references": sum(self._refs),
+                "stored_bytes": sum(sys.getsizeof(d) for d in ocupados),
+                "free_handles": len(self._livres),
+                **self._stats,
+            }
+
+
+class CompactCache(MutableMapping):
+    """
+    Cache de handles do ContentStore no lugar dos textos, sobre um cache criado por
+    fabrica_cache(**opcoes) (ex.: TTLCache), que recebe ao_descartar e medir deste adaptador
+    para liberar os textos quando a entrada sai e contar os bytes do texto referenciado.
+    Aceita valores str ou dict de str (ex.: os três campos de um exercício), guardado como
+    uma tupla (nomes dos campos, handle, handle, ...) com a tupla de nomes compartilhada;
+    chaves são internadas. O lock cobre leitura do handle + leitura do texto, para que um
+    despejo concorrente não libere (e reaproveite) o handle no meio da leitura.
+    """
+
+    def __init__(self, conteudos: ContentStore, fabrica_cache, **opcoes):
+        self.conteudos = conteudos
+        self.cache = fabrica_cache(ao_descartar=self._descartar, medir=self._medir, **opcoes)
+        self._formatos: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _codificar(self, valor):
+        if isinstance(valor, dict):
+            campos = tuple(sys.intern(campo) for campo in valor)
+            campos = self._formatos.setdefault(campos, campos)
+            return (campos, *(self.conteudos.guardar(texto) for texto in valor.values()))
+        return self.conteudos.guardar(valor)
+
+    def _decodificar(self, codificado):
+        if isinstance(codificado, tuple):
+            return dict(zip(codificado[0], map(self.conteudos.ler, codificado[1:])))
+        return self.conteudos.ler(codificado)
+
+    def _medir(self, codificado) -> int:
+        handles = codificado[1:] if isinstance(codificado, tuple) else (codificado,)
+        return sys.getsizeof(codificado) + sum(self.conteudos.tamanho(h) for h in handles)
+
+    def _descartar(self, chave, codificado) -> None:
+        for handle in (codificado[1:] if isinstance(codificado, tuple) else (codificado,)):
+            self.conteudos.liberar(handle)
+
+    def get(self, chave, default=None):
+        with self._lock:
+            codificado = self.cache.get(chave)
+            return default if codificado is None else self._decodificar(codificado)
+
+    def __getitem__(self, chave):
+        marcador = object()
+        valor = self.get(chave, marcador)
+        if valor is marcador:
+            raise KeyError(chave)
+        return valor
+
+    def __setitem__(self, chave, valor) -> None:
+        with self._lock:
+            self.cache[sys.intern(chave)] = self._codificar(valor)
+
+    def __delitem__(self, chave) -> None:
+        with self._lock:
+            del self.cache[chave]
+
+    def __contains__(self, chave) -> bool:
+        return chave in self.cache
+
+    def __iter__(self) -> Iterator:
+        return iter(self.cache)
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,233 @@
+import asyncio
+import contextvars
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Coroutine, Deque, Dict, Iterator, Optional, Tuple, Union
+
+# Classes de prioridade: menor valor é atendido primeiro
+INTERATIVA = 0  # Requisição de usuário esperando a resposta
+BACKGROUND = 1  # Preload, warm pool e outros trabalhos de aquecimento/lote
+NOMES_PRIORIDADE = {INTERATIVA: "interactive", BACKGROUND: "background"}
+
+
+
+class PrioridadeCompartilhada:
+    """
+    Prioridade de um trabalho que atende vários chamadores (ex.: uma geração do single-flight):
+    começa na de quem o criou e sobe para a do chamador mais urgente que entrar depois (elevar).
+    Esperas já na fila do governador mudam de classe na hora; trabalhos compartilhados
+    criados dentro deste (e as tasks que ele cria) sobem junto.
+    """
+
+    def __init__(self, nivel: int, pai: Optional["PrioridadeCompartilhada"] = None):
+        self.nivel = nivel
+        self._esperas: Dict[asyncio.Future, "OutboundGovernor"] = {}
+        self._filhos: "weakref.WeakSet[PrioridadeCompartilhada]" = weakref.WeakSet()
+        if pai is not None:
+            pai._filhos.add(self)
+
+    def elevar(self, nivel: int) -> None:
+        if nivel >= self.nivel:
+            return
+        self.nivel = nivel
+        for futuro, governador in list(self._esperas.items()):
+            governador._promover(futuro, nivel)
+        for filho in list(self._filhos):
+            filho.elevar(nivel)
+
+
+_prioridade: ContextVar[Union[int, PrioridadeCompartilhada]] = ContextVar("prioridade_ia", default=INTERATIVA)
+
+
+@contextmanager
+def prioridade(nivel: int) -> Iterator[None]:
+    """Define a prioridade das chamadas à IA feitas dentro do bloco (e das tasks criadas nele)"""
+    token = _prioridade.set(nivel)
+    try:
+        yield
+    finally:
+        _prioridade.reset(token)
+
+
+def prioridade_atual() -> int:
+    atual = _prioridade.get()
+    return atual.nivel if isinstance(atual, PrioridadeCompartilhada) else atual
+
+
+def criar_task_compartilhada(coro: Coroutine) -> Tuple[asyncio.Task, PrioridadeCompartilhada]:
+    """Task cuja prioridade pode ser elevada depois por quem passar a aguardá-la"""
+    atual = _prioridade.get()
+    compartilhada = PrioridadeCompartilhada(
+        prioridade_atual(), pai=atual if isinstance(atual, PrioridadeCompartilhada) else None
+    )
+    contexto = contextvars.copy_context()
+    contexto.run(_prioridade.set, compartilhada)
+    return asyncio.create_task(coro, context=contexto), compartilhada
+
+
+class OutboundGovernor:
+    """
+    Controle das chamadas de saída para o provedor de IA:
+    1. Token bucket: no máximo taxa_por_segundo chamadas por segundo, com rajadas de até `rajada`
+    2. Limite de concorrência: no máximo max_concorrencia chamadas abertas; as últimas
+       reserva_interativa vagas só servem à classe interativa
+    3. Prioridade estrita: a fila interativa é sempre atendida antes da background
+    4. Após um 429 a classe background fica pausada com backoff exponencial
+       (respeitando Retry-After); a interativa continua limitada só pelo bucket
+    """
+
+    def __init__(self, taxa_por_segundo: float = 5.0, rajada: int = 10, max_concorrencia: int = 20,
+                 reserva_interativa: int = 5, backoff_inicial: float = 1.0, backoff_maximo: float = 60.0):
+        self.taxa = taxa_por_segundo
+        self.rajada = rajada
+        self.max_concorrencia = max_concorrencia
+        self.reserva_interativa = reserva_interativa
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self._tokens = float(rajada)
+        self._ultima_reposicao = time.monotonic()
+        self._em_uso = 0
+        self._filas: Dict[int, Deque[asyncio.Future]] = {p: deque() for p in sorted(NOMES_PRIORIDADE)}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Esperas que mudaram de classe na fila (PrioridadeCompartilhada.elevar)
+        self._promovidos: Dict[asyncio.Future, int] = {}
+        self._backoff = 0.0
+        self._pausado_ate = 0.0
+        self._rate_limited = 0
+        self._stats = {
+            p: {"acquired": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "in_flight": 0}
+            for p in NOMES_PRIORIDADE
+        }
+
+    def _repor(self, agora: float) -> None:
+        self._tokens = min(self.rajada, self._tokens + (agora - self._ultima_reposicao) * self.taxa)
+        self._ultima_reposicao = agora
+
+    def _pode_liberar(self, nivel: int, agora: float) -> bool:
+        if self._em_uso >= self.max_concorrencia or self._tokens < 1:
+            return False
+        if nivel != INTERATIVA:
+            if agora < self._pausado_ate:
+                return False
+            if self._em_uso >= self.max_concorrencia - self.reserva_interativa:
+                return False
+        return True
+
+    def _despachar(self) -> None:
+        """Libera quem puder seguir, na ordem de prioridade, e agenda a próxima tentativa"""
+        agora = time.monotonic()
+        self._repor(agora)
+        for nivel, fila in self._filas.items():
+            while fila:
+                futuro = fila[0]
+                if futuro.done():  # Espera cancelada
+                    fila.popleft()
+                    continue
+                if not self._pode_liberar(nivel, agora):
+                    break
+                fila.popleft()
+                self._tokens -= 1
+                self._em_uso += 1
+                futuro.set_result(None)
+            if fila:
+                break  # Prioridade estrita: a classe seguinte não passa na frente
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        esperas = []
+        if any(self._filas.values()) and self._tokens < 1:
+            esperas.append((1 - self._tokens) / self.taxa)
+        if self._filas[BACKGROUND] and agora < self._pausado_ate:
+            esperas.append(self._pausado_ate - agora)
+        if esperas:
+            self._timer = asyncio.get_running_loop().call_later(min(esperas), self._despachar)
+
+    async def adquirir(self, nivel: Optional[int] = None) -> int:
+        compartilhada = None
+        if nivel is None:
+            atual = _prioridade.get()
+            if isinstance(atual, PrioridadeCompartilhada):
+                compartilhada = atual
+            nivel = prioridade_atual()
+        inicio = time.monotonic()
+        futuro = asyncio.get_running_loop().create_future()
+        self._filas[nivel].append(futuro)
+        if compartilhada is not None:
+            compartilhada._esperas[futuro] = self
+        self._despachar()
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                self._liberar(nivel)  # Vaga concedida a quem já desistiu
+            raise
+        finally:
+            if compartilhada is not None:
+                compartilhada._esperas.pop(futuro, None)
+            nivel = self._promovidos.pop(futuro, nivel)
+
+        espera = time.monotonic() - inicio
+        stats = self._stats[nivel]
+        stats["acquired"] += 1
+        stats["in_flight"] += 1
+        stats["wait_seconds"] += espera
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], espera)
+        return nivel
+
+    def _promover(self, futuro: asyncio.Future, nivel: int) -> None:
+        """Move uma espera ainda na fila para uma classe mais prioritária"""
+        if futuro.done():
+            return
+        for atual, fila in self._filas.items():
+            if atual > nivel and futuro in fila:
+                fila.remove(futuro)
+                self._filas[nivel].append(futuro)
+                self._promovidos[futuro] = nivel
+                self._despachar()
+                return
+
+    def _liberar(self, nivel: int) -> None:
+        self._em_uso -= 1
+        self._despachar()
+
+    @asynccontextmanager
+    async def permissao(self, nivel: Optional[int] = None) -> AsyncIterator[None]:
+        """Aguarda vaga e token para uma chamada de saída na prioridade atual (ou na informada)"""
+        nivel = await self.adquirir(nivel)
+        try:
+            yield
+        finally:
+            self._stats[nivel]["in_flight"] -= 1
+            self._liberar(nivel)
+
+    def registrar_limite(self, retry_after: Optional[float] = None) -> None:
+        """Provedor respondeu 429: pausa a classe background com backoff exponencial"""
+        self._rate_limited += 1
+        self._backoff = min(max(self._backoff * 2, self.backoff_inicial), self.backoff_maximo)
+        self._pausado_ate = max(self._pausado_ate, time.monotonic() + max(self._backoff, retry_after or 0))
+
+    def registrar_sucesso(self) -> None:
+        self._backoff = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        classes = {}
+        for nivel, nome in NOMES_PRIORIDADE.items():
+            stats = self._stats[nivel]
+            classes[nome] = {
+                "queue_depth": sum(1 for f in self._filas[nivel] if not f.done()),
+                "in_flight": stats["in_flight"],
+                "acquired": stats["acquired"],
+                "avg_wait_ms": round(stats["wait_seconds"] / stats["acquired"] * 1000, 1) if stats["acquired"] else 0.0,
+                "max_wait_ms": round(stats["max_wait_seconds"] * 1000, 1),
+            }
+        return {
+            "classes": classes,
+            "tokens": round(self._tokens, 2),
+            "in_use": self._em_uso,
+            "rate_limited": self._rate_limited,
+            "background_paused_s": round(max(self._pausado_ate - time.monotonic(), 0.0), 2),
+        }
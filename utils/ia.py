@@ -1,77 +1,249 @@
 import httpx
-from config.settings import OPENROUTER_API_KEY
+from config.settings import OPENROUTER_API_KEY, OPENROUTER_URL, DB_PATH
+from config.performance import CACHE_CONFIG, AI_CONFIG, GOVERNOR_CONFIG, MONITORING_CONFIG
+from utils.cache_store import LogCacheStore
+from utils.cache_compartilhado import SharedCacheStore
+from utils.cache_lru import TTLCache
+from utils.conteudo_compacto import ContentStore, CompactCache
+from utils.resiliencia import CircuitBreaker
+from utils.roteador import ModelRouter, prazo
+from utils.governador import OutboundGovernor, prioridade, prioridade_atual, criar_task_compartilhada, PrioridadeCompartilhada, BACKGROUND
+from utils.metricas import ai_call_duration, cache_removals, registrar_cache
 from functools import lru_cache
 import json
 import os
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar, AsyncIterator
 import hashlib
 import time
 from concurrent.futures import ThreadPoolExecutor
 
-# Cache file path
-CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "db", "exercicios_cache.json")
+# Arquivos de cache, ao lado do banco. O cache compartilhado entre workers (SQLite) importa,
+# na primeira execução, o log append-only antigo ou, sem ele, o JSON mais antigo. Os dois são
+# formatos só de importação: nada volta a escrever neles
+CACHE_FILE = os.path.join(os.path.dirname(DB_PATH), "exercicios_cache.json")
+CACHE_LOG_FILE = os.path.join(os.path.dirname(CACHE_FILE), "exercicios_cache.log")
+SHARED_CACHE_FILE = os.path.join(os.path.dirname(CACHE_FILE), "exercicios_cache_compartilhado.db")
 
-# Pool de conexões HTTP otimizado
-try:
-    # Tentar usar HTTP/2 se disponível
-    http_client = httpx.AsyncClient(
-        timeout=httpx.Timeout(connect=5.0, read=15.0, write=5.0, pool=5.0),
-        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
-        http2=True
-    )
-except ImportError:
-    # Fallback para HTTP/1.1 se h2 não estiver instalado
-    http_client = httpx.AsyncClient(
-        timeout=httpx.Timeout(connect=5.0, read=15.0, write=5.0, pool=5.0),
-        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
-    )
+# Cliente HTTP e thread pool são criados por iniciar() no startup (ou no primeiro uso),
+# não na importação: testes, scripts e workers recém-criados não pagam por eles
+http_client: Optional[httpx.AsyncClient] = None
+executor: Optional[ThreadPoolExecutor] = None
+
+def _novo_cliente_http() -> httpx.AsyncClient:
+    """Pool de conexões HTTP otimizado"""
+    try:
+        # Tentar usar HTTP/2 se disponível
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=5.0, read=15.0, write=5.0, pool=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            http2=True
+        )
+    except ImportError:
+        # Fallback para HTTP/1.1 se h2 não estiver instalado
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=5.0, read=15.0, write=5.0, pool=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+        )
+
+def _cliente_http() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = _novo_cliente_http()
+    return http_client
 
-# Cache em memória global
-_exercicios_cache = {}
+def _executor() -> ThreadPoolExecutor:
+    """Thread pool para operações de I/O"""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=3)
+    return executor
+
+def iniciar() -> None:
+    """Cria o cliente HTTP e o thread pool no startup, fora do caminho da primeira requisição"""
+    _cliente_http()
+    _executor()
+
+# Uma cópia de cada texto gerado, compartilhada pelo L1 abaixo e pelo cache de exercícios recentes
+conteudos = ContentStore(
+    comprimir=CACHE_CONFIG["compress_cold_texts"],
+    frio_apos_seconds=CACHE_CONFIG["cold_after_seconds"],
+    intervalo_compactacao=CACHE_CONFIG["compaction_interval_seconds"],
+)
+
+# Cache em memória global: L1 limitado (LRU + TTL) na frente do cache compartilhado do host
+_cache_store = SharedCacheStore(
+    SHARED_CACHE_FILE,
+    importar=lambda: LogCacheStore(CACHE_LOG_FILE, legacy_json_path=CACHE_FILE).load(),
+    index=CompactCache(
+        conteudos,
+        TTLCache,
+        max_entradas=CACHE_CONFIG["max_memory_cache_size"],
+        max_bytes=CACHE_CONFIG["max_memory_cache_bytes"],
+        ttl_seconds=CACHE_CONFIG["cache_ttl_hours"] * 3600,
+        intervalo_limpeza=CACHE_CONFIG["auto_cleanup_interval_hours"] * 3600,
+        ao_remover=lambda motivo: cache_removals.inc(cache="ia", reason=motivo),
+    ),
+)
+_exercicios_cache = _cache_store.index
 _cache_loaded = False
+_ultima_sincronizacao = 0.0
+
+T = TypeVar("T")
 
-# Thread pool para operações de I/O
-executor = ThreadPoolExecutor(max_workers=3)
+# Registro de gerações em andamento (single-flight), indexado pela chave de cache
+_inflight: Dict[str, asyncio.Task] = {}
+_inflight_waiters: Dict[str, int] = {}
+_inflight_prioridades: Dict[str, PrioridadeCompartilhada] = {}
+_single_flight_stats = {
+    "leaders": 0,    # Chamadas que de fato foram à IA
+    "joins": 0,      # Chamadas que aguardaram uma geração já em andamento
+    "errors": 0,
+    "cancelled": 0,
+}
+
+def _finish_flight(key: str, task: asyncio.Task) -> None:
+    """Remove a geração do registro quando ela termina"""
+    if _inflight.get(key) is task:
+        del _inflight[key]
+        _inflight_waiters.pop(key, None)
+        _inflight_prioridades.pop(key, None)
+    if task.cancelled():
+        _single_flight_stats["cancelled"] += 1
+    elif task.exception() is not None:
+        _single_flight_stats["errors"] += 1
+
+async def single_flight(key: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    Garante no máximo uma geração em andamento por chave:
+    - O primeiro chamador dispara a geração em uma task própria
+    - Chamadores concorrentes aguardam a mesma task
+    - Erros e timeouts chegam a todos que estão aguardando
+    - Cancelar um chamador só cancela a geração se ninguém mais aguarda
+    - A geração roda na prioridade mais alta entre os que aguardam: um chamador
+      interativo que entra numa geração de background a promove no governador
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task, _inflight_prioridades[key] = criar_task_compartilhada(factory())
+        _inflight[key] = task
+        _inflight_waiters[key] = 0
+        task.add_done_callback(lambda t: _finish_flight(key, t))
+        _single_flight_stats["leaders"] += 1
+    else:
+        _inflight_prioridades[key].elevar(prioridade_atual())
+        _single_flight_stats["joins"] += 1
+
+    _inflight_waiters[key] = _inflight_waiters.get(key, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        # Último interessado desistiu: não há motivo para manter a chamada
+        if not task.done() and _inflight_waiters.get(key, 0) <= 1:
+            task.cancel()
+        raise
+    finally:
+        if _inflight.get(key) is task:
+            _inflight_waiters[key] -= 1
+
+def get_single_flight_stats() -> Dict[str, int]:
+    """Estatísticas do single-flight para monitoramento"""
+    return {
+        **_single_flight_stats,
+        "in_flight": len(_inflight),
+        "upstream_calls_saved": _single_flight_stats["joins"],
+    }
+
+async def _sincronizar_cache(forcar: bool = False) -> None:
+    """Traz para o L1 o que outros workers gravaram (no máximo uma vez por intervalo, salvo se forçado)"""
+    global _ultima_sincronizacao
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_sincronizacao < CACHE_CONFIG["shared_sync_interval_seconds"]:
+        return
+    _ultima_sincronizacao = agora
+    try:
+        await asyncio.get_running_loop().run_in_executor(_executor(), _cache_store.sincronizar)
+    except Exception as e:
+        print(f"Erro ao sincronizar cache: {e}")
 
 async def load_cache_async() -> Dict[str, Any]:
-    """Carrega o cache de forma assíncrona"""
-    global _exercicios_cache, _cache_loaded
+    """Carrega o cache de forma assíncrona; depois da primeira carga só sincroniza com os outros workers"""
+    global _cache_loaded
     
     if _cache_loaded:
+        await _sincronizar_cache()
         return _exercicios_cache
     
-    if os.path.exists(CACHE_FILE):
-        loop = asyncio.get_event_loop()
-        try:
-            def read_cache():
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            
-            _exercicios_cache = await loop.run_in_executor(executor, read_cache)
-        except Exception as e:
-            print(f"Erro ao carregar cache: {e}")
-            _exercicios_cache = {}
-    else:
-        _exercicios_cache = {}
+    loop = asyncio.get_event_loop()
+    try:
+        await loop.run_in_executor(_executor(), _cache_store.load)
+    except Exception as e:
+        print(f"Erro ao carregar cache: {e}")
     
     _cache_loaded = True
     return _exercicios_cache
 
-async def save_cache_async(cache: Dict[str, Any]) -> None:
-    """Salva o cache de forma assíncrona sem bloquear"""
+async def save_cache_entry_async(key: str, value: str) -> None:
+    """Grava a entrada no cache compartilhado sem bloquear o event loop"""
     loop = asyncio.get_event_loop()
-    
-    def write_cache():
+    try:
+        await loop.run_in_executor(_executor(), _cache_store.set, key, value)
+    except Exception as e:
+        print(f"Erro ao salvar cache: {e}")
+
+def get_cache_store_stats() -> Dict[str, Any]:
+    """Estatísticas do cache compartilhado, do L1 em memória e dos textos guardados"""
+    return {**_cache_store.stats(), "l1": _exercicios_cache.stats(), "textos": conteudos.stats()}
+
+def _liberar_lease(chave: str) -> None:
+    """Libera a lease em background: quem foi cancelado não espera pelo SQLite"""
+    def liberar():
         try:
-            os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(cache, f, ensure_ascii=False, indent=2)
+            _cache_store.liberar_lease(chave)
         except Exception as e:
-            print(f"Erro ao salvar cache: {e}")
+            print(f"Erro ao liberar lease do cache: {e}")
+    asyncio.get_running_loop().run_in_executor(_executor(), liberar)
+
+async def _adquirir_lease(chave: str) -> bool:
+    pedido = asyncio.get_running_loop().run_in_executor(
+        _executor(), _cache_store.adquirir_lease, chave, CACHE_CONFIG["shared_lease_seconds"]
+    )
+    try:
+        return await asyncio.shield(pedido)
+    except asyncio.CancelledError:
+        # A thread pode concluir a reserva depois do cancelamento: libera assim que terminar
+        pedido.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is not None or not f.result() or _liberar_lease(chave)
+        )
+        raise
+
+async def gerar_uma_vez_no_host(chave: str, pronto: Callable[[], Optional[T]], gerar: Callable[[], Awaitable[T]]) -> T:
+    """
+    Single-flight entre workers: só o worker com a lease de `chave` chama a IA.
+    Os demais aguardam o resultado aparecer no cache compartilhado (`pronto`)
+    ou a lease ser liberada/expirar, e então tentam de novo.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        valor = pronto()
+        if valor is not None:
+            return valor
+        if await _adquirir_lease(chave):
+            break
+        while await loop.run_in_executor(_executor(), _cache_store.lease_ativa, chave):
+            await asyncio.sleep(CACHE_CONFIG["shared_poll_interval_seconds"])
+            await _sincronizar_cache(forcar=True)
+            if pronto() is not None:
+                break
+        await _sincronizar_cache(forcar=True)
     
-    # Executar em background sem aguardar
-    asyncio.create_task(loop.run_in_executor(executor, write_cache))
+    try:
+        # Outro worker pode ter terminado entre a última leitura e a lease
+        await _sincronizar_cache(forcar=True)
+        valor = pronto()
+        return valor if valor is not None else await gerar()
+    finally:
+        _liberar_lease(chave)
 
 @lru_cache(maxsize=500)
 def get_cache_key(nome: str, tipo: str) -> str:
@@ -79,30 +251,31 @@ def get_cache_key(nome: str, tipo: str) -> str:
     return f"{nome.lower()}_{tipo}_{hashlib.md5(nome.encode()).hexdigest()[:8]}"
 
 async def get_cached_value(key: str) -> Optional[str]:
-    """Busca valor no cache com carregamento assíncrono"""
+    """Busca valor no L1 e, se ele não tiver a chave (despejada ou vencida), no cache compartilhado"""
     cache = await load_cache_async()
-    return cache.get(key)
+    valor = cache.get(key)
+    if valor is None:
+        valor = await asyncio.get_running_loop().run_in_executor(_executor(), _cache_store.get, key)
+    if MONITORING_CONFIG["log_cache_hits"]:
+        registrar_cache("ia", valor is not None)
+    return valor
 
 async def set_cached_value(key: str, value: str) -> None:
-    """Define valor no cache"""
-    global _exercicios_cache
+    """Define valor no cache (L1 e compartilhado)"""
     cache = await load_cache_async()
     cache[key] = value
-    _exercicios_cache = cache
-    # Salvar em background
-    await save_cache_async(cache)
-
-async def call_ai_api(prompt: str, system_prompt: str, max_tokens: int = 80) -> str:
-    """Chamada otimizada para API da IA"""
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
+    await save_cache_entry_async(key, value)
+
+def _build_headers() -> Dict[str, str]:
+    return {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json"
     }
-    
-    # Usar modelo mais rápido e eficiente
-    data = {
-        "model": "microsoft/phi-3-mini-4k-instruct",  # Modelo mais rápido que Mistral
+
+def _build_payload(model: str, prompt: str, system_prompt: str, max_tokens: int) -> Dict[str, Any]:
+    """Monta o corpo da requisição de chat para o OpenRouter"""
+    return {
+        "model": model,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
@@ -113,81 +286,407 @@ async def call_ai_api(prompt: str, system_prompt: str, max_tokens: int = 80) ->
         "frequency_penalty": 0.0,
         "presence_penalty": 0.0
     }
-    
+
+class IAIndisponivel(RuntimeError):
+    """Nenhum modelo pode ser chamado: todos estão com o circuito aberto"""
+
+# Modelos em ordem de preferência (desempate do roteador), cada um com seu circuit breaker
+MODELOS_IA = (AI_CONFIG["primary_model"], AI_CONFIG["fallback_model"])
+_breakers = {
+    modelo: CircuitBreaker(AI_CONFIG["breaker_failure_threshold"], AI_CONFIG["breaker_open_seconds"])
+    for modelo in MODELOS_IA
+}
+_hedge_stats = {"hedged": 0, "hedge_wins": 0}
+
+# Estatísticas por (modelo, tipo de prompt): ordem de tentativa e timeouts de cada chamada
+roteador = ModelRouter(
+    MODELOS_IA,
+    janela=AI_CONFIG["router_latency_window"],
+    latencia_inicial=AI_CONFIG["router_initial_latency_seconds"],
+    timeout_multiplicador=AI_CONFIG["router_timeout_multiplier"],
+    timeout_minimo=AI_CONFIG["router_min_timeout_seconds"],
+    timeout_maximo=AI_CONFIG["router_max_timeout_seconds"],
+    exploracao=AI_CONFIG["router_exploration_rate"]
+)
+
+# Taxa, concorrência e prioridade das chamadas ao provedor (interativas antes de background)
+governador = OutboundGovernor(
+    taxa_por_segundo=GOVERNOR_CONFIG["requests_per_second"],
+    rajada=GOVERNOR_CONFIG["burst"],
+    max_concorrencia=GOVERNOR_CONFIG["max_concurrency"],
+    reserva_interativa=GOVERNOR_CONFIG["interactive_reserved"],
+    backoff_inicial=GOVERNOR_CONFIG["backoff_initial_seconds"],
+    backoff_maximo=GOVERNOR_CONFIG["backoff_max_seconds"]
+)
+
+def _verificar_limite(response: httpx.Response) -> None:
+    """Informa o governador sobre 429 (com Retry-After, se houver) ou sucesso do provedor"""
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None
+        governador.registrar_limite(retry_after)
+    elif response.is_success:
+        governador.registrar_sucesso()
+
+def _limite_de_taxa(erro: BaseException) -> bool:
+    """429 do provedor: tratado pelo backoff do governador, não diz nada sobre a saúde do modelo"""
+    return isinstance(erro, httpx.HTTPStatusError) and erro.response.status_code == 429
+
+def _modelos_para(tipo: str) -> list:
+    """Modelos a tentar, na ordem do roteador, limitados a 1 + max_retries"""
+    return roteador.ordenar(tipo)[:1 + AI_CONFIG["max_retries"]]
+
+def _proximo_modelo(modelos: list) -> Optional[str]:
+    """Retira da lista o próximo modelo cujo circuito permite a chamada"""
+    while modelos:
+        modelo = modelos.pop(0)
+        if _breakers[modelo].permite():
+            return modelo
+    return None
+
+def _atraso_hedge(modelo: str, tipo: str) -> float:
+    """Quanto esperar pelo modelo antes de disparar o próximo em paralelo"""
+    atraso = roteador.percentil(modelo, tipo, AI_CONFIG["hedge_percentile"])
+    if atraso is None:
+        return AI_CONFIG["hedge_initial_delay_seconds"]
+    return min(max(atraso, AI_CONFIG["hedge_min_delay_seconds"]), AI_CONFIG["hedge_max_delay_seconds"])
+
+async def _chamar_modelo(modelo: str, data: Dict[str, Any], tipo: str) -> str:
+    """
+    Uma chamada a um modelo: passa pelo governador, usa o timeout do roteador e
+    registra o resultado no breaker e no roteador
+    """
+    breaker = _breakers[modelo]
     try:
-        response = await http_client.post(url, json=data, headers=headers)
+        async with governador.permissao():
+            inicio = time.perf_counter()
+            response = await _cliente_http().post(
+                OPENROUTER_URL, json={**data, "model": modelo}, headers=_build_headers(),
+                timeout=max(roteador.timeout(modelo, tipo), 0.001)
+            )
+        _verificar_limite(response)
         response.raise_for_status()
-        resposta = response.json()
-        return resposta["choices"][0]["message"]["content"].strip()
-    except httpx.TimeoutException:
-        # Fallback para modelo ainda mais rápido em caso de timeout
-        data["model"] = "openai/gpt-3.5-turbo"
-        data["max_tokens"] = min(max_tokens, 60)
-        response = await http_client.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        resposta = response.json()
-        return resposta["choices"][0]["message"]["content"].strip()
+        texto = response.json()["choices"][0]["message"]["content"].strip()
+    except asyncio.CancelledError:
+        # Perdedor de um hedge: não diz nada sobre a saúde do modelo
+        breaker.liberar()
+        raise
+    except Exception as e:
+        duracao = time.perf_counter() - inicio
+        if _limite_de_taxa(e):
+            breaker.liberar()
+        else:
+            breaker.registrar_falha()
+        roteador.registrar(modelo, tipo, duracao, False)
+        ai_call_duration.observe(duracao, model=modelo, field=tipo, result="error")
+        if MONITORING_CONFIG["log_ai_errors"]:
+            print(f"Erro na chamada à IA ({modelo}, {tipo}): {e!r}")
+        raise
+    duracao = time.perf_counter() - inicio
+    breaker.registrar_sucesso()
+    roteador.registrar(modelo, tipo, duracao, True)
+    ai_call_duration.observe(duracao, model=modelo, field=tipo, result="ok")
+    return texto
 
-async def gerar_descricao_exercicio(nome: str) -> str:
-    """Gera descrição do exercício com cache otimizado"""
-    cache_key = get_cache_key(nome, "descricao")
+async def call_ai_api(prompt: str, system_prompt: str, max_tokens: int = 80, json_mode: bool = False,
+                      tipo: str = "geral") -> str:
+    """
+    Chamada otimizada para API da IA, com roteamento, hedging e circuit breaker por modelo:
+    1. O roteador ordena os modelos pelo custo esperado para o tipo de prompt e o prazo restante
+    2. Modelos com o circuito aberto são pulados
+    3. Se o modelo em andamento não responde dentro do percentil configurado da sua
+       latência recente, o próximo é disparado em paralelo; vale a primeira resposta
+       e a outra chamada é cancelada
+    4. Se o modelo falha, o próximo é chamado imediatamente
+    """
+    data = _build_payload(AI_CONFIG["primary_model"], prompt, system_prompt, max_tokens)
+    if json_mode:
+        # Pede saída estruturada (modelos sem suporte ignoram o campo)
+        data["response_format"] = {"type": "json_object"}
+    
+    modelos = _modelos_para(tipo)
+    preferido = modelos[0]
+    tasks: Dict[asyncio.Task, str] = {}
+    ultimo_erro: Optional[BaseException] = None
+    houve_hedge = False
+    try:
+        while True:
+            if not tasks:
+                modelo = _proximo_modelo(modelos)
+                if modelo is None:
+                    raise ultimo_erro or IAIndisponivel("Nenhum modelo de IA disponível (circuitos abertos)")
+                tasks[asyncio.create_task(_chamar_modelo(modelo, data, tipo))] = modelo
+            
+            # Só vale esperar com prazo se ainda houver um modelo para o hedge
+            timeout = None
+            if AI_CONFIG["hedge_enabled"] and len(tasks) == 1 and modelos:
+                timeout = _atraso_hedge(next(iter(tasks.values())), tipo)
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            
+            if not done:
+                modelo = _proximo_modelo(modelos)
+                if modelo is not None:
+                    houve_hedge = True
+                    _hedge_stats["hedged"] += 1
+                    tasks[asyncio.create_task(_chamar_modelo(modelo, data, tipo))] = modelo
+                continue
+            
+            for task in done:
+                modelo = tasks.pop(task)
+                if task.exception() is None:
+                    if houve_hedge and modelo != preferido:
+                        _hedge_stats["hedge_wins"] += 1
+                    return task.result()
+                ultimo_erro = task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def get_ai_resilience_stats() -> Dict[str, Any]:
+    """Estado dos circuit breakers, contadores de hedge e filas do governador (latências ficam no roteador)"""
+    return {
+        **_hedge_stats,
+        "governor": governador.stats(),
+        "models": {
+            modelo: {"breaker": _breakers[modelo].stats()}
+            for modelo in MODELOS_IA
+        }
+    }
+
+async def call_ai_api_stream(prompt: str, system_prompt: str, max_tokens: int = 80,
+                             tipo: str = "geral") -> AsyncIterator[str]:
+    """
+    Chamada à IA em modo streaming (stream: true), devolvendo os tokens conforme chegam.
+    Se o modelo escolhido falhar (timeout, erro HTTP, resposta inválida) antes do primeiro
+    token, tenta o próximo; depois do primeiro token o erro é propagado.
+    A ordem vem do roteador, pelo tempo até o primeiro token; modelos com o circuito
+    aberto são pulados.
+    """
+    headers = _build_headers()
+    tipo = f"{tipo}_stream"
+    ultimo_erro: Optional[BaseException] = None
+    for model in _modelos_para(tipo):
+        breaker = _breakers[model]
+        if not breaker.permite():
+            continue
+        data = _build_payload(model, prompt, system_prompt, max_tokens)
+        data["stream"] = True
+        recebeu_token = False
+        inicio = time.perf_counter()
+        try:
+            async with governador.permissao(), \
+                    _cliente_http().stream("POST", OPENROUTER_URL, json=data, headers=headers,
+                                       timeout=max(roteador.timeout(model, tipo), 0.001)) as response:
+                _verificar_limite(response)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    # Linhas que não começam com "data:" são comentários de keep-alive
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    if delta:
+                        if not recebeu_token:
+                            roteador.registrar(model, tipo, time.perf_counter() - inicio, True)
+                        recebeu_token = True
+                        yield delta
+            breaker.registrar_sucesso()
+            ai_call_duration.observe(time.perf_counter() - inicio, model=model, field=tipo, result="ok")
+            return
+        except (httpx.HTTPError, ValueError) as e:
+            if not _limite_de_taxa(e):
+                breaker.registrar_falha()
+            ai_call_duration.observe(time.perf_counter() - inicio, model=model, field=tipo, result="error")
+            # Tokens já entregues ao cliente não podem ser refeitos por outro modelo
+            if recebeu_token:
+                raise
+            roteador.registrar(model, tipo, time.perf_counter() - inicio, False)
+            if MONITORING_CONFIG["log_ai_errors"]:
+                print(f"Erro no streaming da IA ({model}, {tipo}): {e!r}")
+            ultimo_erro = e
+        finally:
+            # Consumidor abandonou o stream no meio: a chamada não conta para o breaker
+            breaker.liberar()
+    raise ultimo_erro or IAIndisponivel("Nenhum modelo de IA disponível (circuitos abertos)")
+
+async def _gerar_e_salvar(cache_key: str, prompt: str, system_prompt: str, max_tokens: int, tipo: str) -> str:
+    """Chama a IA e salva o resultado no cache (executado uma vez por chave em andamento no host)"""
+    async def gerar() -> str:
+        resultado = await call_ai_api(prompt, system_prompt, max_tokens, tipo=tipo)
+        await set_cached_value(cache_key, resultado)
+        return resultado
+    
+    return await gerar_uma_vez_no_host(cache_key, lambda: _exercicios_cache.get(cache_key), gerar)
+
+# Prompts por campo: (prompt, system prompt, max_tokens)
+_PROMPTS_CAMPOS = {
+    "descricao": (
+        "Descreva '{nome}' em 1-2 linhas simples para iniciantes.",
+        "Especialista fitness. Respostas concisas e diretas.",
+        60,
+    ),
+    "vantagens": (
+        "Benefícios de '{nome}' em 1-2 linhas.",
+        "Personal trainer. Foque nos principais benefícios.",
+        50,
+    ),
+    "passo_a_passo": (
+        "3 etapas simples para '{nome}'. Format: 1. ... 2. ... 3. ...",
+        "Instrutor fitness. Passos numerados e concisos.",
+        90,
+    ),
+}
+
+async def _gerar_campo(nome: str, campo: str) -> str:
+    """Gera um campo do exercício com cache e single-flight"""
+    cache_key = get_cache_key(nome, campo)
     
     # Verificar cache primeiro
     cached_value = await get_cached_value(cache_key)
     if cached_value:
         return cached_value
 
-    prompt = f"Descreva '{nome}' em 1-2 linhas simples para iniciantes."
-    system_prompt = "Especialista fitness. Respostas concisas e diretas."
-    
-    resultado = await call_ai_api(prompt, system_prompt, 60)
+    prompt, system_prompt, max_tokens = _PROMPTS_CAMPOS[campo]
+    prompt = prompt.format(nome=nome)
     
-    # Salvar no cache
-    await set_cached_value(cache_key, resultado)
-    
-    return resultado
+    return await single_flight(
+        cache_key, lambda: _gerar_e_salvar(cache_key, prompt, system_prompt, max_tokens, campo)
+    )
+
+async def gerar_descricao_exercicio(nome: str) -> str:
+    """Gera descrição do exercício com cache otimizado"""
+    return await _gerar_campo(nome, "descricao")
 
 async def gerar_vantagens_exercicio(nome: str, descricao: str = "") -> str:
     """Gera vantagens do exercício com cache otimizado"""
-    cache_key = get_cache_key(nome, "vantagens")
+    return await _gerar_campo(nome, "vantagens")
+
+async def gerar_passo_a_passo_exercicio(nome: str) -> str:
+    """Gera passo a passo do exercício com cache otimizado"""
+    return await _gerar_campo(nome, "passo_a_passo")
+
+async def gerar_campo_stream(nome: str, campo: str) -> AsyncIterator[str]:
+    """
+    Gera um campo do exercício em streaming:
+    1. Valor em cache sai de uma vez
+    2. Se outra requisição já está gerando o campo, aguarda e reaproveita o resultado
+    3. Caso contrário transmite os tokens da IA e salva o texto completo no cache
+    """
+    cache_key = get_cache_key(nome, campo)
     
-    # Verificar cache primeiro
     cached_value = await get_cached_value(cache_key)
     if cached_value:
-        return cached_value
-
-    prompt = f"Benefícios de '{nome}' em 1-2 linhas."
-    system_prompt = "Personal trainer. Foque nos principais benefícios."
+        yield cached_value
+        return
     
-    resultado = await call_ai_api(prompt, system_prompt, 50)
+    em_andamento = _inflight.get(cache_key)
+    if em_andamento is not None:
+        yield await asyncio.shield(em_andamento)
+        return
     
-    # Salvar no cache
-    await set_cached_value(cache_key, resultado)
+    prompt, system_prompt, max_tokens = _PROMPTS_CAMPOS[campo]
+    partes = []
+    async for delta in call_ai_api_stream(prompt.format(nome=nome), system_prompt, max_tokens, tipo=campo):
+        partes.append(delta)
+        yield delta
     
-    return resultado
+    resultado = "".join(partes).strip()
+    if resultado:
+        await set_cached_value(cache_key, resultado)
 
-async def gerar_passo_a_passo_exercicio(nome: str) -> str:
-    """Gera passo a passo do exercício com cache otimizado"""
-    cache_key = get_cache_key(nome, "passo_a_passo")
+# Campos gerados para cada exercício, na ordem das chaves de cache
+CAMPOS_EXERCICIO = ("descricao", "vantagens", "passo_a_passo")
+
+_INSTRUCOES_CAMPOS = {
+    "descricao": "descrição em 1-2 linhas simples para iniciantes",
+    "vantagens": "principais benefícios em 1-2 linhas",
+    "passo_a_passo": "3 etapas simples no formato '1. ... 2. ... 3. ...'",
+}
+
+def parse_fused_response(texto: str) -> Dict[str, str]:
+    """
+    Extrai os campos válidos de uma resposta JSON da IA.
+    Tolera cercas de código e texto ao redor do objeto; campos ausentes,
+    vazios ou com tipo inválido são simplesmente omitidos.
+    """
+    inicio, fim = texto.find("{"), texto.rfind("}")
+    if inicio == -1 or fim <= inicio:
+        return {}
+    try:
+        data = json.loads(texto[inicio:fim + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
     
-    # Verificar cache primeiro
-    cached_value = await get_cached_value(cache_key)
-    if cached_value:
-        return cached_value
+    campos = {}
+    for campo in CAMPOS_EXERCICIO:
+        valor = data.get(campo)
+        if isinstance(valor, list):
+            itens = [str(item).strip() for item in valor if str(item).strip()]
+            if campo == "passo_a_passo":
+                valor = " ".join(f"{i}. {item}" for i, item in enumerate(itens, 1))
+            else:
+                valor = ", ".join(itens)
+        if isinstance(valor, str) and valor.strip():
+            campos[campo] = valor.strip()
+    return campos
+
+async def _gerar_fundido_e_salvar(nome: str, campos: tuple) -> Dict[str, str]:
+    """Gera os campos pedidos em uma única chamada por host e salva cada um na sua chave de cache"""
+    chaves = {campo: get_cache_key(nome, campo) for campo in campos}
+    
+    def pronto() -> Optional[Dict[str, str]]:
+        valores = {campo: _exercicios_cache.get(chave) for campo, chave in chaves.items()}
+        return valores if all(valores.values()) else None
+    
+    return await gerar_uma_vez_no_host(
+        get_cache_key(nome, "+".join(campos)), pronto, lambda: _chamar_fundido(nome, campos)
+    )
 
-    prompt = f"3 etapas simples para '{nome}'. Format: 1. ... 2. ... 3. ..."
-    system_prompt = "Instrutor fitness. Passos numerados e concisos."
+async def _chamar_fundido(nome: str, campos: tuple) -> Dict[str, str]:
+    lista = "; ".join(f'"{campo}": {_INSTRUCOES_CAMPOS[campo]}' for campo in campos)
+    prompt = f"Exercício '{nome}'. Responda só um objeto JSON com as chaves: {lista}."
+    system_prompt = "Especialista fitness. Respostas concisas. Saída apenas em JSON válido."
     
-    resultado = await call_ai_api(prompt, system_prompt, 90)
+    resposta = await call_ai_api(prompt, system_prompt, AI_CONFIG["max_tokens_fused"], json_mode=True, tipo="fundido")
+    resultado = {campo: valor for campo, valor in parse_fused_response(resposta).items() if campo in campos}
     
-    # Salvar no cache
-    await set_cached_value(cache_key, resultado)
+    for campo, valor in resultado.items():
+        await set_cached_value(get_cache_key(nome, campo), valor)
     
     return resultado
 
+async def gerar_campos_fundidos(nome: str, campos: tuple = CAMPOS_EXERCICIO) -> Dict[str, str]:
+    """
+    Gera descrição, vantagens e passo a passo em uma única chamada à IA.
+    Retorna apenas os campos válidos; falhas na chamada resultam em dicionário
+    vazio para que o chamador use o caminho por campo.
+    """
+    try:
+        return await single_flight(
+            get_cache_key(nome, "+".join(campos)), lambda: _gerar_fundido_e_salvar(nome, campos)
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Erro na geração fundida de {nome}: {e}")
+        return {}
+
 # Função para pré-carregar cache dos exercícios mais comuns
 async def preload_common_exercises():
-    """Pré-carrega exercícios populares no cache"""
+    """Pré-carrega exercícios populares no cache (prioridade background no governador)"""
+    with prioridade(BACKGROUND):
+        await _preload_common_exercises()
+
+async def _preload_common_exercises():
     common_exercises = [
         "Polichinelo", "Agachamento livre", "Prancha", 
         "Flexão de braço", "Abdominal", "Caminhada"
@@ -200,12 +699,18 @@ async def preload_common_exercises():
         cache_key_passo = get_cache_key(exercise, "passo_a_passo")
         
         # Verificar se já estão em cache
-        cache = await load_cache_async()
-        if not cache.get(cache_key_desc):
+        descricao = await get_cached_value(cache_key_desc)
+        vantagens = await get_cached_value(cache_key_vant)
+        passo_a_passo = await get_cached_value(cache_key_passo)
+        if AI_CONFIG["generation_mode"] == "fused":
+            if not (descricao and vantagens and passo_a_passo):
+                tasks.append(gerar_exercicio_completo_otimizado(exercise))
+            continue
+        if not descricao:
             tasks.append(gerar_descricao_exercicio(exercise))
-        if not cache.get(cache_key_vant):
+        if not vantagens:
             tasks.append(gerar_vantagens_exercicio(exercise))
-        if not cache.get(cache_key_passo):
+        if not passo_a_passo:
             tasks.append(gerar_passo_a_passo_exercicio(exercise))
     
     if tasks:
@@ -229,10 +734,9 @@ async def gerar_exercicio_completo_otimizado(nome: str) -> Dict[str, str]:
     cache_key_vant = get_cache_key(nome, "vantagens")
     cache_key_passo = get_cache_key(nome, "passo_a_passo")
     
-    cache = await load_cache_async()
-    descricao = cache.get(cache_key_desc)
-    vantagens = cache.get(cache_key_vant)
-    passo_a_passo = cache.get(cache_key_passo)
+    descricao = await get_cached_value(cache_key_desc)
+    vantagens = await get_cached_value(cache_key_vant)
+    passo_a_passo = await get_cached_value(cache_key_passo)
     
     # Se tudo está em cache, retorna imediatamente
     if descricao and vantagens and passo_a_passo:
@@ -242,19 +746,28 @@ async def gerar_exercicio_completo_otimizado(nome: str) -> Dict[str, str]:
             "passo_a_passo": passo_a_passo
         }
     
-    # Preparar tasks apenas para o que não está em cache
-    tasks = []
-    if not descricao:
-        tasks.append(("descricao", gerar_descricao_exercicio(nome)))
-    if not vantagens:
-        tasks.append(("vantagens", gerar_vantagens_exercicio(nome)))
-    if not passo_a_passo:
-        tasks.append(("passo_a_passo", gerar_passo_a_passo_exercicio(nome)))
-    
-    # Executar em paralelo com timeout agressivo
-    if tasks:
-        try:
-            async with asyncio.timeout(8.0):  # 8 segundos no máximo
+    # Prazo total da geração; o roteador deriva dele o timeout de cada tentativa
+    try:
+        async with prazo(AI_CONFIG["timeout_seconds"]):
+            # Modo fundido: uma única chamada para todos os campos que faltam
+            if AI_CONFIG["generation_mode"] == "fused":
+                faltando = tuple(campo for campo, valor in zip(CAMPOS_EXERCICIO, (descricao, vantagens, passo_a_passo)) if not valor)
+                fundido = await gerar_campos_fundidos(nome, faltando)
+                descricao = descricao or fundido.get("descricao")
+                vantagens = vantagens or fundido.get("vantagens")
+                passo_a_passo = passo_a_passo or fundido.get("passo_a_passo")
+            
+            # Preparar tasks apenas para o que ainda falta (caminho por campo)
+            tasks = []
+            if not descricao:
+                tasks.append(("descricao", gerar_descricao_exercicio(nome)))
+            if not vantagens:
+                tasks.append(("vantagens", gerar_vantagens_exercicio(nome)))
+            if not passo_a_passo:
+                tasks.append(("passo_a_passo", gerar_passo_a_passo_exercicio(nome)))
+            
+            # Executar em paralelo
+            if tasks:
                 results = await asyncio.gather(*[task[1] for task in tasks])
                 
                 # Mapear resultados
@@ -265,16 +778,16 @@ async def gerar_exercicio_completo_otimizado(nome: str) -> Dict[str, str]:
                         vantagens = results[i]
                     elif campo == "passo_a_passo" and not passo_a_passo:
                         passo_a_passo = results[i]
-                        
-        except asyncio.TimeoutError:
-            print(f"Timeout na geração de {nome}, usando fallbacks")
-            # Fallbacks básicos se houver timeout
-            if not descricao:
-                descricao = f"Exercício {nome} para fortalecimento e condicionamento físico."
-            if not vantagens:
-                vantagens = "Melhora força, resistência e saúde geral."
-            if not passo_a_passo:
-                passo_a_passo = "1. Posicione-se corretamente. 2. Execute o movimento. 3. Repita conforme orientação."
+                    
+    except asyncio.TimeoutError:
+        print(f"Timeout na geração de {nome}, usando fallbacks")
+        # Fallbacks básicos se houver timeout
+        if not descricao:
+            descricao = f"Exercício {nome} para fortalecimento e condicionamento físico."
+        if not vantagens:
+            vantagens = "Melhora força, resistência e saúde geral."
+        if not passo_a_passo:
+            passo_a_passo = "1. Posicione-se corretamente. 2. Execute o movimento. 3. Repita conforme orientação."
     
     return {
         "descricao": descricao or f"Exercício {nome}",
@@ -284,5 +797,11 @@ async def gerar_exercicio_completo_otimizado(nome: str) -> Dict[str, str]:
 
 async def cleanup():
     """Limpa recursos ao encerrar"""
-    await http_client.aclose()
-    executor.shutdown(wait=True)
\ No newline at end of file
+    global http_client, executor
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+    if executor is not None:
+        executor.shutdown(wait=True)
+        executor = None
+    _cache_store.close()
\ No newline at end of file
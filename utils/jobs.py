@@ -0,0 +1,339 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Trabalho em background: devolve um resultado serializável em JSON
+FabricaJob = Callable[[], Awaitable[Any]]
+# Jobs retomáveis por outro worker: recriados a partir dos parâmetros gravados
+FabricaRetomavel = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+
+class Job:
+    __slots__ = ("id", "status", "resultado", "erro", "criado_em", "concluido_em", "pronto")
+
+    def __init__(self, job_id: Optional[str] = None, criado_em: Optional[float] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.status = PENDENTE
+        self.resultado: Any = None
+        self.erro: Optional[str] = None
+        self.criado_em = criado_em or time.time()
+        self.concluido_em: Optional[float] = None
+        self.pronto = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "resultado": self.resultado,
+            "erro": self.erro,
+            "criado_em": self.criado_em,
+            "concluido_em": self.concluido_em,
+        }
+
+
+class SharedJobStore:
+    """
+    Estado dos jobs em um arquivo SQLite compartilhado pelos workers do host:
+    1. Qualquer worker responde o status de um job criado por outro
+    2. O dono renova o heartbeat dos seus jobs abertos; jobs abertos com heartbeat vencido
+       (worker morto ou reiniciado) são reivindicados por outro worker
+    3. Só jobs ainda pendentes, com um tipo registrado, são executados de novo. Um job que já
+       estava executando pode ter gravado parte do resultado (o exercício inserido, por exemplo):
+       refazê-lo duplicaria o efeito, então ele vira erro, como os que não podem ser retomados
+    Os métodos fazem I/O bloqueante: no event loop devem rodar em uma thread.
+    """
+
+    def __init__(self, path: str, busy_timeout_seconds: float = 5.0):
+        self.path = path
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # isolation_level=None: as transações são abertas explicitamente (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, tipo TEXT, parametros TEXT, "
+                "status TEXT NOT NULL, resultado TEXT, erro TEXT, criado_em REAL NOT NULL, "
+                "concluido_em REAL, dono TEXT NOT NULL, heartbeat REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_heartbeat ON jobs (status, heartbeat)")
+            self._conn = conn
+        return self._conn
+
+    def criar(self, job: Job, dono: str, tipo: Optional[str], parametros: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conexao().execute(
+                "INSERT INTO jobs (id, tipo, parametros, status, criado_em, dono, heartbeat) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, tipo, json.dumps(parametros) if tipo else None, job.status, job.criado_em, dono, time.time())
+            )
+
+    def atualizar(self, job: Job) -> None:
+        with self._lock:
+            self._conexao().execute(
+                "UPDATE jobs SET status = ?, resultado = ?, erro = ?, concluido_em = ?, heartbeat = ? WHERE id = ?",
+                (job.status, json.dumps(job.resultado), job.erro, job.concluido_em, time.time(), job.id)
+            )
+
+    def remover(self, job_id: str) -> None:
+        with self._lock:
+            self._conexao().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def ler(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT id, status, resultado, erro, criado_em, concluido_em FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if linha is None:
+            return None
+        return {
+            "job_id": linha[0],
+            "status": linha[1],
+            "resultado": json.loads(linha[2]) if linha[2] is not None else None,
+            "erro": linha[3],
+            "criado_em": linha[4],
+            "concluido_em": linha[5],
+        }
+
+    def renovar(self, dono: str) -> None:
+        with self._lock:
+            self._conexao().execute(
+                "UPDATE jobs SET heartbeat = ? WHERE dono = ? AND status IN (?, ?)",
+                (time.time(), dono, PENDENTE, EXECUTANDO)
+            )
+
+    def reivindicar(self, dono: str, tipos: List[str], expira_seconds: float) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """Assume os jobs abertos sem heartbeat há expira_seconds; devolve (id, tipo, parâmetros, criado_em) a executar"""
+        agora = time.time()
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                vencidos = conn.execute(
+                    "SELECT id, status, tipo, parametros, criado_em FROM jobs WHERE status IN (?, ?) AND heartbeat < ?",
+                    (PENDENTE, EXECUTANDO, agora - expira_seconds)
+                ).fetchall()
+                retomados = []
+                for job_id, status, tipo, parametros, criado_em in vencidos:
+                    if status == PENDENTE and tipo in tipos:
+                        conn.execute(
+                            "UPDATE jobs SET dono = ?, status = ?, heartbeat = ? WHERE id = ?",
+                            (dono, PENDENTE, agora, job_id)
+                        )
+                        retomados.append((job_id, tipo, json.loads(parametros), criado_em))
+                    else:
+                        erro = ("Worker encerrado durante a execução; o job não é refeito para não duplicar o resultado"
+                                if status == EXECUTANDO else "Worker encerrado antes de concluir o job")
+                        conn.execute(
+                            "UPDATE jobs SET status = ?, erro = ?, concluido_em = ? WHERE id = ?",
+                            (ERRO, erro, agora, job_id)
+                        )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return retomados
+
+    def podar(self, max_finalizados: int) -> int:
+        """Mantém só os max_finalizados jobs terminados mais recentes"""
+        with self._lock:
+            cursor = self._conexao().execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND id NOT IN "
+                "(SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY concluido_em DESC LIMIT ?)",
+                (CONCLUIDO, ERRO, CONCLUIDO, ERRO, max_finalizados)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobQueue:
+    """
+    Fila de jobs em background atendida por um número fixo de workers:
+    1. submit() devolve o id do job assim que ele é registrado; a execução fica com os workers
+    2. Vários pedidos compartilham os mesmos workers, limitando o trabalho simultâneo
+    3. O status pode ser consultado na hora ou com long-poll (aguardar)
+    4. Só os últimos max_finalizados jobs terminados ficam guardados
+    Com um SharedJobStore o status vale para todos os workers do host e sobrevive a
+    reinícios; jobs com `tipo` registrado (registrar) que o dono não chegou a executar
+    são retomados se ele morrer.
+    Sem ele, o estado fica só na memória deste processo.
+    """
+
+    def __init__(self, workers: int = 4, max_finalizados: int = 1000, store: Optional[SharedJobStore] = None,
+                 heartbeat_seconds: float = 5.0, expira_seconds: float = 30.0, poll_seconds: float = 0.2):
+        self.workers = workers
+        self.max_finalizados = max_finalizados
+        self.store = store
+        self.heartbeat_seconds = heartbeat_seconds
+        self.expira_seconds = expira_seconds
+        self.poll_seconds = poll_seconds
+        self.dono = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, Job] = {}
+        self._finalizados: deque = deque()
+        self._tipos: Dict[str, FabricaRetomavel] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "recovered": 0}
+
+    def registrar(self, tipo: str, fabrica: FabricaRetomavel) -> None:
+        """Como refazer jobs de `tipo` a partir dos parâmetros (jobs de outro worker que morreu)"""
+        self._tipos[tipo] = fabrica
+
+    def start(self) -> None:
+        """Inicia os workers no event loop atual (idempotente)"""
+        if not self._tasks:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            if self.store is not None:
+                self._tasks.append(asyncio.create_task(self._manutencao()))
+
+    async def stop(self) -> None:
+        """Termina os jobs já enfileirados e encerra os workers"""
+        if not self._tasks:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.close()
+
+    async def reservar(self, tipo: Optional[str] = None, parametros: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Registra um job pendente sem enfileirá-lo; submit(job_id=...) o enfileira e
+        descartar() o remove. Permite gravar o job antes do commit que o justifica:
+        se o worker morrer entre os dois, o job ainda é retomado (pela fábrica registrada)
+        """
+        self.start()
+        job = Job()
+        if self.store is not None:
+            # Gravado antes de devolver o id: um poll em outro worker já encontra o job
+            await asyncio.to_thread(self.store.criar, job, self.dono, tipo, parametros)
+        self._jobs[job.id] = job
+        return job.id
+
+    async def submit(self, fabrica: FabricaJob, tipo: Optional[str] = None,
+                     parametros: Optional[Dict[str, Any]] = None, job_id: Optional[str] = None) -> str:
+        if job_id is None:
+            job_id = await self.reservar(tipo, parametros)
+        self._queue.put_nowait((self._jobs[job_id], fabrica))
+        self._stats["submitted"] += 1
+        return job_id
+
+    async def descartar(self, job_id: str) -> None:
+        """Remove um job reservado que não chegou a ser enfileirado"""
+        self._jobs.pop(job_id, None)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.remover, job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status dos jobs deste processo (sem I/O); aguardar() também consulta o store"""
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    async def aguardar(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll: espera o job terminar por até `timeout` segundos e devolve o status"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await self._aguardar_no_store(job_id, timeout)
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(job.pronto.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job.to_dict()
+
+    async def _aguardar_no_store(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Job de outro worker (ou de antes de um reinício): consulta o store até terminar"""
+        if self.store is None:
+            return None
+        limite = time.monotonic() + timeout
+        while True:
+            status = await asyncio.to_thread(self.store.ler, job_id)
+            if status is None or status["status"] in (CONCLUIDO, ERRO) or time.monotonic() >= limite:
+                return status
+            await asyncio.sleep(min(self.poll_seconds, max(limite - time.monotonic(), 0)))
+
+    async def _salvar(self, job: Job) -> None:
+        if self.store is None:
+            return
+        try:
+            await asyncio.to_thread(self.store.atualizar, job)
+        except Exception as e:
+            print(f"Erro ao gravar o status do job {job.id}: {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            job, fabrica = await self._queue.get()
+            job.status = EXECUTANDO
+            try:
+                if self.store is not None:
+                    # Sem o status gravado, outro worker poderia refazer o job depois de uma queda
+                    await asyncio.to_thread(self.store.atualizar, job)
+                job.resultado = await fabrica()
+                job.status = CONCLUIDO
+                self._stats["completed"] += 1
+            except Exception as e:
+                job.erro = getattr(e, "detail", None) or str(e)
+                job.status = ERRO
+                self._stats["failed"] += 1
+                print(f"Erro no job {job.id}: {job.erro}")
+            finally:
+                job.concluido_em = time.time()
+                await self._salvar(job)
+                job.pronto.set()
+                self._finalizados.append(job.id)
+                while len(self._finalizados) > self.max_finalizados:
+                    self._jobs.pop(self._finalizados.popleft(), None)
+                self._queue.task_done()
+
+    async def _manutencao(self) -> None:
+        """Renova o heartbeat dos jobs deste worker, retoma os de workers mortos e poda os antigos"""
+        while True:
+            try:
+                await asyncio.to_thread(self.store.renovar, self.dono)
+                retomados = await asyncio.to_thread(
+                    self.store.reivindicar, self.dono, list(self._tipos), self.expira_seconds
+                )
+                for job_id, tipo, parametros, criado_em in retomados:
+                    job = Job(job_id, criado_em)
+                    self._jobs[job_id] = job
+                    fabrica = self._tipos[tipo]
+                    self._queue.put_nowait((job, lambda fabrica=fabrica, parametros=parametros: fabrica(parametros)))
+                    self._stats["recovered"] += 1
+                    print(f"Job {job_id} ({tipo}) retomado de um worker encerrado")
+                await asyncio.to_thread(self.store.podar, self.max_finalizados)
+            except Exception as e:
+                print(f"Erro na manutenção dos jobs: {e}")
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "tracked_jobs": len(self._jobs),
+            "workers": self.workers if self._tasks else 0,
+            "shared_store": self.store is not None,
+        }
@@ -0,0 +1,230 @@
+import bisect
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Buckets padrão de latência (segundos), do acesso ao cache até uma geração lenta da IA
+BUCKETS_LATENCIA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _formatar_labels(nomes: Sequence[str], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+class _Metrica:
+    """
+    Base das métricas: valores por combinação de labels em um dicionário.
+    A atualização é uma operação curta sob um lock sem disputa na prática
+    (o event loop é uma thread só; threads do pool síncrono quase nunca colidem).
+    """
+    tipo = ""
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _chave(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple([labels.get(nome, "") for nome in self.labels])
+
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        super().__init__(nome, descricao, labels)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1.0, **labels: str) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def valor(self, **labels: str) -> float:
+        return self._valores.get(self._chave(labels), 0.0)
+
+    def render(self) -> List[str]:
+        linhas = self._cabecalho()
+        for chave, valor in sorted(self._valores.items()):
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, chave)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class Gauge(Counter):
+    tipo = "gauge"
+
+    def dec(self, valor: float = 1.0, **labels: str) -> None:
+        self.inc(-valor, **labels)
+
+    def set(self, valor: float, **labels: str) -> None:
+        with self._lock:
+            self._valores[self._chave(labels)] = valor
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = (), buckets: Iterable[float] = BUCKETS_LATENCIA):
+        super().__init__(nome, descricao, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por labels: [contagem por bucket (não acumulada, +Inf no fim), soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, valor: float, **labels: str) -> None:
+        chave = self._chave(labels)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def contagem(self, **labels: str) -> int:
+        serie = self._series.get(self._chave(labels))
+        return serie[2] if serie else 0
+
+    def render(self) -> List[str]:
+        linhas = self._cabecalho()
+        for chave, (contagens, soma, total) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_labels(self.labels, chave, le)} {acumulado}")
+            rotulos = _formatar_labels(self.labels, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+class Registry:
+    def __init__(self):
+        self._metricas: List[_Metrica] = []
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        self._metricas.append(metrica)
+        return metrica
+
+    def render(self) -> str:
+        """Formato de texto do Prometheus (versão 0.0.4)"""
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.render())
+        return "\n".join(linhas) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.registrar(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota", ("method", "route", "status")
+))
+http_requests_in_flight = REGISTRY.registrar(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento", ("method",)
+))
+ai_call_duration = REGISTRY.registrar(Histogram(
+    "ai_call_duration_seconds", "Latência das chamadas à IA por modelo e campo", ("model", "field", "result")
+))
+cache_requests = REGISTRY.registrar(Counter(
+    "cache_requests_total", "Consultas aos caches de exercícios", ("cache", "result")
+))
+cache_removals = REGISTRY.registrar(Counter(
+    "cache_removals_total", "Entradas removidas dos caches em memória (despejo LRU ou expiração)", ("cache", "reason")
+))
+db_query_duration = REGISTRY.registrar(Histogram(
+    "db_query_duration_seconds", "Tempo das consultas ao SQLite por operação", ("operation",)
+))
+startup_phase = REGISTRY.registrar(Gauge(
+    "startup_phase_seconds", "Duração das fases do arranque e instante de cada marco desde a importação do app", ("phase",)
+))
+
+
+def registrar_cache(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def evento_lento(rota: str, metodo: str, status: int, duracao_ms: float) -> None:
+    """Evento estruturado (uma linha JSON) para requisições acima do limite configurado"""
+    print(json.dumps({
+        "event": "slow_request",
+        "method": metodo,
+        "route": rota,
+        "status": status,
+        "duration_ms": round(duracao_ms, 1),
+        "timestamp": time.time(),
+    }, ensure_ascii=False), flush=True)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latência por rota (o template, não o caminho com ids), requisições
+    em andamento e evento estruturado para requisições acima de limite_lento_ms
+    """
+
+    def __init__(self, app, limite_lento_ms: float = 5000, eventos_lentos: bool = True):
+        self.app = app
+        self.limite_lento_ms = limite_lento_ms
+        self.eventos_lentos = eventos_lentos
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_com_status(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        metodo = scope["method"]
+        http_requests_in_flight.inc(method=metodo)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            duracao = time.perf_counter() - inicio
+            http_requests_in_flight.dec(method=metodo)
+            # Rotas não encontradas ficam agrupadas para não explodir a cardinalidade
+            rota = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            http_request_duration.observe(duracao, method=metodo, route=rota, status=str(status))
+            if self.eventos_lentos and duracao * 1000 > self.limite_lento_ms:
+                evento_lento(rota, metodo, status, duracao * 1000)
+
+
+def instrumentar_engine(engine) -> None:
+    """Mede o tempo de cada comando SQL executado pelo engine (síncrono ou o sync_engine de um async)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._inicio_metricas = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "_inicio_metricas", None)
+        if inicio is not None:
+            operacao = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            db_query_duration.observe(time.perf_counter() - inicio, operation=operacao)
@@ -0,0 +1,228 @@
+import cProfile
+import functools
+import hmac
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import anyio.to_thread
+
+
+def token_valido(recebido: Optional[str], esperado: Optional[str]) -> bool:
+    return bool(recebido) and bool(esperado) and hmac.compare_digest(recebido, esperado)
+
+
+def _limpar_antigos(diretorio: str, maximo: int) -> None:
+    perfis = sorted(
+        (os.path.join(diretorio, nome) for nome in os.listdir(diretorio) if nome.endswith(".prof")),
+        key=os.path.getmtime
+    )
+    for caminho in perfis[:max(len(perfis) - maximo, 0)]:
+        os.remove(caminho)
+
+
+class _PerfisDeThreads:
+    """Perfis das funções que a requisição perfilada mandou para o threadpool (um por chamada)"""
+
+    def __init__(self):
+        self.perfis: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def envolver(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def perfilada(*args, **kwargs):
+            perfil = cProfile.Profile()
+            perfil.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                perfil.disable()
+                with self._lock:
+                    self.perfis.append(perfil)
+        return perfilada
+
+
+# Até o 3.11 cada thread tem o seu cProfile. A partir do 3.12 o cProfile usa sys.monitoring:
+# um único perfil ativo por processo, que já vê todas as threads, e um segundo enable() falha
+_PERFIL_POR_THREAD = sys.version_info < (3, 12)
+
+# Requisição perfilada em andamento no contexto atual (o anyio copia o contexto para a thread)
+_perfis_threads: ContextVar[Optional[_PerfisDeThreads]] = ContextVar("perfis_threads", default=None)
+_run_sync_original = None
+
+
+def _instalar_gancho_threadpool() -> None:
+    """
+    Rotas e dependências `def`, e iteradores síncronos do StreamingResponse, rodam no
+    threadpool via anyio.to_thread.run_sync, fora da thread do event loop que o cProfile vê.
+    O gancho perfila essas chamadas só quando vêm de uma requisição perfilada.
+    """
+    global _run_sync_original
+    if _run_sync_original is not None:
+        return
+    _run_sync_original = original = anyio.to_thread.run_sync
+
+    async def run_sync(func, *args, **kwargs):
+        coletor = _perfis_threads.get()
+        if coletor is not None and _PERFIL_POR_THREAD:
+            func = coletor.envolver(func)
+        return await original(func, *args, **kwargs)
+
+    anyio.to_thread.run_sync = run_sync
+
+
+class ProfilingMiddleware:
+    """
+    Perfil de CPU sob demanda, uma requisição por vez:
+    1. Só é instalado quando há token configurado; sem ele não existe custo algum
+    2. A requisição com o header (ou parâmetro de query) contendo o token roda sob cProfile
+    3. O código que a requisição roda no threadpool (rotas `def`, dependências síncronas,
+       streaming de geradores) é perfilado na própria thread e somado ao perfil (até o 3.11;
+       no 3.12+ o perfil da requisição já cobre todas as threads)
+    4. O perfil é salvo em formato pstats (.prof), aberto por snakeviz, gprof2dot ou pstats,
+       e o nome do arquivo (único, mesmo no mesmo segundo) volta no header X-Profile-File
+    Na thread do event loop o cProfile vê tudo: requisições concorrentes aparecem no mesmo perfil.
+    """
+
+    def __init__(self, app, token: str, diretorio: str, header: str = "x-profile",
+                 parametro: str = "profile", max_perfis: int = 50):
+        self.app = app
+        self.token = token
+        self.diretorio = diretorio
+        self.header = header.lower().encode("latin-1")
+        self.parametro = parametro
+        self.max_perfis = max_perfis
+        self._em_andamento = False
+        _instalar_gancho_threadpool()
+
+    def _solicitado(self, scope) -> bool:
+        for nome, valor in scope.get("headers", []):
+            if nome == self.header:
+                return token_valido(valor.decode("latin-1"), self.token)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return token_valido((query.get(self.parametro) or [None])[0], self.token)
+
+    async def __call__(self, scope, receive, send):
+        # Um perfil por vez: cProfile não aceita dois perfis ativos na mesma thread
+        if scope["type"] != "http" or self._em_andamento or not self._solicitado(scope):
+            await self.app(scope, receive, send)
+            return
+
+        nome = "{}-{}_{}_{}.prof".format(
+            time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:8], scope["method"],
+            re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "raiz"
+        )
+
+        async def send_com_header(mensagem):
+            if mensagem["type"] == "http.response.start":
+                mensagem = {**mensagem, "headers": [*mensagem.get("headers", []),
+                                                     (b"x-profile-file", nome.encode("latin-1"))]}
+            await send(mensagem)
+
+        self._em_andamento = True
+        threads = _PerfisDeThreads()
+        token = _perfis_threads.set(threads)
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            await self.app(scope, receive, send_com_header)
+        finally:
+            perfil.disable()
+            _perfis_threads.reset(token)
+            self._em_andamento = False
+            estatisticas = pstats.Stats(perfil)
+            for perfil_thread in threads.perfis:
+                if perfil_thread.getstats():
+                    estatisticas.add(perfil_thread)
+            os.makedirs(self.diretorio, exist_ok=True)
+            estatisticas.dump_stats(os.path.join(self.diretorio, nome))
+            _limpar_antigos(self.diretorio, self.max_perfis)
+
+
+class MemoryTracker:
+    """
+    Controle do tracemalloc para as rotas de administração: o primeiro snapshot
+    vira a base e cada diff compara o estado atual com ela
+    """
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self._base: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def ativo(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def iniciar(self, frames: int = 10) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._base = None
+        return self.status()
+
+    def parar(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        self._base = None
+        return self.status()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ])
+
+    ARQUIVO_BASE = "tracemalloc_base.snapshot"
+
+    def marcar_base(self) -> Dict[str, Any]:
+        """
+        Snapshot de referência, também salvo em disco (lido por tracemalloc.Snapshot.load).
+        Um único arquivo, sobrescrito a cada base: snapshots chegam a dezenas de MB
+        """
+        self._base = self._snapshot()
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, self.ARQUIVO_BASE)
+        self._base.dump(caminho + ".tmp")
+        os.replace(caminho + ".tmp", caminho)
+        return {**self.status(), "arquivo": self.ARQUIVO_BASE}
+
+    def diff(self, limite: int = 20, agrupar: str = "lineno", filtro: Optional[str] = None) -> Dict[str, Any]:
+        """Maiores crescimentos desde a base, opcionalmente só em arquivos que casam com `filtro`"""
+        atual = self._snapshot()
+        if self._base is None:
+            self._base = atual
+        base = self._base
+        if filtro:
+            filtros = [tracemalloc.Filter(True, f"*{filtro}*")]
+            atual, base = atual.filter_traces(filtros), base.filter_traces(filtros)
+
+        diferencas: List[tracemalloc.StatisticDiff] = atual.compare_to(base, agrupar)
+        return {
+            **self.status(),
+            "top": [
+                {
+                    "local": str(d.traceback[0]) if d.traceback else "?",
+                    "size_kb": round(d.size / 1024, 1),
+                    "size_diff_kb": round(d.size_diff / 1024, 1),
+                    "count": d.count,
+                    "count_diff": d.count_diff,
+                }
+                for d in diferencas[:limite]
+            ],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        atual, pico = tracemalloc.get_traced_memory() if self.ativo else (0, 0)
+        return {
+            "tracing": self.ativo,
+            "traced_kb": round(atual / 1024, 1),
+            "peak_kb": round(pico / 1024, 1),
+            "baseline": self._base is not None,
+        }
@@ -0,0 +1,86 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+FECHADO = "closed"
+ABERTO = "open"
+MEIO_ABERTO = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por modelo de IA:
+    1. Fechado: chamadas passam; falhas consecutivas são contadas
+    2. Aberto: após failure_threshold falhas seguidas o modelo é pulado por open_seconds
+    3. Meio aberto: passado esse tempo, uma única chamada de teste é liberada;
+       sucesso fecha o circuito, falha abre de novo
+    """
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.estado = FECHADO
+        self._falhas_seguidas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def permite(self) -> bool:
+        """Diz se uma chamada pode ser feita agora (reserva a chamada de teste no meio aberto)"""
+        if self.estado == ABERTO and time.monotonic() - self._aberto_em >= self.open_seconds:
+            self.estado = MEIO_ABERTO
+            self._teste_em_andamento = False
+        if self.estado == FECHADO:
+            return True
+        if self.estado == MEIO_ABERTO and not self._teste_em_andamento:
+            self._teste_em_andamento = True
+            return True
+        self._stats["rejected"] += 1
+        return False
+
+    def registrar_sucesso(self) -> None:
+        self._stats["successes"] += 1
+        self._falhas_seguidas = 0
+        self._teste_em_andamento = False
+        self.estado = FECHADO
+
+    def registrar_falha(self) -> None:
+        self._stats["failures"] += 1
+        self._falhas_seguidas += 1
+        self._teste_em_andamento = False
+        if self.estado == MEIO_ABERTO or self._falhas_seguidas >= self.failure_threshold:
+            if self.estado != ABERTO:
+                self._stats["opened"] += 1
+            self.estado = ABERTO
+            self._aberto_em = time.monotonic()
+
+    def liberar(self) -> None:
+        """Chamada abandonada (cancelada) sem resultado: não conta como sucesso nem falha"""
+        self._teste_em_andamento = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "state": self.estado, "consecutive_failures": self._falhas_seguidas}
+
+
+class LatencyWindow:
+    """Latências das últimas `tamanho` chamadas bem-sucedidas, para calcular percentis"""
+
+    def __init__(self, tamanho: int = 100):
+        self._amostras: Deque[float] = deque(maxlen=tamanho)
+
+    def registrar(self, segundos: float) -> None:
+        self._amostras.append(segundos)
+
+    def percentil(self, p: float) -> Optional[float]:
+        if not self._amostras:
+            return None
+        ordenadas = sorted(self._amostras)
+        return ordenadas[min(int(p * len(ordenadas)), len(ordenadas) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentil(0.5), self.percentil(0.95)
+        return {
+            "samples": len(self._amostras),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
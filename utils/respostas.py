@@ -0,0 +1,141 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.engine import Engine
+from config.performance import CACHE_CONFIG
+from utils.cache_lru import TTLCache
+
+try:
+    import orjson
+except ImportError:
+    # Opcional: sem orjson, o mesmo JSON sai pelo json da biblioteca padrão
+    orjson = None
+
+Cabecalhos = Dict[str, str]
+
+
+def serializar(dados: Any) -> bytes:
+    """JSON com os mesmos bytes do JSONResponse do FastAPI (compacto, UTF-8 sem escapes)"""
+    if orjson is not None:
+        return orjson.dumps(dados, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(dados, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def codificador_linhas(colunas: Sequence[str]) -> Callable[[Sequence[Any]], bytes]:
+    """
+    Linha do banco (tupla na ordem de `colunas`) -> objeto JSON em bytes, sem passar por
+    modelo pydantic nem jsonable_encoder; os valores já devem ser tipos JSON (str, int, bool, None)
+    """
+    colunas = tuple(colunas)
+    if orjson is not None:
+        dumps = orjson.dumps
+        return lambda linha: dumps(dict(zip(colunas, linha)))
+    return lambda linha: serializar(dict(zip(colunas, linha)))
+
+
+class FastJSONResponse(JSONResponse):
+    """Resposta padrão do app: mesmo JSON do JSONResponse, codificado por serializar()"""
+
+    def render(self, content: Any) -> bytes:
+        return serializar(content)
+
+
+def etag_de(corpo: bytes) -> str:
+    """ETag forte: hash do corpo exato"""
+    return '"' + hashlib.md5(corpo).hexdigest() + '"'
+
+
+def etag_confere(request: Request, etag: str) -> bool:
+    """If-None-Match usa comparação fraca: W/"x" confere com "x"; "*" confere com qualquer ETag"""
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    if cabecalho.strip() == "*":
+        return True
+    return any(candidato.strip().removeprefix("W/") == etag for candidato in cabecalho.split(","))
+
+
+def responder(request: Request, etag: str, corpo: bytes, cabecalhos: Optional[Cabecalhos] = None,
+              cache_control: str = "no-cache") -> Response:
+    """200 com o corpo já serializado, ou 304 sem corpo se o cliente já tem esta versão"""
+    headers = {**(cabecalhos or {}), "ETag": etag, "Cache-Control": cache_control}
+    if etag_confere(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    Corpos serializados e ETags das rotas de leitura, válidos enquanto o banco não muda:
+    1. PRAGMA data_version, lido em uma conexão própria para cada arquivo, muda quando
+       qualquer outra conexão (de qualquer worker, inclusive o escritor deste) faz commit;
+       sem commit desde que a entrada foi guardada, ela é servida sem ler tabela nenhuma
+    2. Depois de um commit, `validador()` (consulta leve, ex.: hash do conteúdo da linha)
+       decide se a entrada continua valendo; sem validador, o corpo é gerado de novo
+    3. A ETag é o hash do corpo: se o corpo regenerado for igual, o cliente ainda recebe 304
+    Criações, conclusões e atualizações invalidam por construção (todas fazem commit).
+    """
+
+    def __init__(self, max_entradas: int, max_bytes: Optional[int] = None):
+        # (url do banco, chave) -> (data_version, etag, corpo, cabeçalhos, marca do validador)
+        self._entradas = TTLCache(max_entradas, max_bytes=max_bytes, medir=lambda e: len(e[2]) + 256)
+        self._sentinelas: Dict[str, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+        self._stats = {"fresh": 0, "revalidated": 0, "generated": 0}
+
+    def versao_banco(self, engine: Engine) -> int:
+        url = str(engine.url)
+        with self._lock:
+            conn = self._sentinelas.get(url)
+            if conn is None:
+                # Mesmos parâmetros de conexão do engine (inclusive URIs somente leitura)
+                args, kwargs = engine.dialect.create_connect_args(engine.url)
+                conn = sqlite3.connect(*args, **{**kwargs, "check_same_thread": False, "isolation_level": None})
+                self._sentinelas[url] = conn
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def servir(self, request: Request, engine: Engine, chave: Tuple,
+               gerar: Callable[[], Tuple[bytes, Cabecalhos]], validador: Optional[Callable[[], Any]] = None,
+               cache_control: str = "no-cache") -> Response:
+        """
+        Responde `chave` pelo cache. `gerar()` consulta e serializa (pode levantar HTTPException);
+        `validador()` devolve algo que muda sempre que o corpo mudaria.
+        """
+        # Lida antes das consultas: um commit no meio deixa a entrada marcada como antiga
+        versao = self.versao_banco(engine)
+        indice = (str(engine.url), chave)
+        entrada = self._entradas.get(indice)
+        if entrada is not None and entrada[0] == versao:
+            self._stats["fresh"] += 1
+        else:
+            marca = validador() if validador is not None else None
+            if entrada is not None and marca is not None and marca == entrada[4]:
+                entrada = (versao, *entrada[1:])
+                self._stats["revalidated"] += 1
+            else:
+                corpo, cabecalhos = gerar()
+                entrada = (versao, etag_de(corpo), corpo, cabecalhos, marca)
+                self._stats["generated"] += 1
+            self._entradas[indice] = entrada
+        return responder(request, entrada[1], entrada[2], entrada[3], cache_control)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, **self._entradas.stats()}
+
+    def close(self) -> None:
+        # data_version só é comparável na mesma conexão: sem as sentinelas, as entradas não valem mais
+        with self._lock:
+            for conn in self._sentinelas.values():
+                conn.close()
+            self._sentinelas.clear()
+            self._entradas.clear()
+
+
+respostas = ResponseCache(
+    max_entradas=CACHE_CONFIG["response_cache_size"],
+    max_bytes=CACHE_CONFIG["response_cache_max_bytes"],
+)
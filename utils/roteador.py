@@ -0,0 +1,136 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+from utils.resiliencia import LatencyWindow
+
+# Instante (time.monotonic) em que o trabalho da requisição atual precisa terminar
+_prazo: ContextVar[Optional[float]] = ContextVar("prazo_ia", default=None)
+
+
+@asynccontextmanager
+async def prazo(segundos: float) -> AsyncIterator[float]:
+    """
+    Prazo da geração em andamento: visível para o roteador via tempo_restante()
+    e imposto com asyncio.timeout. Um prazo externo mais curto prevalece.
+    """
+    limite = time.monotonic() + segundos
+    externo = _prazo.get()
+    if externo is not None:
+        limite = min(limite, externo)
+    token = _prazo.set(limite)
+    try:
+        async with asyncio.timeout(max(limite - time.monotonic(), 0.0)):
+            yield limite
+    finally:
+        _prazo.reset(token)
+
+
+def tempo_restante() -> Optional[float]:
+    """Segundos até o prazo atual (None se não houver prazo)"""
+    limite = _prazo.get()
+    return None if limite is None else max(limite - time.monotonic(), 0.0)
+
+
+class _Estatisticas:
+    """Chamadas recentes de um modelo para um tipo de prompt: latências e sucessos"""
+
+    def __init__(self, janela: int):
+        self.latencias = LatencyWindow(janela)
+        self.resultados: Deque[bool] = deque(maxlen=janela)
+
+    def taxa_sucesso(self) -> float:
+        # Suavizada: poucas amostras não zeram nem garantem o modelo
+        return (sum(self.resultados) + 1) / (len(self.resultados) + 2)
+
+
+class ModelRouter:
+    """
+    Escolhe o modelo de IA por tipo de prompt (descricao, vantagens, passo_a_passo, fundido):
+    1. Mantém latência e taxa de erro recentes por (modelo, tipo)
+    2. Custo esperado = latência mediana / taxa de sucesso; modelos sem amostras
+       usam latencia_inicial e a ordem configurada como desempate
+    3. Modelos cuja latência alta (p95) não cabe no prazo restante vão para o fim
+    4. O timeout de cada tentativa vem do p95 do modelo, limitado pelo prazo restante
+    5. Uma pequena fração das escolhas explora outro modelo para manter as estatísticas vivas
+    """
+
+    def __init__(self, modelos: Sequence[str], janela: int = 100, latencia_inicial: float = 2.0,
+                 timeout_multiplicador: float = 2.0, timeout_minimo: float = 1.0, timeout_maximo: float = 15.0,
+                 exploracao: float = 0.05, max_decisoes: int = 50):
+        self.modelos = list(modelos)
+        self.janela = janela
+        self.latencia_inicial = latencia_inicial
+        self.timeout_multiplicador = timeout_multiplicador
+        self.timeout_minimo = timeout_minimo
+        self.timeout_maximo = timeout_maximo
+        self.exploracao = exploracao
+        self._estatisticas: Dict[Tuple[str, str], _Estatisticas] = {}
+        self._decisoes: Deque[Dict[str, Any]] = deque(maxlen=max_decisoes)
+
+    def _stats(self, modelo: str, tipo: str) -> _Estatisticas:
+        chave = (modelo, tipo)
+        if chave not in self._estatisticas:
+            self._estatisticas[chave] = _Estatisticas(self.janela)
+        return self._estatisticas[chave]
+
+    def custo_esperado(self, modelo: str, tipo: str) -> float:
+        stats = self._stats(modelo, tipo)
+        mediana = stats.latencias.percentil(0.5)
+        return (self.latencia_inicial if mediana is None else mediana) / stats.taxa_sucesso()
+
+    def percentil(self, modelo: str, tipo: str, p: float) -> Optional[float]:
+        return self._stats(modelo, tipo).latencias.percentil(p)
+
+    def ordenar(self, tipo: str) -> List[str]:
+        """Modelos na ordem em que devem ser tentados para este tipo, dado o prazo atual"""
+        restante = tempo_restante()
+
+        def chave(item):
+            ordem, modelo = item
+            p95 = self.percentil(modelo, tipo, 0.95)
+            nao_cabe = restante is not None and p95 is not None and p95 > restante
+            return (nao_cabe, self.custo_esperado(modelo, tipo), ordem)
+
+        ordenados = [modelo for _, modelo in sorted(enumerate(self.modelos), key=chave)]
+        explorou = len(ordenados) > 1 and random.random() < self.exploracao
+        if explorou:
+            ordenados.insert(0, ordenados.pop(random.randrange(1, len(ordenados))))
+
+        self._decisoes.append({
+            "tipo": tipo,
+            "ordem": list(ordenados),
+            "custos_s": {m: round(self.custo_esperado(m, tipo), 3) for m in ordenados},
+            "prazo_restante_s": round(restante, 3) if restante is not None else None,
+            "exploracao": explorou,
+            "em": time.time(),
+        })
+        return ordenados
+
+    def timeout(self, modelo: str, tipo: str) -> float:
+        """Timeout da tentativa: folga sobre o p95 do modelo, sem passar do prazo restante"""
+        p95 = self.percentil(modelo, tipo, 0.95)
+        base = self.timeout_maximo if p95 is None else p95 * self.timeout_multiplicador
+        timeout = min(max(base, self.timeout_minimo), self.timeout_maximo)
+        restante = tempo_restante()
+        return timeout if restante is None else min(timeout, restante)
+
+    def registrar(self, modelo: str, tipo: str, segundos: float, sucesso: bool) -> None:
+        stats = self._stats(modelo, tipo)
+        stats.resultados.append(sucesso)
+        if sucesso:
+            stats.latencias.registrar(segundos)
+
+    def stats(self) -> Dict[str, Any]:
+        modelos: Dict[str, Dict[str, Any]] = {}
+        for (modelo, tipo), stats in self._estatisticas.items():
+            modelos.setdefault(modelo, {})[tipo] = {
+                **stats.latencias.stats(),
+                "calls": len(stats.resultados),
+                "success_rate": round(stats.taxa_sucesso(), 3),
+                "expected_cost_ms": round(self.custo_esperado(modelo, tipo) * 1000, 1),
+            }
+        return {"models": modelos, "recent_decisions": list(self._decisoes)}
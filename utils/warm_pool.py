@@ -0,0 +1,106 @@
+import asyncio
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+# Gera o conteúdo (descricao, vantagens, passo_a_passo) de um exercício pelo nome
+GeradorExercicio = Callable[[str], Awaitable[Dict[str, str]]]
+
+
+class WarmPool:
+    """
+    Pool limitado de exercícios já gerados, prontos para servir:
+    1. Uma task em background reabastece o pool até high_watermark sempre que
+       ele fica abaixo de low_watermark
+    2. Itens vizinhos no pool nunca têm o mesmo nome
+    3. pop() é O(1): olha no máximo os dois primeiros itens para não repetir
+       o último exercício servido
+    """
+
+    def __init__(self, gerar: GeradorExercicio, nomes: Sequence[str], low_watermark: int = 3,
+                 high_watermark: int = 10, concorrencia: int = 2, espera_erro_seconds: float = 5.0):
+        self.gerar = gerar
+        self.nomes = list(nomes)
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.concorrencia = concorrencia
+        self.espera_erro = espera_erro_seconds
+        self._itens: Deque[Tuple[str, Dict[str, str]]] = deque()
+        self._precisa_reabastecer: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"hits": 0, "misses": 0, "generated": 0, "errors": 0}
+
+    def start(self) -> None:
+        """Inicia o reabastecimento no event loop atual (idempotente)"""
+        if self._task is None or self._task.done():
+            self._precisa_reabastecer = asyncio.Event()
+            self._precisa_reabastecer.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None or self._task.done():
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def pop(self, evitar: Optional[str] = None) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Retira um exercício pronto cujo nome seja diferente de `evitar`; None se não houver"""
+        item = None
+        if self._itens and self._itens[0][0] != evitar:
+            item = self._itens.popleft()
+        elif len(self._itens) > 1 and self._itens[1][0] != evitar:
+            primeiro = self._itens.popleft()
+            item = self._itens.popleft()
+            self._itens.appendleft(primeiro)
+
+        self._stats["hits" if item else "misses"] += 1
+        if len(self._itens) < self.low_watermark and self._precisa_reabastecer is not None:
+            self._precisa_reabastecer.set()
+        return item
+
+    def _planejar_nomes(self, quantidade: int) -> List[str]:
+        """Sorteia os próximos nomes, cada um diferente do anterior na fila"""
+        anterior = self._itens[-1][0] if self._itens else None
+        nomes = []
+        for _ in range(quantidade):
+            anterior = random.choice([n for n in self.nomes if n != anterior] or self.nomes)
+            nomes.append(anterior)
+        return nomes
+
+    async def _run(self) -> None:
+        while True:
+            await self._precisa_reabastecer.wait()
+            self._precisa_reabastecer.clear()
+            while len(self._itens) < self.high_watermark:
+                nomes = self._planejar_nomes(min(self.concorrencia, self.high_watermark - len(self._itens)))
+                resultados = await asyncio.gather(*(self.gerar(nome) for nome in nomes), return_exceptions=True)
+                gerados = 0
+                for nome, resultado in zip(nomes, resultados):
+                    if isinstance(resultado, Exception):
+                        self._stats["errors"] += 1
+                        print(f"Erro ao reabastecer o pool com {nome}: {resultado}")
+                        continue
+                    # Uma geração que falhou no meio pode deixar dois nomes iguais lado a lado
+                    if self._itens and self._itens[-1][0] == nome:
+                        continue
+                    self._itens.append((nome, resultado))
+                    gerados += 1
+                self._stats["generated"] += gerados
+                if not gerados:
+                    # IA indisponível: não insiste em loop, o endpoint gera inline enquanto isso
+                    await asyncio.sleep(self.espera_erro)
+
+    def stats(self) -> Dict[str, Any]:
+        pedidos = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "depth": len(self._itens),
+            "low_watermark": self.low_watermark,
+            "high_watermark": self.high_watermark,
+            "miss_rate": round(self._stats["misses"] / pedidos, 3) if pedidos else 0.0,
+            "running": self._task is not None and not self._task.done(),
+        }